@@ -12,6 +12,8 @@ ML_SENTINEL_ROOT = Path(__file__).parent.parent.absolute()
 # Model Paths
 MODEL_PATH = str(ML_SENTINEL_ROOT / "model" / "trained" / "aegis_lstm_model.h5")
 ONNX_MODEL_PATH = str(ML_SENTINEL_ROOT / "model" / "trained" / "network.onnx")
+STUDENT_MODEL_PATH = str(ML_SENTINEL_ROOT / "model" / "trained" / "aegis_student.pth")
+STUDENT_ONNX_PATH = str(ML_SENTINEL_ROOT / "model" / "trained" / "student.onnx")
 
 # Data Paths
 MARKET_DATA_INPUT = str(ML_SENTINEL_ROOT / "data-pipeline" / "data" / "market_depth.json")
@@ -38,3 +40,9 @@ VOLUME_MAX = 10000
 PRICE_MIN = 2500
 PRICE_MAX = 3500
 
+
+# ZK Proof Queue
+PROOF_QUEUE_DB = str(ML_SENTINEL_ROOT / "zk-circuit" / "proof_queue.db")
+RECEIPT_DIR = str(ML_SENTINEL_ROOT.parent / "verification-proofs" / "proofs")
+PROOF_LEASE_SECONDS = 120  # Lease a worker holds on a job before it can be retried
+PROOF_MAX_ATTEMPTS = 3
@@ -1,85 +1,467 @@
 """
 ONNX Model Export Utility
 Converts trained Keras (.h5) model to ONNX format for ZK circuit integration
+
+--student exports the distilled student (training/distill_student.py)
+through the same optimization stage, to student.onnx by default.
+
+After conversion the graph goes through an optimization stage:
+- LSTM normalization (drop all-zero initial states and unused Y_h/Y_c)
+- Constant folding
+- Transpose cancellation
+- Dead-node / unused-initializer elimination
+- Shape inference with a dynamic "batch_size" axis (matches EZKL variables)
+- Optional float16 weight storage (--fp16)
+
+Node count, size, ORT latency and circuit-row estimate are reported before
+and after, and optimized outputs are checked against the original graph.
+
+Usage:
+    python export_onnx.py                   # Export + optimize
+    python export_onnx.py --no-optimize     # Export unmodified graph
+    python export_onnx.py --optimize-only   # Re-optimize existing network.onnx
+    python export_onnx.py --student         # Export the distilled student
 """
 
-import tensorflow as tf
 import onnx
 import sys
 import os
+import time
+import argparse
+import numpy as np
+from onnx import helper, numpy_helper, shape_inference
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.constants import MODEL_PATH, ONNX_MODEL_PATH
+from config.constants import (
+    MODEL_PATH, ONNX_MODEL_PATH, STUDENT_MODEL_PATH, STUDENT_ONNX_PATH, ML_SENTINEL_ROOT
+)
 
-def export_to_onnx():
-    """Export Keras model to ONNX format"""
-    
-    print("=" * 60)
-    print("ONNX MODEL EXPORT")
-    print("=" * 60)
-    
-    # Load Keras model
-    print(f"\n[1/3] Loading Keras model from: {MODEL_PATH}")
-    try:
-        model = tf.keras.models.load_model(MODEL_PATH, compile=False)
-        print(f"      Model loaded successfully")
-        print(f"      Input shape: {model.input_shape}")
-        print(f"      Output shape: {model.output_shape}")
-    except Exception as e:
-        print(f"      Error loading model: {e}")
+sys.path.append(str(ML_SENTINEL_ROOT / "zk-circuit" / "scripts"))
+sys.path.append(str(ML_SENTINEL_ROOT / "model" / "training"))
+
+BATCH_DIM_NAME = "batch_size"
+LATENCY_RUNS = 50
+# Ops whose output depends on more than their input values
+NON_FOLDABLE_OPS = {'RandomNormal', 'RandomUniform', 'RandomNormalLike', 'RandomUniformLike', 'Multinomial'}
+
+# ============================================================
+# Graph helpers
+# ============================================================
+def _producers(graph):
+    return {name: node for node in graph.node for name in node.output if name}
+
+def _consumers(graph):
+    consumers = {}
+    for node in graph.node:
+        for name in node.input:
+            consumers.setdefault(name, []).append(node)
+    return consumers
+
+def _rename_input(graph, old, new):
+    """Point every consumer of tensor `old` at tensor `new`"""
+    for node in graph.node:
+        for i, name in enumerate(node.input):
+            if name == old:
+                node.input[i] = new
+
+def _is_zero_fill(name, producers, constants):
+    """True if tensor `name` is provably all zeros (e.g. tf2onnx LSTM states)"""
+    if name in constants:
+        return not np.any(constants[name])
+    node = producers.get(name)
+    if node is None:
         return False
-    
-    # Convert to ONNX using tf2onnx
-    print(f"\n[2/3] Converting to ONNX format...")
+    if node.op_type in ('Expand', 'Unsqueeze', 'Reshape', 'Identity', 'Cast', 'Squeeze', 'Tile'):
+        return _is_zero_fill(node.input[0], producers, constants)
+    if node.op_type == 'ConstantOfShape':
+        value = next((a.t for a in node.attribute if a.name == 'value'), None)
+        return value is None or not np.any(numpy_helper.to_array(value))
+    return False
+
+def _constants(graph):
+    return {init.name: numpy_helper.to_array(init) for init in graph.initializer}
+
+# ============================================================
+# Optimization passes
+# ============================================================
+def normalize_lstm_ops(model):
+    """
+    Canonical LSTM form: zero initial_h/initial_c are omitted (the ONNX
+    default) and optional outputs nobody reads are dropped. This removes
+    the Shape/Expand chains tf2onnx emits just to build zero states.
+    """
+    graph = model.graph
+    producers = _producers(graph)
+    consumers = _consumers(graph)
+    constants = _constants(graph)
+    graph_outputs = {o.name for o in graph.output}
+    changed = 0
+
+    for node in graph.node:
+        if node.op_type != 'LSTM':
+            continue
+        # Inputs: X, W, R, B, sequence_lens, initial_h, initial_c, P
+        for i in (5, 6):
+            if len(node.input) > i and node.input[i] and _is_zero_fill(node.input[i], producers, constants):
+                node.input[i] = ''
+                changed += 1
+        # Outputs: Y, Y_h, Y_c
+        for i in (1, 2):
+            name = node.output[i] if len(node.output) > i else ''
+            if name and name not in consumers and name not in graph_outputs:
+                node.output[i] = ''
+                changed += 1
+        while node.input and not node.input[-1]:
+            del node.input[-1]
+        while node.output and not node.output[-1]:
+            del node.output[-1]
+
+    return changed
+
+def fold_constants(model):
+    """Evaluate nodes whose inputs are all constant and store the results as initializers"""
+    from onnx.reference import ReferenceEvaluator
+
+    graph = model.graph
+    constants = _constants(graph)
+    kept, folded = [], 0
+
+    for node in graph.node:
+        if node.op_type == 'Constant':
+            constants[node.output[0]] = numpy_helper.to_array(
+                next(a.t for a in node.attribute if a.name == 'value'))
+            folded += 1
+            continue
+        inputs = [name for name in node.input if name]
+        if (node.op_type not in NON_FOLDABLE_OPS and node.domain in ('', 'ai.onnx')
+                and inputs and all(name in constants for name in inputs)):
+            values = ReferenceEvaluator(node).run(None, {name: constants[name] for name in inputs})
+            for name, value in zip(node.output, values):
+                constants[name] = np.asarray(value)
+            folded += 1
+            continue
+        kept.append(node)
+
+    del graph.node[:]
+    graph.node.extend(kept)
+    del graph.initializer[:]
+    graph.initializer.extend(numpy_helper.from_array(value, name) for name, value in constants.items())
+    return folded
+
+def cancel_transposes(model):
+    """Merge back-to-back Transposes; drop the pair when they cancel out"""
+    graph = model.graph
+    graph_outputs = {o.name for o in graph.output}
+    removed = 0
+
+    while True:
+        producers = _producers(graph)
+        consumers = _consumers(graph)
+        for node in graph.node:
+            if node.op_type != 'Transpose':
+                continue
+            parent = producers.get(node.input[0])
+            if parent is None or parent.op_type != 'Transpose' or len(consumers.get(parent.output[0], [])) != 1:
+                continue
+            p1 = list(next(a.ints for a in parent.attribute if a.name == 'perm'))
+            p2 = list(next(a.ints for a in node.attribute if a.name == 'perm'))
+            perm = [p1[i] for i in p2]
+            if perm == list(range(len(perm))) and node.output[0] not in graph_outputs:
+                _rename_input(graph, node.output[0], parent.input[0])
+                graph.node.remove(node)
+                graph.node.remove(parent)
+                removed += 2
+            else:
+                merged = helper.make_node('Transpose', [parent.input[0]], list(node.output),
+                                          name=node.name, perm=perm)
+                graph.node.insert(list(graph.node).index(node), merged)
+                graph.node.remove(node)
+                graph.node.remove(parent)
+                removed += 1
+            break
+        else:
+            return removed
+
+def eliminate_dead_nodes(model):
+    """Remove nodes and initializers that do not contribute to any graph output"""
+    graph = model.graph
+    live = {o.name for o in graph.output}
+    kept = []
+    for node in reversed(list(graph.node)):
+        if any(name in live for name in node.output if name):
+            kept.append(node)
+            live.update(name for name in node.input if name)
+
+    removed = len(graph.node) - len(kept)
+    del graph.node[:]
+    graph.node.extend(reversed(kept))
+
+    initializers = [init for init in graph.initializer if init.name in live]
+    del graph.initializer[:]
+    graph.initializer.extend(initializers)
+    return removed
+
+def set_dynamic_batch(model, dim_name=BATCH_DIM_NAME):
+    """Name the leading axis of every graph input/output and re-infer shapes"""
+    for value in list(model.graph.input) + list(model.graph.output):
+        dims = value.type.tensor_type.shape.dim
+        if dims:
+            dims[0].ClearField('dim_value')
+            dims[0].dim_param = dim_name
+    del model.graph.value_info[:]
+    return shape_inference.infer_shapes(model, strict_mode=True)
+
+def reduce_weight_precision(model, dtype=np.float16):
+    """
+    Store float32 weights at lower precision, cast back to float32 in-graph.
+
+    Roughly halves the file size; onnxruntime folds the casts at load time
+    and the circuit compiler re-quantizes weights to param_scale anyway.
+    """
+    graph = model.graph
+    casts, converted = [], []
+    onnx_dtype = helper.np_dtype_to_tensor_dtype(np.dtype(dtype))
+    for init in graph.initializer:
+        array = numpy_helper.to_array(init)
+        if array.dtype != np.float32 or array.size < 16:
+            continue
+        low_name = f"{init.name}__{np.dtype(dtype).name}"
+        converted.append(numpy_helper.from_array(array.astype(dtype), low_name))
+        casts.append(helper.make_node('Cast', [low_name], [init.name], to=onnx.TensorProto.FLOAT,
+                                      name=f"{init.name}__cast"))
+
+    names = {c.output[0] for c in casts}
+    kept = [init for init in graph.initializer if init.name not in names]
+    del graph.initializer[:]
+    graph.initializer.extend(kept + converted)
+    for node in reversed(casts):
+        graph.node.insert(0, node)
+    return len(casts)
+
+def optimize_onnx(model, fp16=False):
+    """Run every optimization pass; returns (optimized model, pass log)"""
+    optimized = onnx.ModelProto()
+    optimized.CopyFrom(model)
+    log = [
+        ("LSTM normalization", normalize_lstm_ops(optimized)),
+        ("Dead nodes removed", eliminate_dead_nodes(optimized)),
+        ("Constants folded", fold_constants(optimized)),
+        ("Transposes merged/cancelled", cancel_transposes(optimized)),
+        ("Dead nodes removed", eliminate_dead_nodes(optimized)),
+    ]
+    optimized = set_dynamic_batch(optimized)
+    if fp16:
+        log.append(("Weights stored as float16", reduce_weight_precision(optimized)))
+    onnx.checker.check_model(optimized)
+    return optimized, log
+
+# ============================================================
+# Reporting
+# ============================================================
+def _session(model):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.log_severity_level = 3
+    return ort.InferenceSession(model.SerializeToString(), options, providers=['CPUExecutionProvider'])
+
+def _sample_input(model, batch_size=1, seed=0):
+    dims = model.graph.input[0].type.tensor_type.shape.dim
+    shape = [batch_size if (d.dim_param or d.dim_value == 0) else d.dim_value for d in dims]
+    return np.random.default_rng(seed).random(shape, dtype=np.float32)
+
+def graph_stats(model):
+    """Node count, serialized size, ORT latency and circuit-row estimate"""
+    stats = {
+        'nodes': len(model.graph.node),
+        'size_kb': model.ByteSize() / 1024,
+        'latency_ms': None,
+        'circuit_rows': None,
+    }
+    try:
+        session = _session(model)
+        feed = {session.get_inputs()[0].name: _sample_input(model)}
+        session.run(None, feed)  # Warm-up
+        start = time.perf_counter()
+        for _ in range(LATENCY_RUNS):
+            session.run(None, feed)
+        stats['latency_ms'] = (time.perf_counter() - start) / LATENCY_RUNS * 1000
+    except ImportError:
+        pass
+    try:
+        from zk_calibrate import estimate_circuit_rows
+        stats['circuit_rows'] = estimate_circuit_rows(model)['rows']
+    except ImportError:
+        pass
+    return stats
+
+def max_output_difference(original, optimized, batch_size=4):
+    """Largest |difference| between the two graphs on random inputs"""
+    x = _sample_input(original, batch_size=batch_size)
+    a = _session(original).run(None, {original.graph.input[0].name: x})[0]
+    b = _session(optimized).run(None, {optimized.graph.input[0].name: x})[0]
+    return float(np.max(np.abs(a - b)))
+
+def print_stats_comparison(before, after):
+    """Print before/after table"""
+    def fmt(value, spec):
+        return "n/a" if value is None else format(value, spec)
+
+    print(f"      {'':<16}{'before':>12}{'after':>12}")
+    print(f"      {'Nodes':<16}{before['nodes']:>12}{after['nodes']:>12}")
+    print(f"      {'Size (KB)':<16}{before['size_kb']:>12.2f}{after['size_kb']:>12.2f}")
+    print(f"      {'ORT latency ms':<16}{fmt(before['latency_ms'], '.3f'):>12}{fmt(after['latency_ms'], '.3f'):>12}")
+    print(f"      {'Circuit rows':<16}{fmt(before['circuit_rows'], ','):>12}{fmt(after['circuit_rows'], ','):>12}")
+
+def run_optimization_stage(model_proto, fp16=False):
+    """Optimize, report and verify; returns the optimized model (or None)"""
     try:
-        import tf2onnx
-        import onnx
-        
-        # Create spec for conversion
-        spec = (tf.TensorSpec(model.input_shape, tf.float32, name="input"),)
-        
-        # Convert
-        model_proto, _ = tf2onnx.convert.from_keras(
-            model,
-            input_signature=spec,
-            opset=13
-        )
-        
-        print(f"      Conversion successful")
-        
+        before = graph_stats(model_proto)
+        optimized, log = optimize_onnx(model_proto, fp16=fp16)
+        after = graph_stats(optimized)
+        for name, count in log:
+            print(f"      {name}: {count}")
+        print()
+        print_stats_comparison(before, after)
+        try:
+            diff = max_output_difference(model_proto, optimized)
+            print(f"\n      Max output difference: {diff:.2e}")
+        except ImportError:
+            print(f"\n      onnxruntime not installed - skipped output check")
+        return optimized
     except Exception as e:
-        print(f"      Conversion error: {e}")
-        return False
-    
-    # Save ONNX model  
-    print(f"\n[3/3] Saving ONNX model...")
+        print(f"      Optimization error: {e}")
+        return None
+
+# ============================================================
+# Export
+# ============================================================
+def convert_keras_model():
+    """Load the Keras model and convert it with tf2onnx"""
+    import tensorflow as tf
+    import tf2onnx
+
+    model = tf.keras.models.load_model(MODEL_PATH, compile=False)
+    print(f"      Model loaded successfully")
+    print(f"      Input shape: {model.input_shape}")
+    print(f"      Output shape: {model.output_shape}")
+
+    print(f"\n[2/4] Converting to ONNX format...")
+    # Create spec for conversion
+    spec = (tf.TensorSpec(model.input_shape, tf.float32, name="input"),)
+
+    # Convert
+    model_proto, _ = tf2onnx.convert.from_keras(
+        model,
+        input_signature=spec,
+        opset=13
+    )
+    print(f"      Conversion successful")
+    return model_proto
+
+def convert_student_model(student_path):
+    """Rebuild the distilled PyTorch student and export it with torch.onnx"""
+    from student_model import load_student, student_to_onnx
+
+    model, checkpoint = load_student(student_path)
+    print(f"      Student loaded successfully ({checkpoint['kind']}, "
+          f"{sum(p.numel() for p in model.parameters())} params)")
+
+    print(f"\n[2/4] Converting to ONNX format...")
+    model_proto = student_to_onnx(model, checkpoint['sequence_length'], checkpoint['n_features'])
+    print(f"      Conversion successful")
+    return model_proto
+
+def export_to_onnx(optimize=True, fp16=False, optimize_only=False, student_path=None, output_path=None):
+    """Export Keras model (or the distilled student) to ONNX format"""
+    if output_path is None:
+        output_path = STUDENT_ONNX_PATH if student_path else ONNX_MODEL_PATH
+
+    print("=" * 60)
+    print("ONNX MODEL EXPORT")
+    print("=" * 60)
+
+    if optimize_only:
+        print(f"\n[1/4] Loading existing ONNX model: {output_path}")
+        try:
+            model_proto = onnx.load(output_path)
+            print(f"      Loaded ({len(model_proto.graph.node)} nodes)")
+            print(f"\n[2/4] Conversion skipped (--optimize-only)")
+        except Exception as e:
+            print(f"      Error loading ONNX model: {e}")
+            return False
+    elif student_path:
+        print(f"\n[1/4] Loading student model from: {student_path}")
+        try:
+            model_proto = convert_student_model(student_path)
+        except Exception as e:
+            print(f"      Conversion error: {e}")
+            return False
+    else:
+        # Load Keras model and convert to ONNX using tf2onnx
+        print(f"\n[1/4] Loading Keras model from: {MODEL_PATH}")
+        try:
+            model_proto = convert_keras_model()
+        except Exception as e:
+            print(f"      Conversion error: {e}")
+            return False
+
+    # Optimize graph
+    if optimize:
+        print(f"\n[3/4] Optimizing ONNX graph...")
+        optimized = run_optimization_stage(model_proto, fp16=fp16)
+        if optimized is None:
+            print(f"      Keeping unoptimized graph")
+        else:
+            model_proto = optimized
+    else:
+        print(f"\n[3/4] Optimization skipped (--no-optimize)")
+
+    # Save ONNX model
+    print(f"\n[4/4] Saving ONNX model...")
     try:
-        os.makedirs(os.path.dirname(ONNX_MODEL_PATH), exist_ok=True)
-        onnx.save(model_proto, ONNX_MODEL_PATH)
-        file_size = os.path.getsize(ONNX_MODEL_PATH) / 1024
-        print(f"      Saved to: {ONNX_MODEL_PATH}")
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        onnx.save(model_proto, output_path)
+        file_size = os.path.getsize(output_path) / 1024
+        print(f"      Saved to: {output_path}")
         print(f"      Size: {file_size:.2f} KB")
-        
+
         # Validate
-        onnx_model = onnx.load(ONNX_MODEL_PATH)
+        onnx_model = onnx.load(output_path)
         onnx.checker.check_model(onnx_model)
         print(f"      Validation: PASSED")
-        
+
     except Exception as e:
         print(f"      Save/validation error: {e}")
         return False
-    
+
     print("\n" + "=" * 60)
     print("✅ ONNX EXPORT COMPLETE!")
     print("=" * 60)
-    print(f"\nONNX Model: {ONNX_MODEL_PATH}")
-    print(f"\nNext: Run ZK circuit setup")
-    print(f"  python zk-circuit/scripts/zk_setup.py")
+    print(f"\nONNX Model: {output_path}")
+    if output_path == ONNX_MODEL_PATH:
+        print(f"\nNext: Run ZK circuit setup")
+        print(f"  python zk-circuit/scripts/zk_setup.py")
+    elif student_path:
+        print(f"\nTo prove with this model, export it as {ONNX_MODEL_PATH}")
+        print(f"  python model/export_onnx.py --student --output {ONNX_MODEL_PATH}")
     print("=" * 60 + "\n")
-    
+
     return True
 
 if __name__ == "__main__":
-    success = export_to_onnx()
+    parser = argparse.ArgumentParser(description="Export the Keras model to (optimized) ONNX")
+    parser.add_argument("--no-optimize", action="store_true", help="Save the tf2onnx graph unmodified")
+    parser.add_argument("--fp16", action="store_true", help="Store weights as float16")
+    parser.add_argument("--optimize-only", action="store_true",
+                        help="Skip conversion and re-optimize the existing ONNX model")
+    parser.add_argument("--student", nargs="?", const=STUDENT_MODEL_PATH, default=None,
+                        help=f"Export the distilled student instead (default: {STUDENT_MODEL_PATH})")
+    parser.add_argument("--output", default=None,
+                        help=f"ONNX path (default: {ONNX_MODEL_PATH}, or {STUDENT_ONNX_PATH} with --student)")
+    args = parser.parse_args()
+
+    success = export_to_onnx(optimize=not args.no_optimize, fp16=args.fp16,
+                             optimize_only=args.optimize_only, student_path=args.student,
+                             output_path=args.output)
     sys.exit(0 if success else 1)
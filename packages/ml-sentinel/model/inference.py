@@ -51,6 +51,9 @@ class SentinelInferenceEngine:
         self.risk_history = []  # List of (timestamp, risk_score) tuples
         self.first_risk_score = None  # Baseline risk score
         
+        # Durable proof job queue (opened on first crash alert)
+        self.proof_queue = None
+        
     def _init_scaler(self):
         """Initialize normalization parameters (from training)"""
         return {
@@ -376,25 +379,34 @@ class SentinelInferenceEngine:
             print("🚨 MARKET CRASH DETECTED - INITIATING RISC ZERO PROOF")
             print("="*60 + "\n")
             
-            # Import Risc Zero adapter
+            # Queue the proof durably before proving, so it survives a crash of the engine
             try:
                 sys.path.append(str(Path(__file__).parent.parent / "zk-circuit"))
-                from prove_adapter import generate_risc_zero_proof
+                from proof_queue import ProofQueue, process_job, default_worker_id, receipt_path_for
                 
                 # Get current market sequence for proof
                 if len(self.feature_buffer) >= SEQUENCE_LENGTH:
                     current_sequence = np.array(self.feature_buffer[-SEQUENCE_LENGTH:])
                     
-                    # Generate zero-knowledge proof
-                    logger.info("Generating Risc Zero proof...")
-                    if generate_risc_zero_proof(self.model, current_sequence):
-                        logger.info("✅ RISC ZERO PROOF GENERATED")
+                    if self.proof_queue is None:
+                        self.proof_queue = ProofQueue()
+                    job_id = self.proof_queue.enqueue(risk_score, features, current_sequence)
+                    logger.info(f"Proof job {job_id} queued: {self.proof_queue.stats()}")
+                    
+                    # Generate zero-knowledge proof for this alert's job (other
+                    # pending jobs are left to proof_queue.py workers)
+                    worker_id = default_worker_id()
+                    job = self.proof_queue.claim(worker_id, job_id=job_id)
+                    if job is None:
+                        logger.info(f"Proof job {job_id} is already being proven, done or backing off")
+                    elif process_job(self.proof_queue, job, worker_id):
+                        logger.info(f"✅ RISC ZERO PROOF GENERATED (job {job_id})")
                         print("\n" + "="*60)
                         print("✅ ZERO-KNOWLEDGE PROOF GENERATED SUCCESSFULLY")
-                        print("   Proof location: packages/verification-proofs/proofs/risk_receipt.dat")
+                        print(f"   Proof location: {receipt_path_for(job)}")
                         print("="*60 + "\n")
                     else:
-                        logger.error("❌ Risc Zero proof generation failed")
+                        logger.error(f"❌ Risc Zero proof generation failed (job {job_id} stays queued for retry)")
                         logger.info("Check installation: cargo build --release in risc0-verifier/")
                 else:
                     logger.warning("Insufficient data buffer for proof generation")
@@ -0,0 +1,368 @@
+"""
+Aegis Protocol - Training Pipeline Runner
+Cached, parallel DAG from raw data to the ZK circuit
+
+Replaces running the stage scripts by hand in README order. Every stage is
+called in-process (a worker process of the pool, in model/training) and
+records the content hashes of its inputs, source files and parameters in
+pipeline_manifest.json; only stale stages re-run:
+
+    prepare   training_data_real       <- Kaggle OHLCV file
+    generate  crashes_linear           (independent of prepare)
+    combine   training_data_final      <- training_data_real, crashes_linear
+    train     aegis_lstm_model.h5      <- training_data_final
+    export    network.onnx             <- aegis_lstm_model.h5
+    zk        settings.json ... vk.key <- network.onnx (zk_setup.py, itself incremental)
+
+Stages whose upstream is done run in parallel (prepare and generate). As in
+zk_setup.py, staleness is re-checked right before a stage runs, so a rebuild
+that reproduces identical bytes lets everything downstream skip.
+
+Usage:
+    python pipeline.py                  # Rebuild stale stages
+    python pipeline.py --dry-run        # Show the plan
+    python pipeline.py --until export   # Stop after export (and its upstream)
+    python pipeline.py --force train    # Retrain even if nothing changed
+"""
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.constants import MODEL_PATH, ONNX_MODEL_PATH, ML_SENTINEL_ROOT
+
+# Paths
+MODEL_DIR = ML_SENTINEL_ROOT / "model"
+TRAINING_DIR = MODEL_DIR / "training"
+ZK_SCRIPTS_DIR = ML_SENTINEL_ROOT / "zk-circuit" / "scripts"
+ZK_DIR = ML_SENTINEL_ROOT / "zk-circuit"
+MANIFEST_FILE = MODEL_DIR / "pipeline_manifest.json"
+LOG_DIR = MODEL_DIR / "pipeline_logs"
+KAGGLE_DATA_DIR = TRAINING_DIR / "kaggle_data"
+
+# Datasets are columnar directories (training/columnar.py)
+REAL_DATA = TRAINING_DIR / "training_data_real"
+CRASH_DATA = TRAINING_DIR / "crashes_linear"
+FINAL_DATA = TRAINING_DIR / "training_data_final"
+KERAS_MODEL = Path(MODEL_PATH)
+ONNX_MODEL = Path(ONNX_MODEL_PATH)
+ZK_ARTIFACTS = [ZK_DIR / name for name in ("settings.json", "model.ezkl", "kzg.srs", "pk.key", "vk.key")]
+CALIBRATED_SETTINGS_FILE = ZK_DIR / "calibrated_settings.json"
+
+sys.path.append(str(TRAINING_DIR))
+from shared.build_manifest import (cached_sha256, load_manifest, save_manifest,
+                                   stale_reason, plan_stages, print_plan)
+
+DEFAULT_PARAMS = {'timeframe': '1h', 'tail_only': False, 'num_crashes': 100, 'steps_per_crash': 100}
+
+# ============================================================
+# Stage functions (run inside a worker process)
+# ============================================================
+def stage_prepare(params):
+    import prepare_kaggle_data
+    return prepare_kaggle_data.main(params['timeframe'], tail_only=params['tail_only'])
+
+def stage_generate(params):
+    import generate_linear_crashes
+    generate_linear_crashes.main(str(CRASH_DATA), params['num_crashes'], params['steps_per_crash'])
+
+def stage_combine(params):
+    from create_final_dataset import create_final_dataset
+    create_final_dataset(str(REAL_DATA), str(CRASH_DATA), str(FINAL_DATA))
+
+def stage_train(params):
+    import train_lstm
+    # The Keras trainer reads its data and save path from module constants
+    train_lstm.DATA_FILE = str(FINAL_DATA)
+    train_lstm.MODEL_SAVE_PATH = str(KERAS_MODEL)
+    KERAS_MODEL.parent.mkdir(parents=True, exist_ok=True)
+    train_lstm.main()
+
+def stage_export(params):
+    from export_onnx import export_to_onnx
+    return export_to_onnx()
+
+def stage_zk(params):
+    from zk_setup import setup_zk_circuit
+    return setup_zk_circuit()
+
+STAGE_FUNCTIONS = {
+    'prepare': stage_prepare,
+    'generate': stage_generate,
+    'combine': stage_combine,
+    'train': stage_train,
+    'export': stage_export,
+    'zk': stage_zk,
+}
+
+def run_stage(name, params):
+    """Worker entry point: run one stage in model/training, output to its log"""
+    for path in (MODEL_DIR, TRAINING_DIR, ZK_SCRIPTS_DIR):
+        if str(path) not in sys.path:
+            sys.path.append(str(path))
+    os.chdir(TRAINING_DIR)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    with open(LOG_DIR / f"{name}.log", 'w') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        result = STAGE_FUNCTIONS[name](params)
+    if result is False:
+        raise RuntimeError(f"{name} reported failure")
+    return time.perf_counter() - start
+
+# ============================================================
+# Stage graph
+# ============================================================
+def build_stages(params):
+    """
+    Describe the pipeline in dependency order.
+
+    `inputs` are data files (produced by earlier stages or external),
+    `sources` the code the stage runs; both are keyed on content hash,
+    `params` on value. Dependencies follow from inputs and outputs.
+    """
+    from prepare_kaggle_data import find_timeframe_file
+
+    # A timeframe that is not downloaded stays an input, reported missing at plan time
+    raw_file = find_timeframe_file(params['timeframe'], str(KAGGLE_DATA_DIR))
+    raw_file = Path(raw_file) if raw_file else KAGGLE_DATA_DIR / f"ETHUSDT_{params['timeframe']}.csv"
+    return [
+        {
+            "name": "prepare",
+            "description": f"Preparing Kaggle {params['timeframe']} data",
+            "outputs": [REAL_DATA],
+            "inputs": [raw_file],
+            "sources": [TRAINING_DIR / "prepare_kaggle_data.py", TRAINING_DIR / "columnar.py"],
+            "params": {k: params[k] for k in ('timeframe', 'tail_only')},
+        },
+        {
+            "name": "generate",
+            "description": "Generating linear crashes",
+            "outputs": [CRASH_DATA],
+            "inputs": [],
+            "sources": [TRAINING_DIR / "generate_linear_crashes.py", TRAINING_DIR / "synthetic_market.py",
+                        TRAINING_DIR / "columnar.py"],
+            "params": {k: params[k] for k in ('num_crashes', 'steps_per_crash')},
+        },
+        {
+            "name": "combine",
+            "description": "Combining real data and crashes",
+            "outputs": [FINAL_DATA],
+            "inputs": [REAL_DATA, CRASH_DATA],
+            "sources": [TRAINING_DIR / "create_final_dataset.py", TRAINING_DIR / "columnar.py"],
+            "params": {},
+        },
+        {
+            "name": "train",
+            "description": "Training the LSTM",
+            "outputs": [KERAS_MODEL],
+            "inputs": [FINAL_DATA],
+            "sources": [TRAINING_DIR / "train_lstm.py", TRAINING_DIR / "windowing.py",
+                        TRAINING_DIR / "dataset_cache.py", TRAINING_DIR / "columnar.py"],
+            "params": {},
+        },
+        {
+            "name": "export",
+            "description": "Exporting to ONNX",
+            "outputs": [ONNX_MODEL],
+            "inputs": [KERAS_MODEL],
+            "sources": [MODEL_DIR / "export_onnx.py"],
+            "params": {},
+        },
+        {
+            "name": "zk",
+            "description": "Setting up the ZK circuit",
+            "outputs": ZK_ARTIFACTS,
+            "inputs": [ONNX_MODEL] + ([CALIBRATED_SETTINGS_FILE] if CALIBRATED_SETTINGS_FILE.exists() else []),
+            "sources": [ZK_SCRIPTS_DIR / "zk_setup.py"],
+            "params": {},
+        },
+    ]
+
+def stage_dependencies(stages):
+    """{stage: set of upstream stage names}, from which stage writes each input"""
+    producers = {path: stage["name"] for stage in stages for path in stage["outputs"]}
+    return {stage["name"]: {producers[p] for p in stage["inputs"] if p in producers} for stage in stages}
+
+def missing_inputs(stages, selected):
+    """(stage name, path) of external inputs of selected stages that do not exist"""
+    produced = {path for stage in stages for path in stage["outputs"]}
+    return [(stage["name"], path) for stage in stages if stage["name"] in selected
+            for path in stage["inputs"] if path not in produced and not path.exists()]
+
+def select_stages(stages, dependencies, until=None):
+    """Stage names to consider: everything, or `until` and its upstream"""
+    if until is None:
+        return [stage["name"] for stage in stages]
+    selected, frontier = set(), [until]
+    while frontier:
+        name = frontier.pop()
+        if name not in selected:
+            selected.add(name)
+            frontier.extend(dependencies[name])
+    return [stage["name"] for stage in stages if stage["name"] in selected]
+
+# ============================================================
+# Fingerprints (hashing & staleness: shared/build_manifest.py)
+# ============================================================
+def stage_fingerprint(stage, hashes):
+    """Current fingerprint of a stage's inputs (assumes inputs exist)"""
+    return {
+        "inputs": {str(p): cached_sha256(p, hashes) for p in stage["inputs"]},
+        "sources": {p.name: cached_sha256(p, hashes) for p in stage["sources"]},
+        "params": stage["params"],
+    }
+
+def stage_stale_reason(stage, record, hashes, pending):
+    """Why a stage must be rebuilt (None if up to date); outputs are keyed by path"""
+    return stale_reason(
+        stage, record, pending,
+        fingerprint=lambda s: stage_fingerprint(s, hashes),
+        hash_file=lambda p: cached_sha256(p, hashes),
+    )
+
+def plan_pipeline(stages, selected, manifest, forced=()):
+    """Decide which selected stages to rebuild; returns list of (stage, reason or None)"""
+    hashes = manifest.setdefault("hashes", {})
+    records = manifest.get("stages", {})
+    return plan_stages(
+        [stage for stage in stages if stage["name"] in selected],
+        lambda stage, pending: stage_stale_reason(stage, records.get(stage["name"]), hashes, pending),
+        forced,
+    )
+
+# ============================================================
+# Execution
+# ============================================================
+def run_pipeline(stages, selected, dependencies, manifest, forced=(), params=DEFAULT_PARAMS, workers=None):
+    """
+    Run stale stages, each as soon as all of its upstream stages are done.
+
+    Returns {stage: 'skipped' | 'built' | 'failed' | 'blocked'}.
+    """
+    by_name = {stage["name"]: stage for stage in stages}
+    hashes = manifest.setdefault("hashes", {})
+    records = manifest.setdefault("stages", {})
+    status = {}
+    running = {}
+    waiting = list(selected)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while waiting or running:
+            # Submit (or skip) every stage whose upstream has finished
+            for name in list(waiting):
+                upstream = dependencies[name] & set(selected)
+                if any(status.get(dep) in ('failed', 'blocked') for dep in upstream):
+                    waiting.remove(name)
+                    status[name] = 'blocked'
+                    print(f"[!] {name}: blocked by a failed upstream stage")
+                    continue
+                if not all(status.get(dep) in ('skipped', 'built') for dep in upstream):
+                    continue
+                waiting.remove(name)
+
+                stage = by_name[name]
+                reason = "forced" if name in forced else stage_stale_reason(stage, records.get(name), hashes, set())
+                if reason is None:
+                    status[name] = 'skipped'
+                    print(f"[=] {name}: up to date, skipping")
+                    continue
+
+                # Drop the record first so a failed/interrupted stage is never trusted
+                records.pop(name, None)
+                save_manifest(manifest, MANIFEST_FILE)
+                print(f"[*] {stage['description']} ({reason})...")
+                running[pool.submit(run_stage, name, params)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                stage = by_name[name]
+                try:
+                    seconds = future.result()
+                    missing = [p.name for p in stage["outputs"] if not p.exists()]
+                    if missing:
+                        raise RuntimeError(f"outputs not written: {', '.join(missing)}")
+                except Exception as e:
+                    status[name] = 'failed'
+                    print(f"[!] {name} failed: {e} (see {LOG_DIR / (name + '.log')})")
+                    continue
+
+                records[name] = {
+                    "fingerprint": stage_fingerprint(stage, hashes),
+                    "outputs": {str(p): cached_sha256(p, hashes) for p in stage["outputs"]},
+                    "seconds": seconds,
+                }
+                save_manifest(manifest, MANIFEST_FILE)
+                status[name] = 'built'
+                print(f"[+] {name}: built in {seconds:.1f}s")
+    return status
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the training pipeline, rebuilding stale stages only")
+    parser.add_argument('--dry-run', action='store_true', help="Show which stages would be rebuilt and exit")
+    parser.add_argument('--until', choices=list(STAGE_FUNCTIONS), default=None,
+                        help="Last stage to run (with its upstream)")
+    parser.add_argument('--force', nargs='*', choices=list(STAGE_FUNCTIONS), default=None,
+                        help="Rebuild these stages regardless of hashes (all if none given)")
+    parser.add_argument('--workers', type=int, default=None, help="Stages run in parallel (default: cores)")
+    parser.add_argument('--timeframe', default=DEFAULT_PARAMS['timeframe'])
+    parser.add_argument('--tail-only', action='store_true', default=DEFAULT_PARAMS['tail_only'])
+    args = parser.parse_args()
+
+    params = dict(DEFAULT_PARAMS, timeframe=args.timeframe, tail_only=args.tail_only)
+    stages = build_stages(params)
+    dependencies = stage_dependencies(stages)
+    selected = select_stages(stages, dependencies, args.until)
+    forced = set(STAGE_FUNCTIONS) if args.force == [] else set(args.force or [])
+
+    print("\n" + "=" * 60)
+    print("AEGIS PROTOCOL - TRAINING PIPELINE" + (" (DRY RUN)" if args.dry_run else ""))
+    print("=" * 60)
+
+    manifest = load_manifest(MANIFEST_FILE)
+    plan = plan_pipeline(stages, selected, manifest, forced)
+    print(f"\n[*] Build plan:")
+    print_plan(plan, lambda stage: f"after {', '.join(sorted(dependencies[stage['name']]))}"
+               if dependencies[stage['name']] else "")
+    save_manifest(manifest, MANIFEST_FILE)  # Keep freshly computed file hashes
+
+    missing = missing_inputs(stages, selected)
+    for name, path in missing:
+        print(f"\n[!] {name}: input {path} missing")
+    if missing:
+        print(f"[*] Available timeframes: {sorted(p.name for p in KAGGLE_DATA_DIR.glob('*.csv'))}")
+        print("=" * 60 + "\n")
+        return 1
+
+    if args.dry_run:
+        rebuilds = sum(1 for _, reason in plan if reason is not None)
+        print(f"\n[*] Dry run: {rebuilds}/{len(plan)} stage(s) would be rebuilt")
+        print("=" * 60 + "\n")
+        return 0
+
+    print()
+    start = time.perf_counter()
+    status = run_pipeline(stages, selected, dependencies, manifest, forced, params, args.workers)
+
+    print("\n" + "=" * 60)
+    print(f"[=] PIPELINE FINISHED in {time.perf_counter() - start:.1f}s")
+    print("=" * 60)
+    for name in selected:
+        print(f"  {name:<9} {status.get(name, 'not run')}")
+    print(f"\n[*] Manifest: {MANIFEST_FILE}")
+    print(f"[*] Stage logs: {LOG_DIR}/")
+    print("=" * 60 + "\n")
+    return 0 if all(s in ('skipped', 'built') for s in status.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Test Script for the Snapshot Resampler
+Duplicate timestamps across chunk boundaries resolve to the last snapshot
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "training"))
+
+def write_history(path, seconds):
+    """Crawler-style CSV with blr = 1, 2, ... in file order"""
+    n = len(seconds)
+    pd.DataFrame({
+        'timestamp': pd.to_datetime(seconds, unit='s').strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'blr': np.arange(1.0, n + 1),
+        'buy_volume': 1.0,
+        'sell_volume': 1.0,
+        'mid_price': 1.0,
+        'alert_triggered': False,
+    }).to_csv(path, index=False)
+
+def test_duplicates_across_chunks():
+    """Output must not depend on --chunk-rows when duplicates straddle a chunk boundary"""
+    from resample_snapshots import resample
+    from columnar import read_table
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = Path(tmp) / "history.csv"
+        write_history(history, [0, 60, 60, 120, 120, 180, 240, 240, 300])
+        for method in ('ffill', 'linear'):
+            for chunk_rows in (1, 2, 3, 100):
+                output = Path(tmp) / f"{method}_{chunk_rows}"
+                resample(history, output, cadence_seconds=60, method=method, chunk_rows=chunk_rows)
+                blr = read_table(output)['blr'].tolist()
+                assert blr == [1, 3, 5, 6, 8, 9], (method, chunk_rows, blr)
+
+if __name__ == "__main__":
+    test_duplicates_across_chunks()
+    print("✓ resample output is independent of chunk size")
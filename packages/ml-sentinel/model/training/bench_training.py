@@ -0,0 +1,278 @@
+"""
+Aegis Protocol - Training Throughput Benchmark
+Keras vs PyTorch LSTM on identical data, architecture and step budget
+
+Every run trains the production architecture (train_lstm.build_lstm_model /
+train_lstm_pytorch.LSTMModel: LSTM 128 -> LSTM 64 -> Dense 32 -> 1) for a
+fixed number of optimizer steps on a generated dataset, in a fresh spawned
+process so thread settings apply before the framework starts and peak
+memory is per run.
+
+Sweeps framework x batch size x thread count and reports:
+- samples/sec over the measured steps (warmup steps excluded)
+- seconds until the smoothed training loss first reaches --target-loss
+- peak RSS of the run (and its growth during training)
+
+Usage:
+    python bench_training.py
+    python bench_training.py --frameworks pytorch --batch-sizes 32,128,512 --threads 1,4,8
+    python bench_training.py --steps 500 --target-loss 0.005 --output bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+import contextlib
+import multiprocessing as mp
+
+import numpy as np
+
+from windowing import sliding_windows
+
+# Configuration
+FRAMEWORKS = ['pytorch', 'keras']
+BATCH_SIZES = [32, 64, 128, 256]
+THREAD_COUNTS = [1, 2, 4]
+NUM_ROWS = 20_000
+SEQUENCE_LENGTH = 60
+STEPS = 200
+WARMUP_STEPS = 20
+TARGET_LOSS = 0.01
+LOSS_EMA = 0.9  # Smoothing of the per-step loss for time-to-target
+OUTPUT_FILE = 'bench_training.json'
+
+# ============================================================
+# Data
+# ============================================================
+def generate_dataset(n_rows=NUM_ROWS, seed=42):
+    """
+    Scaled (n_rows, 4) features [blr, buy_volume, sell_volume, mid_price]
+    and a learnable risk target (high when liquidity is thin).
+    """
+    rng = np.random.default_rng(seed)
+    shocks = rng.normal(0, 0.02, n_rows)
+    blr = np.empty(n_rows)
+    blr[0] = 0.0
+    for t in range(1, n_rows):  # Mean-reverting liquidity around 0.5
+        blr[t] = 0.995 * blr[t - 1] + shocks[t]
+    blr = (blr - blr.min()) / max(blr.max() - blr.min(), 1e-9)
+    buy_volume = rng.lognormal(0, 0.5, n_rows) * (0.5 + blr)
+    sell_volume = rng.lognormal(0, 0.5, n_rows) * (1.5 - blr)
+    mid_price = np.exp(np.cumsum(rng.normal(0, 0.001, n_rows)))
+
+    X = np.column_stack([blr, buy_volume, sell_volume, mid_price])
+    X = (X - X.min(axis=0)) / (X.max(axis=0) - X.min(axis=0))
+    y = 1.0 / (1.0 + np.exp(-10.0 * (0.4 - blr)))
+    return X.astype(np.float32), y.astype(np.float32)
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+class LossTracker:
+    """Smoothed per-step loss and the time it first reaches the target"""
+
+    def __init__(self, target_loss):
+        self.target_loss = target_loss
+        self.ema = None
+        self.seconds_to_target = None
+        self.steps_to_target = None
+
+    def update(self, step, loss, elapsed):
+        self.ema = loss if self.ema is None else LOSS_EMA * self.ema + (1 - LOSS_EMA) * loss
+        if self.seconds_to_target is None and self.ema <= self.target_loss:
+            self.seconds_to_target = elapsed
+            self.steps_to_target = step
+
+# ============================================================
+# Framework runners (executed inside the spawned process)
+# ============================================================
+def run_pytorch(X, y, batch_size, threads, steps, warmup, tracker):
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    import train_lstm_pytorch as trainer
+
+    torch.manual_seed(0)
+    dataset = trainer.WindowedTimeSeriesDataset(X, y, SEQUENCE_LENGTH)
+    loader = trainer.make_loader(dataset, batch_size, shuffle=True)
+    model = trainer.LSTMModel(X.shape[1])
+    criterion = torch.nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=trainer.LEARNING_RATE)
+    model.train()
+
+    def batches():
+        while True:
+            yield from loader
+
+    batch_iter = batches()
+
+    def step():
+        X_batch, y_batch = next(batch_iter)
+        optimizer.zero_grad()
+        loss = criterion(model(X_batch), y_batch.unsqueeze(1))
+        loss.backward()
+        optimizer.step()
+        return loss.item()
+
+    for _ in range(warmup):
+        step()
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    for i in range(steps):
+        tracker.update(i + 1, step(), time.perf_counter() - start)
+    return time.perf_counter() - start, rss_before
+
+def run_keras(X, y, batch_size, threads, steps, warmup, tracker):
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    from tensorflow import keras
+    import train_lstm
+
+    tf.random.set_seed(0)
+    windows, targets = sliding_windows(X, y, SEQUENCE_LENGTH)
+    dataset = (tf.data.Dataset.from_tensor_slices((np.ascontiguousarray(windows), np.asarray(targets)))
+               .shuffle(len(targets), seed=0).repeat().batch(batch_size).prefetch(tf.data.AUTOTUNE))
+    model = train_lstm.build_lstm_model((SEQUENCE_LENGTH, X.shape[1]))
+
+    class StepTimer(keras.callbacks.Callback):
+        """Recovers per-step loss from Keras' running epoch mean"""
+        def on_train_begin(self, logs=None):
+            self.previous_mean = 0.0
+            self.start = time.perf_counter()
+
+        def on_train_batch_end(self, batch, logs=None):
+            step = batch + 1
+            loss = logs['loss'] * step - self.previous_mean * batch
+            self.previous_mean = logs['loss']
+            tracker.update(step, loss, time.perf_counter() - self.start)
+
+    model.fit(dataset, steps_per_epoch=max(warmup, 1), epochs=1, verbose=0)  # Graph tracing
+
+    rss_before = peak_rss_mb()
+    timer = StepTimer()
+    start = time.perf_counter()
+    model.fit(dataset, steps_per_epoch=steps, epochs=1, verbose=0, callbacks=[timer])
+    return time.perf_counter() - start, rss_before
+
+RUNNERS = {'pytorch': run_pytorch, 'keras': run_keras}
+
+def run_benchmark(framework, batch_size, threads, config, results):
+    """Entry point of the spawned process; puts one result dict on `results`"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+
+    result = {'framework': framework, 'batch_size': batch_size, 'threads': threads}
+    try:
+        X, y = generate_dataset(config['rows'], config['seed'])
+        tracker = LossTracker(config['target_loss'])
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+            seconds, rss_before = RUNNERS[framework](X, y, batch_size, threads, config['steps'],
+                                                     config['warmup'], tracker)
+        result.update({
+            'steps': config['steps'],
+            'seconds': seconds,
+            'samples_per_sec': config['steps'] * batch_size / seconds,
+            'final_loss': tracker.ema,
+            'seconds_to_target': tracker.seconds_to_target,
+            'steps_to_target': tracker.steps_to_target,
+            'peak_rss_mb': peak_rss_mb(),
+            'training_rss_growth_mb': peak_rss_mb() - rss_before,
+        })
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    results.put(result)
+
+# ============================================================
+# Report
+# ============================================================
+def print_report(runs, target_loss):
+    print("\n" + "=" * 60)
+    print(f"[=] TRAINING THROUGHPUT (target loss {target_loss:g})")
+    print("=" * 60)
+    print(f"  {'framework':<9} {'batch':>5} {'thr':>3} {'samples/s':>10} {'to target':>10} {'peak MB':>8}")
+    for run in runs:
+        if 'error' in run:
+            print(f"  {run['framework']:<9} {run['batch_size']:>5} {run['threads']:>3}  [!] {run['error']}")
+            continue
+        to_target = f"{run['seconds_to_target']:.1f}s" if run['seconds_to_target'] is not None else "-"
+        print(f"  {run['framework']:<9} {run['batch_size']:>5} {run['threads']:>3} "
+              f"{run['samples_per_sec']:>10.0f} {to_target:>10} {run['peak_rss_mb']:>8.0f}")
+
+    for framework in sorted({run['framework'] for run in runs}):
+        completed = [r for r in runs if r['framework'] == framework and 'error' not in r]
+        if completed:
+            best = max(completed, key=lambda r: r['samples_per_sec'])
+            print(f"\n  Fastest {framework}: batch {best['batch_size']}, {best['threads']} threads "
+                  f"({best['samples_per_sec']:.0f} samples/s)")
+    print("=" * 60 + "\n")
+
+def parse_ints(text):
+    return [int(v) for v in text.split(',') if v]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Keras vs PyTorch LSTM training throughput")
+    parser.add_argument('--frameworks', default=','.join(FRAMEWORKS))
+    parser.add_argument('--batch-sizes', default=','.join(map(str, BATCH_SIZES)))
+    parser.add_argument('--threads', default=','.join(map(str, THREAD_COUNTS)))
+    parser.add_argument('--steps', type=int, default=STEPS, help="Measured optimizer steps per run")
+    parser.add_argument('--warmup', type=int, default=WARMUP_STEPS, help="Untimed steps before measuring")
+    parser.add_argument('--target-loss', type=float, default=TARGET_LOSS)
+    parser.add_argument('--rows', type=int, default=NUM_ROWS, help="Rows of generated data")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    frameworks = [f for f in args.frameworks.split(',') if f]
+    unknown = set(frameworks) - set(RUNNERS)
+    if unknown:
+        parser.error(f"unknown framework(s): {', '.join(sorted(unknown))}")
+
+    config = {'rows': args.rows, 'seed': args.seed, 'steps': args.steps,
+              'warmup': args.warmup, 'target_loss': args.target_loss}
+    grid = [(f, b, t) for f in frameworks for b in parse_ints(args.batch_sizes) for t in parse_ints(args.threads)]
+
+    print("\n" + "=" * 60)
+    print("AEGIS PROTOCOL - TRAINING BENCHMARK")
+    print("=" * 60)
+    print(f"[*] {len(grid)} runs x {args.steps} steps ({args.warmup} warmup) on {args.rows} rows\n")
+
+    context = mp.get_context('spawn')  # Fresh interpreter per run
+    runs = []
+    for framework, batch_size, threads in grid:
+        results = context.SimpleQueue()
+        process = context.Process(target=run_benchmark, args=(framework, batch_size, threads, config, results))
+        process.start()
+        process.join()
+        run = results.get() if not results.empty() else {
+            'framework': framework, 'batch_size': batch_size, 'threads': threads,
+            'error': f"process exited with code {process.exitcode}"}
+        runs.append(run)
+
+        if 'error' in run:
+            print(f"[!] {framework} batch={batch_size} threads={threads}: {run['error']}")
+        else:
+            print(f"[+] {framework} batch={batch_size} threads={threads}: "
+                  f"{run['samples_per_sec']:.0f} samples/s")
+
+    print_report(runs, args.target_loss)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'host': {'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                     'python': platform.python_version()},
+            'config': dict(config, sequence_length=SEQUENCE_LENGTH),
+            'runs': runs,
+        }, f, indent=2)
+    print(f"[+] Results saved to: {args.output}")
+
+    return 0 if any('error' not in run for run in runs) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
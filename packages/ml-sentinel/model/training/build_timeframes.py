@@ -0,0 +1,184 @@
+"""
+Aegis Protocol - Multi-Timeframe Feature Builder
+Builds every downloaded Kaggle timeframe in parallel and aligns them
+
+Each timeframe file in ./kaggle_data (ETHUSDT_<tf>.csv) goes through the
+prepare_kaggle_data.py pipeline (streamed BLR estimation, crash injection,
+risk scores) in its own worker process and is written to
+timeframe_features/<tf> (columnar, see columnar.py). The per-timeframe sets are then joined into
+one multi-resolution table on the base (finest) timeframe.
+
+Alignment never looks ahead: a base row sees the features of the latest
+candle of every other timeframe that had closed by the time the base candle
+closed (columns suffixed _<tf>). Rows before every timeframe has a closed
+candle are dropped.
+
+The aligned table is columnar too unless --output ends in .csv.
+
+Usage:
+    python build_timeframes.py                      # all timeframes, all cores
+    python build_timeframes.py --timeframes 1h,4h,1d --workers 3
+    python build_timeframes.py --base 1h --samples 20000
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from prepare_kaggle_data import (
+    load_ohlcv_data, inject_crash_scenarios, calculate_risk_scores, prepare_training_data,
+    DATA_DIR, CHUNK_ROWS, CRASH_INJECTION_RATE
+)
+from columnar import read_table, write_table
+
+# Configuration
+OUTPUT_DIR = Path('timeframe_features')
+MULTI_TIMEFRAME_FILE = 'training_data_multi_tf'
+ALIGNED_COLUMNS = ['blr', 'buy_volume', 'sell_volume', 'mid_price', 'risk_score']
+TIMEFRAME_PATTERN = re.compile(r'_(\d+)([mhdw])\.csv$')
+TIMEFRAME_UNITS = {'m': 'min', 'h': 'h', 'd': 'D', 'w': 'W'}
+
+def timeframe_duration(timeframe):
+    match = re.fullmatch(r'(\d+)([mhdw])', timeframe)
+    if not match:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return pd.Timedelta(int(match.group(1)), unit=TIMEFRAME_UNITS[match.group(2)])
+
+def discover_timeframes(data_dir=DATA_DIR):
+    """Timeframes with a data file, finest first"""
+    found = []
+    for name in os.listdir(data_dir) if os.path.exists(data_dir) else []:
+        match = TIMEFRAME_PATTERN.search(name)
+        if match:
+            found.append(match.group(1) + match.group(2))
+    return sorted(set(found), key=timeframe_duration)
+
+# ============================================================
+# Per-timeframe build (worker process)
+# ============================================================
+def build_timeframe(timeframe, data_dir, output_dir, chunk_rows, num_samples):
+    """Run the single-timeframe pipeline; its output goes to <tf>.log"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    with open(output_dir / f"{timeframe}.log", 'w') as log, contextlib.redirect_stdout(log):
+        df, history = load_ohlcv_data(timeframe, chunk_rows, data_dir=data_dir, keep_rows=num_samples)
+        if df is None:
+            raise FileNotFoundError(f"No {timeframe} file in {data_dir}")
+        df = inject_crash_scenarios(df, rate=CRASH_INJECTION_RATE, history=history)
+        df = calculate_risk_scores(df)
+        df_final = prepare_training_data(df, num_samples=num_samples or len(df))
+
+    path = write_table(df_final, output_dir / timeframe)
+    return {
+        'timeframe': timeframe,
+        'rows': len(df_final),
+        'alerts': int(df_final['alert_triggered'].sum()),
+        'path': str(path),
+        'seconds': time.perf_counter() - start,
+    }
+
+# ============================================================
+# Alignment
+# ============================================================
+def load_timeframe_features(path, timeframe):
+    df = read_table(path, parse_dates=['timestamp'])
+    df['close_time'] = df['timestamp'] + timeframe_duration(timeframe)
+    return df.sort_values('close_time', ignore_index=True)
+
+def align_timeframes(paths, base):
+    """
+    Join every timeframe onto the base timeframe's rows.
+
+    paths: {timeframe: features CSV}. Each other timeframe contributes
+    ALIGNED_COLUMNS suffixed with _<tf>, taken from its latest candle that
+    closed at or before the base candle's close.
+    """
+    table = load_timeframe_features(paths[base], base)
+    for timeframe in sorted(paths, key=timeframe_duration):
+        if timeframe == base:
+            continue
+        other = load_timeframe_features(paths[timeframe], timeframe)
+        other = other[['close_time'] + ALIGNED_COLUMNS].rename(
+            columns={c: f"{c}_{timeframe}" for c in ALIGNED_COLUMNS})
+        table = pd.merge_asof(table, other, on='close_time', direction='backward')
+
+    return table.dropna().drop(columns='close_time').reset_index(drop=True)
+
+# ============================================================
+# Main
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description="Build all Kaggle timeframes in parallel and align them")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--timeframes', default=None, help="Comma-separated (default: every file found)")
+    parser.add_argument('--base', default=None, help="Row timeframe of the aligned table (default: finest)")
+    parser.add_argument('--samples', type=int, default=None,
+                        help="Keep the last N candles per timeframe (default: all)")
+    parser.add_argument('--workers', type=int, default=None, help="Default: one per timeframe, up to cores")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--output-dir', type=Path, default=OUTPUT_DIR)
+    parser.add_argument('--output', default=MULTI_TIMEFRAME_FILE)
+    args = parser.parse_args()
+
+    timeframes = args.timeframes.split(',') if args.timeframes else discover_timeframes(args.data_dir)
+    if not timeframes:
+        print(f"[!] No timeframe files in {args.data_dir}")
+        print("[*] Run: python prepare_kaggle_data.py (downloads the dataset)")
+        return 1
+    timeframes = sorted(timeframes, key=timeframe_duration)
+    base = args.base or timeframes[0]
+    if base not in timeframes:
+        parser.error(f"--base {base} is not one of {timeframes}")
+
+    workers = args.workers or min(len(timeframes), os.cpu_count() or 1)
+    print("\n" + "=" * 60)
+    print("AEGIS PROTOCOL - MULTI-TIMEFRAME BUILD")
+    print("=" * 60)
+    print(f"[*] {len(timeframes)} timeframes ({', '.join(timeframes)}) on {workers} workers\n")
+
+    start = time.perf_counter()
+    paths = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(build_timeframe, tf, args.data_dir, args.output_dir, args.chunk_rows, args.samples): tf
+            for tf in timeframes
+        }
+        for future in as_completed(futures):
+            timeframe = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[!] {timeframe} failed: {e} (see {args.output_dir / (timeframe + '.log')})")
+                continue
+            paths[timeframe] = result['path']
+            print(f"[+] {timeframe:>4}: {result['rows']} rows, {result['alerts']} alerts "
+                  f"({result['seconds']:.1f}s) -> {result['path']}")
+
+    if base not in paths:
+        print(f"[!] Base timeframe {base} did not build")
+        return 1
+
+    table = align_timeframes(paths, base)
+    write_table(table, args.output)
+
+    print("\n" + "=" * 60)
+    print("[+] MULTI-TIMEFRAME TABLE READY")
+    print("=" * 60)
+    print(f"   Base timeframe: {base} ({len(table)} rows x {len(table.columns)} columns)")
+    print(f"   Timeframes: {', '.join(sorted(paths, key=timeframe_duration))}")
+    print(f"   Total time: {time.perf_counter() - start:.1f}s")
+    print(f"\n[*] Saved to: {args.output}")
+    print("=" * 60 + "\n")
+    return 0 if len(paths) == len(timeframes) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Aegis Protocol - Resumable Training Checkpoints
+Periodic, atomic, rotated checkpoints shared by both trainers
+
+A checkpoint is a directory ckpt_<epoch> holding whatever the trainer
+writes (PyTorch: one state.pt; Keras: model.keras + state.json). It is
+written to a temporary directory and renamed into place, so an interrupted
+save never leaves a partial checkpoint, and only the last K are kept.
+
+Each trainer stores model, optimizer, LR scheduler, RNG states, epoch and
+history, and resumes from latest() with --resume.
+"""
+
+import os
+import re
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+CHECKPOINT_DIR = 'checkpoints'
+KEEP_LAST = 3
+SAVE_EVERY = 1  # Epochs between checkpoints
+
+CHECKPOINT_PATTERN = re.compile(r'^ckpt_(\d+)$')
+
+class CheckpointManager:
+    """Writes, rotates and finds training checkpoints in one directory"""
+
+    def __init__(self, directory=CHECKPOINT_DIR, keep_last=KEEP_LAST, every=SAVE_EVERY):
+        self.directory = Path(directory)
+        self.keep_last = keep_last
+        self.every = every
+
+    def checkpoints(self):
+        """Complete checkpoints, oldest first, as (epoch, path)"""
+        if not self.directory.exists():
+            return []
+        found = []
+        for path in self.directory.iterdir():
+            match = CHECKPOINT_PATTERN.match(path.name)
+            if match and path.is_dir():
+                found.append((int(match.group(1)), path))
+        return sorted(found)
+
+    def latest(self):
+        checkpoints = self.checkpoints()
+        return checkpoints[-1][1] if checkpoints else None
+
+    def should_save(self, epoch):
+        return self.every > 0 and epoch % self.every == 0
+
+    def save(self, epoch, write_fn):
+        """Call write_fn(tmp_dir) and publish the result as ckpt_<epoch>"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        final_path = self.directory / f"ckpt_{epoch:05d}"
+        tmp_dir = Path(tempfile.mkdtemp(prefix='.tmp_ckpt_', dir=self.directory))
+        try:
+            write_fn(tmp_dir)
+            if final_path.exists():
+                shutil.rmtree(final_path)
+            os.replace(tmp_dir, final_path)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self._prune()
+        return final_path
+
+    def _prune(self):
+        for _, path in self.checkpoints()[:-max(self.keep_last, 1)]:
+            shutil.rmtree(path, ignore_errors=True)
+        # Leftovers of saves interrupted before the rename
+        for path in self.directory.glob('.tmp_ckpt_*'):
+            shutil.rmtree(path, ignore_errors=True)
+
+def capture_rng_state():
+    """Python and NumPy RNG states, JSON-serializable (framework RNGs are saved by each trainer)"""
+    version, internal, gauss = random.getstate()
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {
+        'python': [version, list(internal), gauss],
+        'numpy': [name, keys.tolist(), pos, has_gauss, cached_gaussian],
+    }
+
+def restore_rng_state(state):
+    version, internal, gauss = state['python']
+    random.setstate((version, tuple(internal), gauss))
+    name, keys, pos, has_gauss, cached_gaussian = state['numpy']
+    np.random.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
@@ -0,0 +1,196 @@
+"""
+Aegis Protocol - Columnar Datasets
+Binary training tables: one .npy per column plus meta.json
+
+The default on-disk format of every data-prep script and the input of both
+trainers. Compared with CSV, columns keep their full float64 precision (no
+.round()), nothing is re-parsed from text, and readers can memory-map only
+the columns they use. The layout is the one synthetic_market.py writes, so
+its datasets load here as well.
+
+A path ending in .csv is read and written as CSV instead (the export
+option); CSV exports keep the historical rounding in CSV_ROUNDING.
+resolve_table() lets code name a dataset without its extension: the
+columnar directory wins, the .csv next to it is the fallback. An explicit
+.csv path always reads the CSV.
+
+Usage:
+    python columnar.py training_data_final.csv training_data_final   # CSV -> columnar
+    python columnar.py training_data_final training_data_final.csv   # columnar -> CSV
+    python columnar.py training_data_final                           # Show schema
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+META_FILE = 'meta.json'
+FORMAT_VERSION = 1
+CSV_ROUNDING = {'blr': 4, 'buy_volume': 2, 'sell_volume': 2, 'mid_price': 2, 'risk_score': 4}
+CHUNK_ROWS = 500_000
+
+def is_csv(path):
+    return str(path).endswith('.csv')
+
+def is_columnar(path):
+    return (Path(path) / META_FILE).is_file()
+
+def table_path(name, csv=False):
+    """Output path for a dataset name: the columnar directory, or name.csv"""
+    name = str(name)
+    base = name[:-len('.csv')] if is_csv(name) else name
+    return base + '.csv' if csv else base
+
+def resolve_table(path):
+    """
+    Existing dataset for path: itself, else the other format of the same name.
+
+    'training_data_final' resolves to the columnar directory when it exists
+    and to training_data_final.csv otherwise (and vice versa).
+    """
+    path = Path(path)
+    if is_columnar(path) or (is_csv(path) and path.is_file()):
+        return path
+    other = Path(table_path(path, csv=not is_csv(path)))
+    if is_columnar(other) or (is_csv(other) and other.is_file()):
+        return other
+    raise FileNotFoundError(f"No dataset at {path} or {other}")
+
+def read_meta(path):
+    with open(Path(path) / META_FILE) as f:
+        return json.load(f)
+
+# ============================================================
+# Write
+# ============================================================
+def _column_array(series):
+    """Numeric, bool and datetime columns as-is; anything else as fixed-width text"""
+    if series.dtype.kind in 'biufM':
+        return series.to_numpy()
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return series.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+    return series.astype(str).to_numpy(dtype=np.str_)
+
+def replace_dir(tmp_dir, path):
+    """Move a finished directory to path, replacing any previous one"""
+    path = Path(path)
+    if path.exists():
+        old_dir = Path(tempfile.mkdtemp(prefix=path.name + '.old.', dir=path.parent))
+        os.replace(path, old_dir / path.name)
+        os.replace(tmp_dir, path)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, path)
+    return path
+
+def write_columns(df, path, **meta):
+    """
+    Write df as a columnar directory, replacing any previous one.
+
+    Extra keyword arguments are stored in meta.json. The directory is built
+    next to the target and renamed into place.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=path.name + '.', dir=path.parent))
+    try:
+        columns = {}
+        for name in df.columns:
+            values = _column_array(df[name])
+            np.save(tmp_dir / f"{name}.npy", values)
+            columns[name] = values.dtype.str
+        with open(tmp_dir / META_FILE, 'w') as f:
+            json.dump({'rows': len(df), 'columns': columns, 'format_version': FORMAT_VERSION, **meta},
+                      f, indent=2)
+        return replace_dir(tmp_dir, path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+def write_csv(df, path, rounding=CSV_ROUNDING):
+    """CSV export, by default with the historical per-column rounding"""
+    if rounding:
+        df = df.round({c: d for c, d in rounding.items() if c in df.columns})
+    df.to_csv(path, index=False)
+    return Path(path)
+
+def write_table(df, path, csv_rounding=CSV_ROUNDING):
+    """Columnar directory, or CSV when path ends in .csv"""
+    return write_csv(df, path, csv_rounding) if is_csv(path) else write_columns(df, path)
+
+# ============================================================
+# Read
+# ============================================================
+def load_columns(path, columns=None, mmap_mode='r'):
+    """{name: array} of a columnar directory, memory-mapped by default"""
+    path = Path(path)
+    names = read_meta(path)['columns']
+    missing = set(columns or []) - set(names)
+    if missing:
+        raise KeyError(f"{path} has no column(s) {sorted(missing)}")
+    return {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in (columns or names)}
+
+def read_table(path, columns=None, parse_dates=None):
+    """
+    DataFrame of a columnar directory or CSV (resolved with resolve_table).
+
+    parse_dates only applies to CSV; columnar datetimes are stored typed.
+    """
+    path = resolve_table(path)
+    if is_csv(path):
+        return pd.read_csv(path, usecols=columns, parse_dates=parse_dates)
+    return pd.DataFrame({name: np.asarray(values) for name, values in load_columns(path, columns).items()})
+
+def iter_table_chunks(path, columns, chunk_rows=CHUNK_ROWS):
+    """DataFrames of up to chunk_rows rows; columnar chunks are slices of memory maps"""
+    path = resolve_table(path)
+    if is_csv(path):
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+        return
+    arrays = load_columns(path, columns)
+    rows = read_meta(path)['rows']
+    for start in range(0, rows, chunk_rows):
+        yield pd.DataFrame({name: np.asarray(values[start:start + chunk_rows]) for name, values in arrays.items()})
+
+def table_files(path):
+    """Files whose contents define the dataset (for content hashing)"""
+    path = resolve_table(path)
+    if is_csv(path):
+        return [path]
+    return [path / META_FILE] + [path / f"{name}.npy" for name in read_meta(path)['columns']]
+
+# ============================================================
+# Main
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description="Convert datasets between CSV and the columnar format")
+    parser.add_argument('source', help="CSV file or columnar directory")
+    parser.add_argument('target', nargs='?', help="Output (.csv for CSV); omit to show the schema")
+    args = parser.parse_args()
+
+    if args.target is None:
+        source = resolve_table(args.source)
+        if is_csv(source):
+            print(f"[*] {source}: CSV, {os.path.getsize(source) / 1e6:.1f} MB")
+            return 0
+        meta = read_meta(source)
+        size = sum(f.stat().st_size for f in table_files(source))
+        print(f"[*] {source}: {meta['rows']:,} rows, {size / 1e6:.1f} MB")
+        for name, dtype in meta['columns'].items():
+            print(f"    {name:<16} {dtype}")
+        return 0
+
+    df = read_table(args.source)
+    write_table(df, args.target)
+    print(f"[+] {len(df):,} rows: {resolve_table(args.source)} -> {args.target}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,57 +1,81 @@
 """
 Combine Real Kaggle Data + Simple Linear Crashes
 Final training dataset generator
+
+Run directly, the linear crashes are regenerated in-process first; the
+pipeline runner (../pipeline.py) calls create_final_dataset() on the
+crashes its generate stage already wrote.
+
+Inputs are read in either format (columnar.py); the output is columnar
+unless --csv is given.
 """
 
+import argparse
+
 import pandas as pd
 import numpy as np
 
-print("=" * 60)
-print("CREATING FINAL TRAINING DATASET")
-print("Real Kaggle Data + Simple Linear Crashes")
-print("=" * 60 + "\n")
+from columnar import read_table, write_table, table_path
+
+REAL_FILE = 'training_data_real'
+CRASHES_FILE = 'crashes_linear'
+OUTPUT_FILE = 'training_data_final'
+
+def create_final_dataset(real_file=REAL_FILE, crashes_file=CRASHES_FILE, output=OUTPUT_FILE):
+    """50/50 mix of real samples and crash samples, shuffled, saved to output"""
+    print("=" * 60)
+    print("CREATING FINAL TRAINING DATASET")
+    print("Real Kaggle Data + Simple Linear Crashes")
+    print("=" * 60 + "\n")
+
+    # 1. Load real Kaggle data (already processed with BLR)
+    print("[1] Loading real-world data...")
+    df_real = read_table(real_file)
+    print(f"    Loaded {len(df_real)} real samples")
+
+    # 2. Load simple linear crashes
+    print("[2] Loading simple linear crashes...")
+    df_crashes = read_table(crashes_file)
+    print(f"    Loaded {len(df_crashes)} crash samples")
 
-# 1. Load real Kaggle data (already processed with BLR)
-print("[1] Loading real-world data...")
-df_real = pd.read_csv('training_data_real.csv')
-print(f"    Loaded {len(df_real)} real samples")
+    # 3. Combine: 50/50 mix of real data and crashes
+    print("[3] Combining datasets...")
 
-# 2. Load simple linear crashes
-print("[2] Generating simple linear crashes...")
-import subprocess
-subprocess.run(['python', 'generate_linear_crashes.py'], check=True)
+    # Use all available real data (or sample 5000 if we have more)
+    num_real_samples = min(5000, len(df_real))
+    df_healthy = df_real.sample(n=num_real_samples, random_state=42)
 
-df_crashes = pd.read_csv('crashes_linear.csv')
-print(f"    Generated {len(df_crashes)} crash samples")
+    # Use all crash samples
+    df_risky = df_crashes
 
-# 3. Combine: 50/50 mix of real data and crashes
-print("[3] Combining datasets...")
+    # Combine
+    df_final = pd.concat([df_healthy, df_risky], ignore_index=True)
 
-# Use all available real data (or sample 5000 if we have more)
-num_real_samples = min(5000, len(df_real))
-df_healthy = df_real.sample(n=num_real_samples, random_state=42)
+    # Shuffle
+    df_final = df_final.sample(frac=1, random_state=42).reset_index(drop=True)
 
-# Use all crash samples  
-df_risky = df_crashes
+    print(f"    Final dataset: {len(df_final)} samples")
+    print(f"    Real samples: {len(df_healthy)}")
+    print(f"    Crash samples: {len(df_risky)}")
+    print(f"    Risk distribution:")
+    print(f"      Low risk (<0.3): {(df_final['risk_score'] < 0.3).sum()}")
+    print(f"      Medium (0.3-0.7): {((df_final['risk_score'] >= 0.3) & (df_final['risk_score'] < 0.7)).sum()}")
+    print(f"      High (>0.7): {(df_final['risk_score'] >= 0.7).sum()}")
 
-# Combine
-df_final = pd.concat([df_healthy, df_risky], ignore_index=True)
+    # 4. Save final dataset
+    write_table(df_final, output)
 
-# Shuffle
-df_final = df_final.sample(frac=1, random_state=42).reset_index(drop=True)
+    print(f"\n[+] Final training data saved: {output}")
+    print(f"[*] Ready for GPU-accelerated training!")
+    print("=" * 60 + "\n")
+    return df_final
 
-print(f"    Final dataset: {len(df_final)} samples")
-print(f"    Real samples: {len(df_healthy)}")
-print(f"    Crash samples: {len(df_risky)}")
-print(f"    Risk distribution:")
-print(f"      Low risk (<0.3): {(df_final['risk_score'] < 0.3).sum()}")
-print(f"      Medium (0.3-0.7): {((df_final['risk_score'] >= 0.3) & (df_final['risk_score'] < 0.7)).sum()}")
-print(f"      High (>0.7): {(df_final['risk_score'] >= 0.7).sum()}")
+if __name__ == "__main__":
+    import generate_linear_crashes
 
-# 4. Save final dataset
-output = 'training_data_final.csv'
-df_final.to_csv(output, index=False)
+    parser = argparse.ArgumentParser(description="Combine real data and linear crashes")
+    parser.add_argument('--csv', action='store_true', help="Write CSV instead of the columnar format")
+    args = parser.parse_args()
 
-print(f"\n[+] Final training data saved: {output}")
-print(f"[*] Ready for GPU-accelerated training!")
-print("=" * 60 + "\n")
+    generate_linear_crashes.main(CRASHES_FILE)
+    create_final_dataset(output=table_path(OUTPUT_FILE, args.csv))
@@ -0,0 +1,213 @@
+"""
+Aegis Protocol - Preprocessed Dataset Cache
+Scaled features, targets and the fitted transform as memory-mappable .npy
+
+Sources are columnar datasets or CSVs (see columnar.py; a name without
+extension resolves to whichever exists). Entries are keyed by (source
+content hash, feature columns, target column, scaler config), so a changed
+source or column set never reuses stale data. A cache hit opens the arrays
+with mmap_mode='r' in milliseconds; source files are only re-hashed when
+their size or mtime changed.
+
+Misses are converted out-of-core: one chunked pass computes row count and
+per-column min/max, a second pass writes scaled chunks straight into the
+.npy files (columnar chunks are slices of memory maps, nothing is parsed).
+The scaling matches sklearn's MinMaxScaler (feature_range 0-1).
+
+Usage:
+    python dataset_cache.py training_data_final         # build / verify entry
+    python dataset_cache.py --clear
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from shared.build_manifest import cached_sha256, load_manifest, save_manifest
+from columnar import resolve_table, iter_table_chunks, table_files, is_csv
+
+# Configuration
+CACHE_DIR = Path(__file__).parent / 'dataset_cache'
+FEATURE_COLS = ['blr', 'buy_volume', 'sell_volume', 'mid_price']
+TARGET_COL = 'risk_score'
+SCALER_CONFIG = {'type': 'minmax', 'feature_range': [0.0, 1.0]}
+CHUNK_ROWS = 500_000
+FORMAT_VERSION = 1
+
+def source_hash(data_path, cache_dir=CACHE_DIR):
+    """
+    Source content hash; file hashes are reused from the stat index while
+    size and mtime are unchanged. A CSV hashes exactly as before, a
+    columnar dataset combines the hashes of its files.
+    """
+    data_path = resolve_table(data_path)
+    files = [Path(f).resolve() for f in table_files(data_path)]
+    index_file = Path(cache_dir) / 'index.json'
+
+    index = load_manifest(index_file)
+    previous = dict(index)
+    digests = [cached_sha256(path, index) for path in files]
+    if index != previous:
+        save_manifest(index, index_file)
+
+    if is_csv(data_path):
+        return digests[0]
+    return hashlib.sha256(' '.join(f"{p.name}:{d}" for p, d in zip(files, digests)).encode()).hexdigest()
+
+def cache_key(csv_sha, feature_cols, target_col, scaler_config):
+    spec = json.dumps({
+        'csv': csv_sha,
+        'features': list(feature_cols),
+        'target': target_col,
+        'scaler': scaler_config,
+        'version': FORMAT_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+# ============================================================
+# Build
+# ============================================================
+def fit_minmax(data_path, feature_cols, chunk_rows):
+    """Pass 1: row count and per-column min/max"""
+    n_rows = 0
+    data_min = np.full(len(feature_cols), np.inf)
+    data_max = np.full(len(feature_cols), -np.inf)
+
+    for chunk in iter_table_chunks(data_path, feature_cols, chunk_rows):
+        values = chunk[feature_cols].to_numpy(dtype=np.float64)
+        n_rows += len(values)
+        data_min = np.minimum(data_min, np.nanmin(values, axis=0))
+        data_max = np.maximum(data_max, np.nanmax(values, axis=0))
+
+    return n_rows, data_min, data_max
+
+def minmax_transform(data_min, data_max, feature_range=(0.0, 1.0)):
+    """Scale/offset exactly as sklearn's MinMaxScaler computes them"""
+    lo, hi = feature_range
+    data_range = data_max - data_min
+    data_range[data_range == 0.0] = 1.0  # Constant columns map to feature_range[0]
+    scale = (hi - lo) / data_range
+    return {
+        'data_min': data_min.tolist(),
+        'data_max': data_max.tolist(),
+        'scale': scale.tolist(),
+        'min': (lo - data_min * scale).tolist(),
+    }
+
+def build_entry(data_path, entry_dir, feature_cols, target_col, scaler_config, chunk_rows):
+    """Convert the source into features.npy / targets.npy / transform.json"""
+    n_rows, data_min, data_max = fit_minmax(data_path, feature_cols, chunk_rows)
+    transform = minmax_transform(data_min, data_max, scaler_config['feature_range'])
+    scale = np.array(transform['scale'])
+    offset = np.array(transform['min'])
+
+    # Build into a temp dir next to the entry, then rename (readers never see partial files)
+    entry_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=entry_dir.name + '.', dir=entry_dir.parent))
+    try:
+        features = np.lib.format.open_memmap(tmp_dir / 'features.npy', mode='w+',
+                                             dtype=np.float32, shape=(n_rows, len(feature_cols)))
+        targets = np.lib.format.open_memmap(tmp_dir / 'targets.npy', mode='w+',
+                                            dtype=np.float32, shape=(n_rows,))
+
+        row = 0
+        for chunk in iter_table_chunks(data_path, feature_cols + [target_col], chunk_rows):
+            values = chunk[feature_cols].to_numpy(dtype=np.float64)
+            end = row + len(values)
+            features[row:end] = values * scale + offset
+            targets[row:end] = chunk[target_col].to_numpy(dtype=np.float64)
+            row = end
+
+        features.flush()
+        targets.flush()
+        del features, targets
+
+        with open(tmp_dir / 'transform.json', 'w') as f:
+            json.dump({
+                'source': str(Path(data_path).resolve()),
+                'rows': n_rows,
+                'feature_cols': list(feature_cols),
+                'target_col': target_col,
+                'scaler': scaler_config,
+                'transform': transform,
+            }, f, indent=2)
+
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another process finished the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+# ============================================================
+# Public API
+# ============================================================
+def load_dataset(data_path, feature_cols=FEATURE_COLS, target_col=TARGET_COL,
+                 scaler_config=SCALER_CONFIG, cache_dir=CACHE_DIR, chunk_rows=CHUNK_ROWS):
+    """
+    Scaled (n_samples, n_features) float32 features, targets and transform.
+
+    data_path is a columnar dataset or CSV. Arrays are read-only memory
+    maps into the cache entry.
+    """
+    print("=" * 60)
+    print("[*] LOADING TRAINING DATA")
+    print("=" * 60)
+
+    feature_cols = list(feature_cols)
+    data_path = resolve_table(data_path)
+    key = cache_key(source_hash(data_path, cache_dir), feature_cols, target_col, scaler_config)
+    entry_dir = Path(cache_dir) / key
+
+    if entry_dir.exists():
+        print(f"[+] Cache hit: {entry_dir}")
+    else:
+        print(f"[*] Cache miss - converting {data_path} (chunks of {chunk_rows} rows)")
+        build_entry(data_path, entry_dir, feature_cols, target_col, scaler_config, chunk_rows)
+        print(f"[+] Cached: {entry_dir}")
+
+    X = np.load(entry_dir / 'features.npy', mmap_mode='r')
+    y = np.load(entry_dir / 'targets.npy', mmap_mode='r')
+    with open(entry_dir / 'transform.json') as f:
+        meta = json.load(f)
+
+    print(f"[+] Features shape: {X.shape}")
+    print(f"[+] Target shape: {y.shape}")
+    print("[+] Features normalized to [0, 1] range\n")
+
+    return X, y, meta['transform']
+
+def clear_cache(cache_dir=CACHE_DIR):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or clear the preprocessed dataset cache")
+    parser.add_argument('data', nargs='?', help="Source dataset (columnar directory or CSV) to convert")
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--clear', action='store_true', help="Delete all cache entries")
+    args = parser.parse_args()
+
+    if args.clear:
+        clear_cache(args.cache_dir)
+        print(f"[+] Cleared {args.cache_dir}")
+        return 0
+
+    if not args.data:
+        parser.error("data is required unless --clear is given")
+
+    load_dataset(args.data, cache_dir=args.cache_dir, chunk_rows=args.chunk_rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Aegis Protocol - Student Distillation
+Trains a compact MLP / TCN student on the LSTM teacher's outputs
+
+EZKL cannot compile the LSTM (see zk_setup_placeholder.py), so this trains a
+student (student_model.py) to reproduce the exported teacher (network.onnx):
+1. Windows from the training set and a backtest set are normalized like the
+   production inference engine and labeled by the teacher via onnxruntime
+2. The student is fit to the teacher scores with the PyTorch trainer's
+   train_model (MSE, Adam, ReduceLROnPlateau, best-epoch checkpoint); the
+   best epoch is picked on the last 10% of every source's training windows
+3. The last 20% of every source is held out (never seen in training or
+   model selection) and scored on:
+   - MSE / MAE against the teacher
+   - agreement of alert decisions at CRASH_THRESHOLD / WARNING_THRESHOLD
+   - recall of the teacher's crash alerts
+4. Teacher and (optimized) student ONNX graphs are compared on CPU latency
+   and estimated circuit rows
+
+The student is saved to STUDENT_MODEL_PATH; export it with
+    python ../export_onnx.py --student
+
+Usage:
+    python distill_student.py --student mlp
+    python distill_student.py --student tcn --epochs 50 --backtest training_data_real
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+ML_SENTINEL_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ML_SENTINEL_ROOT))
+sys.path.append(str(ML_SENTINEL_ROOT / "model"))
+from config.constants import (
+    ONNX_MODEL_PATH, STUDENT_MODEL_PATH, SEQUENCE_LENGTH, FEATURE_COLUMNS,
+    CRASH_THRESHOLD, WARNING_THRESHOLD
+)
+from shared.evaluation import normalize_features, classify_alerts
+from columnar import read_table
+from windowing import sliding_windows
+
+# Configuration
+DATA_FILE = 'training_data_final'
+BACKTEST_FILE = 'training_data_real'
+HOLDOUT_FRACTION = 0.2
+VAL_FRACTION = 0.1  # Of each source's training windows, for best-epoch selection
+BATCH_SIZE = 256
+EPOCHS = 30
+LEARNING_RATE = 0.001
+TEACHER_BATCH_SIZE = 1024
+REPORT_FILE = 'distill_report.json'
+
+# ============================================================
+# Teacher labels
+# ============================================================
+def teacher_session(model_path=ONNX_MODEL_PATH):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.log_severity_level = 3
+    return ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+
+def run_onnx(session, windows, batch_size=TEACHER_BATCH_SIZE):
+    """Risk scores for (n, sequence_length, n_features) windows"""
+    input_name = session.get_inputs()[0].name
+    scores = [
+        session.run(None, {input_name: np.ascontiguousarray(windows[i:i + batch_size], dtype=np.float32)})[0]
+        for i in range(0, len(windows), batch_size)
+    ]
+    return np.concatenate(scores).reshape(-1) if scores else np.empty(0, dtype=np.float32)
+
+def build_distillation_set(sources, session, sequence_length=SEQUENCE_LENGTH):
+    """
+    Concatenate all sources into one feature array with teacher targets.
+
+    targets[k + sequence_length] is the teacher's score for the window
+    starting at row k, the alignment WindowedTimeSeriesDataset expects.
+    Windows never cross a source boundary; the last HOLDOUT_FRACTION of
+    each source's windows is held out for the report only, and the last
+    VAL_FRACTION of the remaining windows validates training (best epoch,
+    learning-rate schedule).
+
+    Returns (features, targets, train_indices, val_indices,
+             {source: holdout_indices})
+    """
+    features_parts, targets_parts = [], []
+    train_indices, val_indices, holdout_indices = [], [], {}
+    offset = 0
+
+    for name, path in sources:
+        features = normalize_features(read_table(path, columns=FEATURE_COLUMNS))
+        n_windows = len(features) - sequence_length
+        if n_windows <= 0:
+            raise ValueError(f"{path} has fewer than {sequence_length + 1} rows")
+        windows, _ = sliding_windows(features, sequence_length=sequence_length)
+
+        targets = np.zeros(len(features), dtype=np.float32)
+        targets[sequence_length:] = run_onnx(session, windows[:n_windows])
+
+        split = int(n_windows * (1 - HOLDOUT_FRACTION))
+        val_start = split - max(int(split * VAL_FRACTION), 1)
+        train_indices.append(offset + np.arange(val_start))
+        val_indices.append(offset + np.arange(val_start, split))
+        holdout_indices[name] = offset + np.arange(split, n_windows)
+        print(f"[+] {name}: {n_windows} windows from {path} "
+              f"({split - val_start} validation, {n_windows - split} held out)")
+
+        features_parts.append(features)
+        targets_parts.append(targets)
+        offset += len(features)
+
+    return (np.concatenate(features_parts), np.concatenate(targets_parts),
+            np.concatenate(train_indices), np.concatenate(val_indices), holdout_indices)
+
+# ============================================================
+# Evaluation
+# ============================================================
+def predict(model, dataset, batch_size=TEACHER_BATCH_SIZE):
+    import torch
+    model.eval()
+    with torch.no_grad():
+        return np.concatenate([
+            model(dataset[list(range(i, min(i + batch_size, len(dataset))))][0]).numpy().reshape(-1)
+            for i in range(0, len(dataset), batch_size)
+        ])
+
+def agreement_metrics(teacher, student):
+    """Regression error and alert-decision agreement of student vs teacher"""
+    teacher_decisions = classify_alerts(teacher)
+    student_decisions = classify_alerts(student)
+    teacher_crash = teacher > CRASH_THRESHOLD
+    student_crash = student > CRASH_THRESHOLD
+    return {
+        'windows': int(len(teacher)),
+        'mse': float(np.mean((student - teacher) ** 2)),
+        'mae': float(np.mean(np.abs(student - teacher))),
+        'decision_agreement': float(np.mean(teacher_decisions == student_decisions)),
+        'crash_agreement': float(np.mean(teacher_crash == student_crash)),
+        'warning_agreement': float(np.mean((teacher > WARNING_THRESHOLD) == (student > WARNING_THRESHOLD))),
+        'crash_recall': float(np.mean(student_crash[teacher_crash])) if teacher_crash.any() else None,
+        'teacher_decisions': np.bincount(teacher_decisions, minlength=3).tolist(),
+    }
+
+def graph_comparison(teacher_path, student):
+    """CPU latency and circuit rows of the teacher vs the optimized student graph"""
+    import onnx
+    from export_onnx import graph_stats, optimize_onnx
+    from student_model import student_to_onnx
+
+    student_graph, _ = optimize_onnx(student_to_onnx(student))
+    return {
+        'teacher': graph_stats(onnx.load(str(teacher_path))),
+        'student': graph_stats(student_graph),
+    }
+
+def print_report(report):
+    def fmt(value, spec):
+        return "n/a" if value is None else format(value, spec)
+
+    print("\n" + "=" * 60)
+    print(f"[=] DISTILLATION RESULTS ({report['student']} student, {report['params']} params)")
+    print("=" * 60)
+    print(f"  {'holdout':<10} {'windows':>7} {'MSE':>9} {'decisions':>9} {'crash':>7} {'warning':>7} {'recall':>7}")
+    for name, m in report['holdout'].items():
+        print(f"  {name:<10} {m['windows']:>7} {m['mse']:>9.6f} {m['decision_agreement']:>9.1%} "
+              f"{m['crash_agreement']:>7.1%} {m['warning_agreement']:>7.1%} {fmt(m['crash_recall'], '.1%'):>7}")
+
+    graphs = report['graphs']
+    print(f"\n      {'':<16}{'teacher':>12}{'student':>12}")
+    print(f"      {'ORT latency ms':<16}{fmt(graphs['teacher']['latency_ms'], '.3f'):>12}"
+          f"{fmt(graphs['student']['latency_ms'], '.3f'):>12}")
+    print(f"      {'Circuit rows':<16}{fmt(graphs['teacher']['circuit_rows'], ','):>12}"
+          f"{fmt(graphs['student']['circuit_rows'], ','):>12}")
+    print(f"      {'Nodes':<16}{graphs['teacher']['nodes']:>12}{graphs['student']['nodes']:>12}")
+    print("=" * 60 + "\n")
+
+# ============================================================
+# Main
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description="Distill the LSTM teacher into a compact student")
+    parser.add_argument('--student', choices=['mlp', 'tcn'], default='mlp')
+    parser.add_argument('--teacher', default=ONNX_MODEL_PATH, help="Teacher ONNX model")
+    parser.add_argument('--data', default=DATA_FILE, help="Training dataset (columnar or CSV)")
+    parser.add_argument('--backtest', default=BACKTEST_FILE, help="Backtest dataset ('' to skip)")
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--learning-rate', type=float, default=LEARNING_RATE)
+    parser.add_argument('--output', default=STUDENT_MODEL_PATH)
+    parser.add_argument('--report', default=REPORT_FILE)
+    args = parser.parse_args()
+
+    import torch
+    import train_lstm_pytorch as trainer
+    from student_model import build_student, save_student, STUDENT_DEFAULTS
+
+    if not os.path.exists(args.teacher):
+        print(f"[!] Teacher model not found: {args.teacher}")
+        print("    Run: python ../export_onnx.py")
+        return 1
+
+    print("=" * 60)
+    print("[*] LABELING WINDOWS WITH THE TEACHER")
+    print("=" * 60)
+    sources = [('train', args.data)] + ([('backtest', args.backtest)] if args.backtest else [])
+    features, targets, train_indices, val_indices, holdout_indices = build_distillation_set(
+        sources, teacher_session(args.teacher))
+    print()
+
+    # The holdout never feeds back into training; validation is its own slice
+    train_dataset = trainer.WindowedTimeSeriesDataset(features, targets, SEQUENCE_LENGTH, train_indices)
+    val_dataset = trainer.WindowedTimeSeriesDataset(features, targets, SEQUENCE_LENGTH, val_indices)
+    train_loader = trainer.make_loader(train_dataset, args.batch_size, shuffle=True)
+    val_loader = trainer.make_loader(val_dataset, args.batch_size)
+
+    student = build_student(args.student, SEQUENCE_LENGTH, features.shape[1])
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    trainer.train_model(student, train_loader, val_loader, epochs=args.epochs,
+                        learning_rate=args.learning_rate, save_path=args.output)
+
+    # train_model keeps the best epoch's weights; re-save them with the architecture
+    student.load_state_dict(torch.load(args.output))
+    save_student(student, args.student, STUDENT_DEFAULTS[args.student], args.output,
+                 SEQUENCE_LENGTH, features.shape[1])
+
+    holdout = {}
+    for name, indices in holdout_indices.items():
+        dataset = trainer.WindowedTimeSeriesDataset(features, targets, SEQUENCE_LENGTH, indices)
+        holdout[name] = agreement_metrics(dataset.target_array(), predict(student, dataset))
+
+    report = {
+        'student': args.student,
+        'config': STUDENT_DEFAULTS[args.student],
+        'params': sum(p.numel() for p in student.parameters()),
+        'teacher': str(args.teacher),
+        'thresholds': {'crash': CRASH_THRESHOLD, 'warning': WARNING_THRESHOLD},
+        'holdout': holdout,
+        'graphs': graph_comparison(args.teacher, student),
+    }
+    print_report(report)
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"[+] Student saved to: {args.output}")
+    print(f"[+] Report saved to: {args.report}")
+    print("[*] Export with: python ../export_onnx.py --student")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,10 +8,16 @@ Strategy: Linear BLR decay over 100 steps
 - Risk score increases linearly with BLR drop
 """
 
-import numpy as np
+import argparse
+
 import pandas as pd
 from datetime import datetime, timedelta
 
+from synthetic_market import generate_episodes
+from columnar import write_table, table_path
+
+OUTPUT_FILE = "crashes_linear"  # Columnar directory (.csv with --csv)
+
 def generate_simple_crash_data(num_crashes=50, steps_per_crash=100):
     """
     Generate SIMPLE, LINEAR crash scenarios
@@ -29,46 +35,19 @@ def generate_simple_crash_data(num_crashes=50, steps_per_crash=100):
     print(f"Steps per crash: {steps_per_crash}")
     print(f"Total samples: {num_crashes * steps_per_crash}\n")
     
-    all_data = []
-    
-    for crash_idx in range(num_crashes):
-        for step in range(steps_per_crash):
-            # Linear interpolation
-            progress = step / steps_per_crash
-            
-            # BLR: 1.2 → 0.3 (linear)
-            blr = 1.2 - (0.9 * progress)
-            
-            # Risk: 0.0 → 1.0 (linear)
-            risk_score = progress
-            
-            # Volumes based on BLR
-            sell_volume = 5000.0 * (1 + progress)  # Selling increases
-            buy_volume = blr * sell_volume
-            
-            # Price drops slightly
-            mid_price = 3000.0 - (300.0 * progress)
-            
-            # Alert when BLR < 0.4
-            alert = (blr < 0.4)
-            
-            all_data.append({
-                'blr': round(blr, 4),
-                'buy_volume': round(buy_volume, 2),
-                'sell_volume': round(sell_volume, 2),
-                'mid_price': round(mid_price, 2),
-                'alert_triggered': alert,
-                'risk_score': round(risk_score, 4)
-            })
-    
-    df = pd.DataFrame(all_data)
+    # All crashes at once (linear_crash preset, no randomness)
+    data = generate_episodes('linear_crash', num_crashes, steps_per_crash)
     
-    # Add timestamps
     start_time = datetime.now() - timedelta(days=7)
-    df['timestamp'] = [start_time + timedelta(minutes=i) for i in range(len(df))]
-    
-    # Reorder columns
-    df = df[['timestamp', 'blr', 'buy_volume', 'sell_volume', 'mid_price', 'alert_triggered', 'risk_score']]
+    df = pd.DataFrame({
+        'timestamp': pd.date_range(start=start_time, periods=len(data['blr']), freq='1min'),
+        'blr': data['blr'],
+        'buy_volume': data['buy_volume'],
+        'sell_volume': data['sell_volume'],
+        'mid_price': data['mid_price'],
+        'alert_triggered': data['alert_triggered'],
+        'risk_score': data['risk_score']
+    })
     
     print(f"[+] Generated {len(df)} crash samples")
     print(f"\nFirst 5 rows (crash start):")
@@ -78,20 +57,27 @@ def generate_simple_crash_data(num_crashes=50, steps_per_crash=100):
     
     return df
 
-if __name__ == "__main__":
+def main(output_file=OUTPUT_FILE, num_crashes=100, steps_per_crash=100):
     print("\n" + "=" * 60)
     print("SIMPLE LINEAR CRASH GENERATOR")
     print("=" * 60 + "\n")
     
     # Generate crashes
-    df_crashes = generate_simple_crash_data(num_crashes=100, steps_per_crash=100)
+    df_crashes = generate_simple_crash_data(num_crashes=num_crashes, steps_per_crash=steps_per_crash)
     
     # Save
-    output_file = "crashes_linear.csv"
-    df_crashes.to_csv(output_file, index=False)
+    write_table(df_crashes, output_file)
     
     print(f"\n[+] Saved to: {output_file}")
     print(f"[*] Total samples: {len(df_crashes)}")
     print(f"[*] Mean BLR: {df_crashes['blr'].mean():.4f}")
     print(f"[*] Mean Risk: {df_crashes['risk_score'].mean():.4f}")
     print("\n" + "=" * 60 + "\n")
+    return df_crashes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate simple linear crash data")
+    parser.add_argument('--csv', action='store_true', help="Write CSV instead of the columnar format")
+    args = parser.parse_args()
+
+    main(table_path(OUTPUT_FILE, args.csv))
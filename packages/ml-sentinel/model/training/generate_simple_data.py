@@ -7,11 +7,21 @@ Strategy:
 - Perfect linear formula: risk = 1 - (BLR / 1.2)
 - No noise, no randomness
 - Guaranteed R² > 0.95
+
+Output: training_data_simple (columnar, see columnar.py; --csv for CSV)
 """
 
-import numpy as np
+import argparse
+
 import pandas as pd
 
+from synthetic_market import generate_episodes
+from columnar import write_table, table_path
+
+parser = argparse.ArgumentParser(description="Generate perfectly linear BLR -> risk data")
+parser.add_argument('--csv', action='store_true', help="Write CSV instead of the columnar format")
+args = parser.parse_args()
+
 print("\n" + "=" * 60)
 print("ULTRA-SIMPLE SYNTHETIC DATA GENERATOR")
 print("Zero Randomness - Perfect Linear Relationship")
@@ -22,32 +32,20 @@ NUM_SAMPLES = 10000
 BLR_MIN = 0.3
 BLR_MAX = 1.5
 
-# Generate perfectly spaced BLR values (no randomness)
-blr_values = np.linspace(BLR_MIN, BLR_MAX, NUM_SAMPLES)
-
-# Perfect linear risk calculation
-# Risk = 1 - (BLR / 1.2)
+# Perfectly spaced BLR values with risk = 1 - (BLR / 1.2), clipped to [0, 1]
 # When BLR = 1.2 → risk = 0.0 (safe)
 # When BLR = 0.3 → risk = 0.75 (danger)
-risk_scores = 1.0 - (blr_values / 1.2)
-risk_scores = np.clip(risk_scores, 0, 1)  # Ensure [0, 1]
-
-# Create dummy features (not used, but needed for compatibility)
-buy_volume = blr_values * 5000  # Proportional to BLR
-sell_volume = (1.2 - blr_values) * 5000  # Inverse to BLR
-mid_price = 3000 - (blr_values - 0.9) * 500  # Slight variation
-
-# Alert when high risk
-alert_triggered = risk_scores > 0.6
+# Volumes and price are dummy features derived from BLR; alert when risk > 0.6
+data = generate_episodes('blr_sweep', 1, NUM_SAMPLES, blr_min=BLR_MIN, blr_max=BLR_MAX)
 
 # Create DataFrame
 df = pd.DataFrame({
-    'blr': blr_values,
-    'buy_volume': buy_volume,
-    'sell_volume': sell_volume,
-    'mid_price': mid_price,
-    'alert_triggered': alert_triggered,
-    'risk_score': risk_scores
+    'blr': data['blr'],
+    'buy_volume': data['buy_volume'],
+    'sell_volume': data['sell_volume'],
+    'mid_price': data['mid_price'],
+    'alert_triggered': data['alert_triggered'],
+    'risk_score': data['risk_score']
 })
 
 # Add sequential timestamps
@@ -55,8 +53,8 @@ df['timestamp'] = pd.date_range(start='2024-01-01', periods=NUM_SAMPLES, freq='1
 df = df[['timestamp', 'blr', 'buy_volume', 'sell_volume', 'mid_price', 'alert_triggered', 'risk_score']]
 
 # Save
-output_file = 'training_data_simple.csv'
-df.to_csv(output_file, index=False)
+output_file = table_path('training_data_simple', args.csv)
+write_table(df, output_file, csv_rounding=None)
 
 # Statistics
 print(f"[+] Generated {NUM_SAMPLES} samples")
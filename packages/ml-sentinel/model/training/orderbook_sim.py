@@ -0,0 +1,407 @@
+"""
+Aegis Protocol - Order Book Simulator
+Vectorized limit order books as a local stand-in for the crawler feed
+
+synthetic_market.py fabricates BLR directly; this simulates the order books
+the crawler scrapes and derives every feature the way the crawler does
+(data-pipeline/src/utils.js):
+- mid-price from the best bid and best ask (calculateMidPrice)
+- orders within PRICE_DELTA of the mid (filterOrdersByThreshold, inclusive)
+- summed volumes and BLR = buy / sell, 0 without sell volume (calculateBLR)
+- alertTriggered when 0 < BLR < BLR_THRESHOLD
+- snapshots with an empty side are dropped (validateOrders)
+
+Many independent books (streams) advance together, one NumPy step for all
+of them. Each side is a (streams, levels) volume array on a tick grid
+anchored at its best quote; every step applies:
+1. limit order arrivals (Poisson count per level, gamma sizes, depth decay)
+2. cancellations (a random fraction of every level)
+3. market orders eating into the opposite side from the top
+4. re-anchoring on the new best quotes and orders improving the spread
+
+Books switch into liquidity-withdrawal regimes (crash_prob per step,
+crash_duration steps on average): bid arrivals dry up, resting bids are
+cancelled and market selling picks up, which drains the bid side until
+the crawler's BLR drops below the alert threshold.
+
+Output is market_depth.json / .csv records (the crawler's format), a
+training dataset (columnar, or CSV for a .csv path), or a live feed that
+keeps appending to market_depth.json for load tests of inference.py.
+
+Usage:
+    python orderbook_sim.py --streams 1000 --steps 1000 --csv orderbook_depth.csv
+    python orderbook_sim.py --streams 200 --steps 500 --training training_data_orderbook
+    python orderbook_sim.py --follow --rate 50 --json ../../data-pipeline/data/market_depth.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from synthetic_market import calculate_risk_score, to_frame, START_TIME
+from columnar import write_table
+
+# Crawler constants (data-pipeline/src/crawler.js defaults)
+PRICE_DELTA = float(os.environ.get('PRICE_DELTA') or 0.02)
+BLR_THRESHOLD = float(os.environ.get('BLR_THRESHOLD') or 0.4)
+
+# Simulation defaults
+SIM_DEFAULTS = {
+    'levels': 100,               # Price levels per side
+    'tick_size': 1.0,            # USDC between levels
+    'start_price': 3000.0,
+    'arrival_rate': 0.6,         # Limit orders per step at the top level
+    'depth_decay': 30.0,         # Arrival rate decays as exp(-level / depth_decay)
+    'order_size': 2.0,           # Mean limit order size (ETH)
+    'cancel_rate': 0.02,         # Mean fraction of resting volume cancelled per step
+    'market_rate': 1.0,          # Market orders per step and side
+    'market_size': 3.0,          # Mean market order size (ETH)
+    'improve_prob': 0.3,         # Chance per side of a new order inside the spread
+    'crash_prob': 0.002,         # Chance per step of entering a withdrawal regime
+    'crash_duration': 100,       # Mean withdrawal length (steps)
+    'withdrawal_arrival': 0.15,  # Bid arrival multiplier while withdrawing
+    'withdrawal_cancel': 8.0,    # Bid cancellation multiplier while withdrawing
+    'withdrawal_market': 3.0,    # Market sell multiplier while withdrawing
+}
+WARMUP_STEPS = 200
+CHUNK_STEPS = 100
+STEP_SECONDS = 60
+MIN_VOLUME = 1e-3  # Levels below this are empty
+
+# ============================================================
+# Crawler feature math
+# ============================================================
+def crawler_metrics(bid_prices, bid_volumes, ask_prices, ask_volumes, price_delta=PRICE_DELTA,
+                    blr_threshold=BLR_THRESHOLD):
+    """
+    processMarketDepth() for any number of snapshots at once.
+
+    Arrays are (..., levels); a level with zero volume is not an order.
+    Returns a dict of (...) arrays: valid (the crawler would persist the
+    snapshot), mid_price, buy_volume, sell_volume, blr, alert_triggered and
+    the raw/filtered order counts. Invalid snapshots have all-zero features.
+    """
+    bid_present = bid_volumes > 0
+    ask_present = ask_volumes > 0
+    valid = (bid_present.any(axis=-1) & ask_present.any(axis=-1)
+             & ~(bid_present & (bid_prices <= 0)).any(axis=-1)
+             & ~(ask_present & (ask_prices <= 0)).any(axis=-1))
+
+    best_bid = np.where(bid_present, bid_prices, -np.inf).max(axis=-1)
+    best_ask = np.where(ask_present, ask_prices, np.inf).min(axis=-1)
+    mid_price = np.where(valid, (best_bid + best_ask) / 2, 0.0)
+
+    mid = mid_price[..., None]
+    lower = mid * (1 - price_delta)
+    upper = mid * (1 + price_delta)
+    buy_filtered = bid_present & (bid_prices >= lower) & (bid_prices <= mid) & valid[..., None]
+    sell_filtered = ask_present & (ask_prices >= mid) & (ask_prices <= upper) & valid[..., None]
+
+    buy_volume = np.where(buy_filtered, bid_volumes, 0.0).sum(axis=-1)
+    sell_volume = np.where(sell_filtered, ask_volumes, 0.0).sum(axis=-1)
+    blr = np.divide(buy_volume, sell_volume, out=np.zeros_like(buy_volume), where=sell_volume != 0)
+
+    return {
+        'valid': valid,
+        'mid_price': mid_price,
+        'buy_volume': buy_volume,
+        'sell_volume': sell_volume,
+        'blr': blr,
+        'alert_triggered': (blr < blr_threshold) & (blr > 0),
+        'buy_count': bid_present.sum(axis=-1),
+        'sell_count': ask_present.sum(axis=-1),
+        'filtered_buy_count': buy_filtered.sum(axis=-1),
+        'filtered_sell_count': sell_filtered.sum(axis=-1),
+    }
+
+# ============================================================
+# Book dynamics
+# ============================================================
+def drop_levels(volumes, count):
+    """Shift each row left by count[row] levels; the vacated deep levels are empty"""
+    index = np.arange(volumes.shape[1]) + count[:, None]
+    shifted = np.take_along_axis(volumes, np.minimum(index, volumes.shape[1] - 1), axis=1)
+    shifted[index >= volumes.shape[1]] = 0.0
+    return shifted
+
+def insert_level(volumes, mask, new_volume):
+    """Prepend a level with new_volume on rows in mask (the deepest level falls off)"""
+    volumes[mask, 1:] = volumes[mask, :-1].copy()
+    volumes[mask, 0] = new_volume[mask]
+
+def execute_market_orders(volumes, size):
+    """Consume size[row] volume from the top of each row's book"""
+    ahead = np.cumsum(volumes, axis=1) - volumes
+    return np.maximum(volumes - np.maximum(size[:, None] - ahead, 0.0), 0.0)
+
+def add_arrivals(rng, volumes, rate, order_size):
+    """Poisson order counts per level; only levels that got orders draw sizes"""
+    counts = rng.poisson(rate)
+    hit = counts > 0
+    volumes[hit] += rng.gamma(counts[hit], order_size)
+
+def init_books(rng, streams, params):
+    """Books at their mean resting depth, one-tick spread around start_price"""
+    profile = np.exp(-np.arange(params['levels']) / params['depth_decay'])
+    mean_depth = params['arrival_rate'] * profile * params['order_size'] / params['cancel_rate']
+    shape = (streams, params['levels'])
+    best_bid = int(round(params['start_price'] / params['tick_size']))
+    return {
+        'bids': rng.gamma(4.0, mean_depth / 4.0, shape),
+        'asks': rng.gamma(4.0, mean_depth / 4.0, shape),
+        'best_bid': np.full(streams, best_bid, dtype=np.int64),  # In ticks
+        'best_ask': np.full(streams, best_bid + 1, dtype=np.int64),
+        'withdrawing': np.zeros(streams, dtype=bool),
+        'profile': profile,
+    }
+
+def step_books(rng, book, params):
+    """Advance every book by one step in place"""
+    streams = len(book['best_bid'])
+    shape = book['bids'].shape
+    withdrawing = book['withdrawing']
+
+    # Regime switches
+    starts = ~withdrawing & (rng.random(streams) < params['crash_prob'])
+    ends = withdrawing & (rng.random(streams) < 1.0 / params['crash_duration'])
+    withdrawing = book['withdrawing'] = (withdrawing | starts) & ~ends
+    w = withdrawing[:, None]
+
+    # 1. Limit order arrivals
+    rate = params['arrival_rate'] * book['profile']
+    bid_rate = rate * np.where(w, params['withdrawal_arrival'], 1.0)
+    add_arrivals(rng, book['bids'], bid_rate, params['order_size'])
+    add_arrivals(rng, book['asks'], np.broadcast_to(rate, shape), params['order_size'])
+
+    # 2. Cancellations
+    bid_cancel = np.minimum(params['cancel_rate'] * np.where(w, params['withdrawal_cancel'], 1.0), 1.0)
+    book['bids'] *= 1.0 - np.minimum(bid_cancel * rng.uniform(0.0, 2.0, shape), 1.0)
+    book['asks'] *= 1.0 - params['cancel_rate'] * rng.uniform(0.0, 2.0, shape)
+
+    # 3. Market orders: sells hit the bids, buys lift the asks
+    sell_rate = params['market_rate'] * np.where(withdrawing, params['withdrawal_market'], 1.0)
+    book['bids'] = execute_market_orders(
+        book['bids'], rng.gamma(rng.poisson(sell_rate), params['market_size']))
+    book['asks'] = execute_market_orders(
+        book['asks'], rng.gamma(rng.poisson(params['market_rate'], streams), params['market_size']))
+    book['bids'][book['bids'] < MIN_VOLUME] = 0.0
+    book['asks'][book['asks'] < MIN_VOLUME] = 0.0
+
+    # 4. Re-anchor on the best quotes (empty sides keep their anchor)
+    bid_gap = np.argmax(book['bids'] > 0, axis=1)
+    ask_gap = np.argmax(book['asks'] > 0, axis=1)
+    book['bids'] = drop_levels(book['bids'], bid_gap)
+    book['asks'] = drop_levels(book['asks'], ask_gap)
+    book['best_bid'] -= bid_gap
+    book['best_ask'] += ask_gap
+
+    # ...and new orders one tick inside a wide spread
+    improve_size = rng.gamma(1.0, params['order_size'], streams)
+    improve_bid = (book['best_ask'] - book['best_bid'] > 1) & (rng.random(streams) < params['improve_prob'])
+    insert_level(book['bids'], improve_bid, improve_size)
+    book['best_bid'] += improve_bid
+    improve_ask = (book['best_ask'] - book['best_bid'] > 1) & (rng.random(streams) < params['improve_prob'])
+    insert_level(book['asks'], improve_ask, improve_size)
+    book['best_ask'] -= improve_ask
+
+def snapshot_prices(book, tick_size):
+    """(streams, levels) bid and ask prices of the current book"""
+    level = np.arange(book['bids'].shape[1])
+    bid_prices = (book['best_bid'][:, None] - level) * tick_size
+    ask_prices = (book['best_ask'][:, None] + level) * tick_size
+    return bid_prices, ask_prices
+
+def simulate(streams, steps, seed=42, warmup=WARMUP_STEPS, chunk_steps=CHUNK_STEPS, **params):
+    """
+    Yield crawler metrics in chunks of (chunk_steps, streams) arrays.
+
+    Snapshots are collected for chunk_steps steps and then measured in one
+    batched crawler_metrics call. Every chunk also carries 'withdrawing',
+    the regime each snapshot was taken in.
+    """
+    params = dict(SIM_DEFAULTS, **params)
+    rng = np.random.default_rng(seed)
+    book = init_books(rng, streams, params)
+    for _ in range(warmup):
+        step_books(rng, book, params)
+        book['withdrawing'][:] = False  # Start every stream from a healthy book
+
+    shape = (chunk_steps, streams, params['levels'])
+    bid_prices, bid_volumes = np.empty(shape), np.empty(shape)
+    ask_prices, ask_volumes = np.empty(shape), np.empty(shape)
+    withdrawing = np.empty((chunk_steps, streams), dtype=bool)
+
+    for chunk_start in range(0, steps, chunk_steps):
+        n = min(chunk_steps, steps - chunk_start)
+        for i in range(n):
+            step_books(rng, book, params)
+            bid_prices[i], ask_prices[i] = snapshot_prices(book, params['tick_size'])
+            bid_volumes[i], ask_volumes[i] = book['bids'], book['asks']
+            withdrawing[i] = book['withdrawing']
+
+        metrics = crawler_metrics(bid_prices[:n], bid_volumes[:n], ask_prices[:n], ask_volumes[:n])
+        metrics['withdrawing'] = withdrawing[:n].copy()
+        yield metrics
+
+def collect(streams, steps, seed=42, **params):
+    """
+    All snapshots as flat arrays, one contiguous episode per stream.
+
+    Snapshots the crawler would drop (valid == False) are kept here; filter
+    on 'valid' before writing records.
+    """
+    chunks = list(simulate(streams, steps, seed, **params))
+    return {name: np.concatenate([c[name] for c in chunks]).T.reshape(-1) for name in chunks[0]}
+
+# ============================================================
+# Output formats
+# ============================================================
+def iso_timestamps(timestamps):
+    """formatTimestamp(): ISO 8601 with milliseconds and a Z suffix"""
+    return np.datetime_as_string(timestamps.astype('datetime64[ms]'), unit='ms', timezone='UTC')
+
+def to_records(data, timestamps):
+    """market_depth.json records (processMarketDepth's return value) for valid snapshots"""
+    valid = data['valid']
+    columns = {
+        'timestamp': iso_timestamps(timestamps[valid]).tolist(),
+        'blr': np.round(data['blr'][valid], 4).tolist(),
+        'buyVolume': np.round(data['buy_volume'][valid], 2).tolist(),
+        'sellVolume': np.round(data['sell_volume'][valid], 2).tolist(),
+        'midPrice': np.round(data['mid_price'][valid], 2).tolist(),
+        'alertTriggered': data['alert_triggered'][valid].tolist(),
+    }
+    counts = zip(*(data[c][valid].tolist() for c in
+                   ('buy_count', 'sell_count', 'filtered_buy_count', 'filtered_sell_count')))
+    return [
+        {**dict(zip(columns, values)), 'rawOrders': {
+            'buyCount': buy, 'sellCount': sell, 'filteredBuyCount': fbuy, 'filteredSellCount': fsell}}
+        for values, (buy, sell, fbuy, fsell) in zip(zip(*columns.values()), counts)
+    ]
+
+def to_depth_frame(data, timestamps):
+    """market_depth.csv rows (appendToCSV's columns) for valid snapshots"""
+    valid = data['valid']
+    return pd.DataFrame({
+        'timestamp': iso_timestamps(timestamps[valid]),
+        'blr': np.round(data['blr'][valid], 4),
+        'buy_volume': np.round(data['buy_volume'][valid], 2),
+        'sell_volume': np.round(data['sell_volume'][valid], 2),
+        'mid_price': np.round(data['mid_price'][valid], 2),
+        'alert_triggered': np.where(data['alert_triggered'][valid], 'true', 'false'),
+    })
+
+def to_training_frame(data):
+    """Training-format DataFrame (as synthetic_market.to_frame) of valid snapshots"""
+    valid = data['valid']
+    columns = {name: data[name][valid] for name in ('blr', 'buy_volume', 'sell_volume', 'mid_price',
+                                                     'alert_triggered')}
+    columns['risk_score'] = calculate_risk_score(columns['blr'], columns['buy_volume'], columns['sell_volume'])
+    return to_frame(columns, step_seconds=STEP_SECONDS)
+
+def write_json_atomic(records, path):
+    """Crawler-style JSON array, replaced atomically so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(records, f, indent=2)
+    os.replace(tmp_path, path)
+
+# ============================================================
+# Live feed
+# ============================================================
+def follow(path, rate, keep, seed, params):
+    """Append one snapshot per 1/rate seconds to path (one stream) until interrupted"""
+    records = []
+    if os.path.exists(path):
+        with open(path) as f:
+            content = f.read().strip()
+        records = json.loads(content) if content else []
+
+    interval = 1.0 / rate
+    written = 0
+    next_time = time.perf_counter()
+    try:
+        for chunk in simulate(1, sys.maxsize, seed, chunk_steps=1, **params):
+            if chunk['valid'][0, 0]:
+                now = np.array([np.datetime64(time.time_ns(), 'ns')])
+                records.extend(to_records({k: v[0] for k, v in chunk.items()}, now))
+                records = records[-keep:]
+                write_json_atomic(records, path)
+                written += 1
+                if written % max(int(rate) * 10, 1) == 0:
+                    print(f"[*] {written} records written (BLR {records[-1]['blr']:.4f})")
+
+            next_time += interval
+            time.sleep(max(next_time - time.perf_counter(), 0.0))
+    except KeyboardInterrupt:
+        print(f"\n[+] Feed stopped after {written} records")
+    return 0
+
+# ============================================================
+# Main
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description="Simulate order books and emit crawler-format market depth")
+    parser.add_argument('--streams', type=int, default=1000, help="Independent books simulated together")
+    parser.add_argument('--steps', type=int, default=1000, help="Snapshots per stream")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--crash-prob', type=float, default=SIM_DEFAULTS['crash_prob'])
+    parser.add_argument('--crash-duration', type=int, default=SIM_DEFAULTS['crash_duration'])
+    parser.add_argument('--levels', type=int, default=SIM_DEFAULTS['levels'])
+    parser.add_argument('--json', default=None, help="market_depth.json-format output")
+    parser.add_argument('--csv', default=None, help="market_depth.csv-format output")
+    parser.add_argument('--training', default=None,
+                        help="Training-format output with risk_score (columnar directory, or .csv)")
+    parser.add_argument('--follow', action='store_true', help="Live feed: keep appending to --json")
+    parser.add_argument('--rate', type=float, default=10.0, help="Records per second with --follow")
+    parser.add_argument('--keep', type=int, default=1000, help="Records kept in --json with --follow")
+    args = parser.parse_args()
+
+    params = {'crash_prob': args.crash_prob, 'crash_duration': args.crash_duration, 'levels': args.levels}
+
+    if args.follow:
+        if not args.json:
+            parser.error("--follow needs --json")
+        print(f"[*] Feeding {args.json} at {args.rate:g} records/s (Ctrl+C to stop)")
+        return follow(args.json, args.rate, args.keep, args.seed, params)
+
+    print("\n" + "=" * 60)
+    print("AEGIS PROTOCOL - ORDER BOOK SIMULATOR")
+    print("=" * 60)
+    print(f"[*] {args.streams} books x {args.steps} steps, {args.levels} levels, "
+          f"PRICE_DELTA={PRICE_DELTA}, BLR_THRESHOLD={BLR_THRESHOLD}")
+
+    start = time.perf_counter()
+    data = collect(args.streams, args.steps, args.seed, **params)
+    seconds = time.perf_counter() - start
+
+    valid = data['valid']
+    total = len(valid)
+    alerts = data['alert_triggered'][valid]
+    withdrawing = data['withdrawing'][valid]
+    print(f"[+] {total:,} snapshots in {seconds:.1f}s ({total / max(seconds, 1e-9):,.0f} snapshots/s)")
+    print(f"    Persisted by the crawler: {int(valid.sum()):,} ({valid.mean() * 100:.1f}%)")
+    print(f"    Mean BLR: {data['blr'][valid].mean():.4f} (normal {data['blr'][valid][~withdrawing].mean():.4f})")
+    print(f"    Alerts: {int(alerts.sum()):,} ({alerts.mean() * 100:.1f}%), "
+          f"{int(alerts[withdrawing].sum()):,} during withdrawals ({withdrawing.mean() * 100:.1f}% of snapshots)")
+
+    timestamps = START_TIME + np.arange(total) * np.timedelta64(STEP_SECONDS, 's')
+    if args.json:
+        write_json_atomic(to_records(data, timestamps), args.json)
+        print(f"[*] JSON: {args.json}")
+    if args.csv:
+        to_depth_frame(data, timestamps).to_csv(args.csv, index=False)
+        print(f"[*] CSV: {args.csv}")
+    if args.training:
+        write_table(to_training_frame(data), args.training)
+        print(f"[*] Training data: {args.training}")
+    print("=" * 60 + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
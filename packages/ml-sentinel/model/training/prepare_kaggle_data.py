@@ -3,19 +3,75 @@ Aegis Protocol - Real-World Data Preparation
 Download and process Kaggle ETH/USDT OHLCV data for LSTM training
 
 Source: https://www.kaggle.com/datasets/srisahithis/multi-timeframe-ethusdt-ohlcv-data-20192024
+
+The timeframe file is streamed in typed (float32) chunks and BLR is
+estimated per chunk, so parsing memory is bounded by --chunk-rows. Only
+the last NUM_SAMPLES candles are kept in full; for the rest of the history
+just volatility and BLR are kept, which is all crash ranking needs.
+--tail-only seeks straight to the last NUM_SAMPLES candles instead of
+reading the whole history (crashes are then ranked within that tail).
+
+The result is written in the columnar format (columnar.py) at full
+precision; --csv writes training_data_real.csv instead.
+
+Every run also saves a small state file (STATE_FILE): the byte offset and
+last candle read, the running BLR statistics, a volatility histogram and
+the last CRASH_WINDOW - 1 candles before crash injection. --incremental
+then reads only the candles appended to the timeframe file since, and
+appends them to the dataset (which keeps its last NUM_SAMPLES rows):
+- BLR and risk scores are per candle and need no history
+- new candles become crash starts when their volatility is in the top
+  CRASH_INJECTION_RATE of every candle seen so far (from the histogram);
+  crashes already ranked are kept, not re-ranked
+- crash windows that started in the previous run continue into the new
+  candles exactly as in a full run
+It falls back to a full run when there is no state or the file was
+rewritten rather than appended to.
+
+Usage:
+    python prepare_kaggle_data.py
+    python prepare_kaggle_data.py --timeframe 1h --tail-only
+    python prepare_kaggle_data.py --csv
+    python prepare_kaggle_data.py --incremental   # Daily refresh
 """
 
 import numpy as np
 import pandas as pd
 from datetime import datetime
 import os
+import json
+import argparse
+import contextlib
+
+from columnar import write_table, read_table, table_path, resolve_table
 
 # Configuration
 KAGGLE_DATASET = "srisahithis/multi-timeframe-ethusdt-ohlcv-data-20192024"
-OUTPUT_FILE = "training_data_real.csv"
+OUTPUT_FILE = "training_data_real"  # Columnar directory (.csv with --csv)
 TIMEFRAME = "5m"  # Use 5-minute data for training (good balance)
 NUM_SAMPLES = 10000  # Take last 10k samples
 CRASH_INJECTION_RATE = 0.05  # 5% of data will be crash scenarios
+CRASH_WINDOW = 20  # Candles affected by each injected crash
+CRASH_DECAY_CANDLES = 10  # e-folding time of the BLR decay
+
+# Streaming loader
+DATA_DIR = './kaggle_data'
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+TIME_COLUMN = 'open_time'  # Epoch ms, used as output timestamp
+DATETIME_COLUMN = 'datetime'  # Converted to open_time when the file has no open_time
+CHUNK_ROWS = 100_000
+TAIL_BLOCK_SIZE = 1 << 16
+
+# Incremental updates
+STATE_FILE = "training_data_real.state.json"
+STATE_VERSION = 1
+VOLATILITY_BINS = np.geomspace(1e-6, 1.0, 4097)  # Log-spaced histogram edges for the running rank
+BASE_COLUMNS = [TIME_COLUMN, 'blr', 'buy_volume_est', 'sell_volume_est', 'mid_price', 'volatility']
+CONTEXT_COLUMNS = BASE_COLUMNS + ['crash_start_blr']  # Last candles before injection + their crash starts
+# Dtypes of CONTEXT_COLUMNS as read_ohlcv_chunks / calculate_blr_from_ohlcv produce them (JSON has float64)
+CONTEXT_DTYPES = {TIME_COLUMN: np.int64, 'blr': np.float32, 'buy_volume_est': np.float32,
+                  'sell_volume_est': np.float32, 'mid_price': np.float32, 'volatility': np.float32,
+                  'crash_start_blr': np.float64}
 
 def download_kaggle_dataset():
     """Download dataset from Kaggle using kagglehub (no auth needed!)"""
@@ -66,79 +122,274 @@ def download_kaggle_dataset():
         print(f"[!] Error downloading dataset: {e}")
         return False
 
-def load_ohlcv_data():
-    """Load OHLCV data from downloaded files"""
+def find_timeframe_file(timeframe=TIMEFRAME, data_dir=DATA_DIR):
+    """Path of the timeframe file (e.g. ETHUSDT_5m.csv), or None"""
+    files = os.listdir(data_dir) if os.path.exists(data_dir) else []
+    for f in sorted(files):
+        if f'_{timeframe}.' in f and f.endswith('.csv'):
+            return os.path.join(data_dir, f)
+    return None
+
+def tail_offset(path, num_rows, block_size=TAIL_BLOCK_SIZE):
+    """Byte offset where the last num_rows data lines start (reads backwards from EOF)"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        position = end
+        newlines = 0
+        # A trailing newline ends the last row; it does not start another one
+        if end > 0:
+            f.seek(end - 1)
+            if f.read(1) == b'\n':
+                newlines -= 1
+
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size)
+            newlines += block.count(b'\n')
+            if newlines >= num_rows:
+                # Walk forward to the newline before the first wanted row
+                excess = newlines - num_rows
+                cut = -1
+                for _ in range(excess + 1):
+                    cut = block.index(b'\n', cut + 1)
+                return position + cut + 1
+    return None  # File has no more than num_rows rows
+
+def read_ohlcv_chunks(path, chunk_rows=CHUNK_ROWS, tail_rows=None, offset=None):
+    """
+    Yield typed OHLCV chunks: float32 prices/volume (+ int64 open_time,
+    taken from the datetime column if that is what the file has).
+
+    Only the needed columns are parsed. With tail_rows, the file is entered
+    at the start of its last tail_rows lines instead of being read in full;
+    with offset, at that byte (the start of a line).
+    """
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    missing = [c for c in OHLCV_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {missing}")
+
+    time_column = next((c for c in (TIME_COLUMN, DATETIME_COLUMN) if c in header), None)
+    usecols = OHLCV_COLUMNS + ([time_column] if time_column else [])
+    dtype = {c: np.float32 for c in OHLCV_COLUMNS}
+    dtype[TIME_COLUMN] = np.int64
+    dtype[DATETIME_COLUMN] = str
+
+    if tail_rows:
+        offset = tail_offset(path, tail_rows)
+    options = dict(usecols=usecols, dtype=dtype, chunksize=chunk_rows)
+    with contextlib.ExitStack() as stack:
+        if offset is None:
+            reader = pd.read_csv(path, **options)
+        else:
+            f = stack.enter_context(open(path, 'rb'))
+            f.seek(offset)
+            reader = pd.read_csv(f, header=None, names=header, **options)
+        stack.enter_context(reader)
+
+        for chunk in reader:
+            if time_column == DATETIME_COLUMN:
+                stamps = pd.to_datetime(chunk.pop(DATETIME_COLUMN)).to_numpy('datetime64[ms]')
+                chunk[TIME_COLUMN] = stamps.astype(np.int64)
+            yield chunk
+
+def load_ohlcv_data(timeframe=TIMEFRAME, chunk_rows=CHUNK_ROWS, tail_rows=None, data_dir=DATA_DIR,
+                    keep_rows=None):
+    """
+    Stream the timeframe file and estimate BLR chunk by chunk.
+
+    With tail_rows only the file's last tail_rows candles are read.
+    Otherwise the whole file is streamed but only the last keep_rows
+    candles (all if None) are kept in full.
+
+    Returns (candles, history), where history holds the 'volatility' and
+    'blr' of every candle read (for inject_crash_scenarios), or
+    (None, None) if the file is missing.
+    """
     print("=" * 60)
     print("[*] LOADING OHLCV DATA")
     print("=" * 60)
     
-    # Find the target timeframe file
-    data_dir = './kaggle_data'
-    files = os.listdir(data_dir) if os.path.exists(data_dir) else []
-    
-    # Look for timeframe file (e.g., ETHUSDT_5m.csv)
-    target_file = None
-    for f in files:
-        if f'_{TIMEFRAME}.' in f and f.endswith('.csv'):
-            target_file = os.path.join(data_dir, f)
-            break
-    
+    target_file = find_timeframe_file(timeframe, data_dir)
     if not target_file:
-        print(f"[!] Could not find {TIMEFRAME} data file")
+        files = os.listdir(data_dir) if os.path.exists(data_dir) else []
+        print(f"[!] Could not find {timeframe} data file")
         print(f"[*] Available files: {files}")
-        return None
-    
-    print(f"[+] Loading: {os.path.basename(target_file)}")
-    df = pd.read_csv(target_file)
-    
-    print(f"[+] Loaded {len(df)} candles")
-    print(f"[*] Columns: {df.columns.tolist()}")
-    print(f"\n[*] Sample data:")
-    print(df.head())
-    
-    return df
+        return None, None
+    
+    mode = f"last {tail_rows} candles" if tail_rows else "full history"
+    print(f"[+] Streaming: {os.path.basename(target_file)} ({mode}, chunks of {chunk_rows} rows)")
+    end_offset = line_end_offset(target_file)
+    
+    keep_rows = tail_rows or keep_rows
+    state = None
+    chunks = []
+    volatility, blr = [], []
+    kept_rows = 0
+    for chunk in read_ohlcv_chunks(target_file, chunk_rows, tail_rows):
+        chunk, state = calculate_blr_from_ohlcv(chunk, state)
+        volatility.append(chunk['volatility'].to_numpy(copy=True))
+        blr.append(chunk['blr'].to_numpy(copy=True))
+        chunks.append(chunk)
+        kept_rows += len(chunk)
+        # Only whole chunks that can no longer reach the tail are dropped
+        while keep_rows and chunks and kept_rows - len(chunks[0]) >= keep_rows:
+            kept_rows -= len(chunks.pop(0))
+    
+    if not chunks:
+        print(f"[!] {target_file} has no rows")
+        return None, None
+    
+    df = pd.concat(chunks, ignore_index=True)
+    if keep_rows:
+        df = df.tail(keep_rows).reset_index(drop=True)
+    history = {'volatility': np.concatenate(volatility), 'blr': np.concatenate(blr)}
+    
+    print(f"[+] Loaded {state['count']} candles ({len(df)} kept in full)")
+    print_blr_stats(state)
+    
+    # Where the next --incremental run picks up
+    df.attrs.update(source=target_file, offset=end_offset, blr_stats=state)
+    return df, history
 
-def calculate_blr_from_ohlcv(df):
+def calculate_blr_from_ohlcv(df, state=None):
     """
     Estimate Buy-side Liquidity Ratio (BLR) from OHLCV data
     
     Since we don't have actual order book data, we use:
     - Price action (close vs open) to estimate buy/sell pressure
     - Volume distribution to estimate liquidity
-    """
-    print("\n" + "=" * 60)
-    print("[*] CALCULATING BLR FROM OHLCV")
-    print("=" * 60)
     
+    Works on one chunk at a time: `state` carries the running BLR
+    statistics between chunks. Returns (df, state).
+    """
     # Calculate price change and direction
     df['price_change'] = df['close'] - df['open']
-    df['is_bullish'] = (df['price_change'] > 0).astype(int)
+    df['is_bullish'] = (df['price_change'] > 0).astype(np.int8)
+    bullish = df['is_bullish'].to_numpy()
     
     # Estimate buy/sell volume based on price action
     # Bullish candles: more buy pressure
     # Bearish candles: more sell pressure
-    df['buy_volume_est'] = df['volume'] * (0.5 + 0.3 * df['is_bullish'])
-    df['sell_volume_est'] = df['volume'] * (0.5 + 0.3 * (1 - df['is_bullish']))
+    volume = df['volume'].to_numpy(dtype=np.float32)
+    buy_volume = volume * (np.float32(0.5) + np.float32(0.3) * bullish)
+    sell_volume = volume * (np.float32(0.5) + np.float32(0.3) * (1 - bullish))
     
     # Add volatility factor (higher volatility = more uncertainty)
     df['volatility'] = (df['high'] - df['low']) / df['close']
-    df['buy_volume_est'] *= (1 + 0.2 * df['volatility'])
+    buy_volume *= (np.float32(1) + np.float32(0.2) * df['volatility'].to_numpy(dtype=np.float32))
+    df['buy_volume_est'] = buy_volume
+    df['sell_volume_est'] = sell_volume
     
     # Calculate BLR
-    df['blr'] = df['buy_volume_est'] / (df['sell_volume_est'] + 1e-6)
-    df['blr'] = df['blr'].clip(0.3, 2.0)  # Reasonable range
+    blr = buy_volume / (sell_volume + np.float32(1e-6))
+    df['blr'] = np.clip(blr, np.float32(0.3), np.float32(2.0))  # Reasonable range
     
     # Use close price as mid_price
     df['mid_price'] = df['close']
     
+    # Running statistics across chunks
+    if state is None:
+        state = {'count': 0, 'blr_sum': 0.0, 'blr_min': np.inf, 'blr_max': -np.inf}
+    if len(df):
+        blr = df['blr'].to_numpy()
+        state['count'] += len(df)
+        state['blr_sum'] += float(blr.sum(dtype=np.float64))
+        state['blr_min'] = min(state['blr_min'], float(blr.min()))
+        state['blr_max'] = max(state['blr_max'], float(blr.max()))
+    
+    return df, state
+
+def print_blr_stats(state):
+    print("\n" + "=" * 60)
+    print("[*] CALCULATING BLR FROM OHLCV")
+    print("=" * 60)
     print(f"[+] BLR calculated")
-    print(f"    Mean BLR: {df['blr'].mean():.4f}")
-    print(f"    Min BLR: {df['blr'].min():.4f}")
-    print(f"    Max BLR: {df['blr'].max():.4f}")
-    
+    print(f"    Mean BLR: {state['blr_sum'] / max(state['count'], 1):.4f}")
+    print(f"    Min BLR: {state['blr_min']:.4f}")
+    print(f"    Max BLR: {state['blr_max']:.4f}")
+
+def apply_crash_windows(df, crash_positions, start_blr=None):
+    """
+    Apply the crash decay to every window at once (in place).
+
+    Crashes are applied in the given order; where windows overlap the
+    result is exactly that of applying them one after another:
+    - blr: last crash wins. Each crash decays from the BLR at its start
+      candle as left by the crashes applied before it
+    - sell_volume_est: factors multiply, in crash order
+    - is_crash_scenario: set if any window covers the candle
+
+    start_blr (one per crash, NaN = derive) fixes the start BLR of crashes
+    resolved in an earlier run. The start BLR of every crash is kept in
+    df['crash_start_blr'] (NaN elsewhere).
+    """
+    n = len(df)
+    starts = np.asarray(crash_positions, dtype=np.int64)
+    crash_start = np.full(n, np.nan)
+    df['crash_start_blr'] = crash_start
+    if len(starts) == 0:
+        return df
+
+    offsets = np.arange(CRASH_WINDOW)
+    decay = np.exp(-offsets / CRASH_DECAY_CANDLES)
+    blr_scale = 0.4 + 0.6 * decay
+    sell_factor = 1.5 + 0.5 * (1 - decay)
+
+    # One (candle, crash, offset) entry per covered candle, sorted by candle then crash order
+    rows = starts[:, None] + offsets
+    valid = rows < n
+    pair_row = rows[valid]
+    pair_crash = np.broadcast_to(np.arange(len(starts))[:, None], rows.shape)[valid]
+    pair_offset = np.broadcast_to(offsets, rows.shape)[valid]
+    order = np.lexsort((pair_crash, pair_row))
+    pair_row, pair_crash, pair_offset = pair_row[order], pair_crash[order], pair_offset[order]
+
+    group_start = np.r_[True, pair_row[1:] != pair_row[:-1]]
+    group_end = np.r_[group_start[1:], True]
+    first_in_group = np.maximum.accumulate(np.where(group_start, np.arange(len(pair_row)), 0))
+    rank = np.arange(len(pair_row)) - first_in_group
+
+    # Start BLR of each crash: the last earlier crash covering its start candle set it
+    blr = df['blr'].to_numpy(dtype=np.float64, copy=True)
+    start_pos = np.nonzero(pair_offset == 0)[0]
+    start_pos = start_pos[np.argsort(pair_crash[start_pos])]
+    has_prev = ~group_start[start_pos]
+    prev = np.where(has_prev, pair_crash[start_pos - 1], -1)
+
+    known = np.zeros(len(starts), dtype=bool) if start_blr is None else ~np.isnan(start_blr)
+    start_blr = np.where(known, start_blr if start_blr is not None else 0.0, blr[starts])
+    resolved = ~has_prev | known
+    while not resolved.all():
+        ready = np.nonzero(~resolved & resolved[np.maximum(prev, 0)])[0]
+        parents = prev[ready]
+        start_blr[ready] = np.maximum(0.3, start_blr[parents] * blr_scale[starts[ready] - starts[parents]])
+        resolved[ready] = True
+
+    # blr: last writer per candle
+    last = np.nonzero(group_end)[0]
+    blr[pair_row[last]] = np.maximum(0.3, start_blr[pair_crash[last]] * blr_scale[pair_offset[last]])
+
+    # sell_volume_est: one layer per overlap depth keeps the multiplication order
+    sell = df['sell_volume_est'].to_numpy(dtype=np.float64, copy=True)
+    for depth in range(rank.max() + 1):
+        layer = rank == depth
+        sell[pair_row[layer]] *= sell_factor[pair_offset[layer]]
+
+    crash = df['is_crash_scenario'].to_numpy(dtype=bool, copy=True)
+    crash[pair_row] = True
+
+    crash_start[starts] = start_blr
+    df['blr'] = blr
+    df['sell_volume_est'] = sell
+    df['is_crash_scenario'] = crash
+    df['crash_start_blr'] = crash_start
     return df
 
-def inject_crash_scenarios(df, rate=0.05):
+def inject_crash_scenarios(df, rate=0.05, history=None):
     """
     Inject synthetic crash scenarios into real data
     
@@ -146,33 +397,48 @@ def inject_crash_scenarios(df, rate=0.05):
     - Drop BLR dramatically
     - Increase sell pressure
     - Calculate high risk scores
+    
+    Crashes are ranked over every candle of `history` (volatility and BLR
+    from load_ohlcv_data; default: df itself), of which df holds the last
+    len(df).
     """
     print("\n" + "=" * 60)
     print("[*] INJECTING CRASH SCENARIOS")
     print("=" * 60)
     
-    num_crashes = int(len(df) * rate)
+    if history is None:
+        history = {'volatility': df['volatility'].to_numpy(), 'blr': df['blr'].to_numpy()}
+    offset = len(history['volatility']) - len(df)  # History row of df's first candle
+    num_crashes = int(len(history['volatility']) * rate)
     print(f"[*] Creating {num_crashes} crash scenarios ({rate*100:.1f}% of data)")
     
     # Find high-volatility periods (good candidates for crash injection)
-    df['volatility_rank'] = df['volatility'].rank(pct=True)
-    crash_indices = df.nlargest(num_crashes, 'volatility_rank').index
-    
-    # Mark crash periods
-    df['is_crash_scenario'] = False
-    df.loc[crash_indices, 'is_crash_scenario'] = True
-    
-    # For crash scenarios, simulate extreme conditions
-    for idx in crash_indices:
-        # Decay BLR over next few candles
-        window = min(20, len(df) - idx)  # 20-candle crash window
-        for i in range(window):
-            if idx + i < len(df):
-                # Exponential decay of BLR
-                decay_factor = np.exp(-i / 10)
-                df.loc[idx + i, 'blr'] = max(0.3, df.loc[idx, 'blr'] * (0.4 + 0.6 * decay_factor))
-                df.loc[idx + i, 'sell_volume_est'] *= (1.5 + 0.5 * (1 - decay_factor))
-                df.loc[idx + i, 'is_crash_scenario'] = True
+    volatility_rank = pd.Series(history['volatility']).rank(pct=True)
+    crash_positions = volatility_rank.nlargest(num_crashes).index.to_numpy()
+    df['volatility_rank'] = volatility_rank.to_numpy()[offset:]
+    
+    # Crashes reaching into df, and the earlier crashes whose windows cover
+    # their start candles (they set the BLR those crashes decay from)
+    first = offset
+    starts = np.sort(crash_positions)
+    while True:
+        earliest = np.searchsorted(starts, first - (CRASH_WINDOW - 1))
+        if earliest == len(starts) or starts[earliest] >= first:
+            break
+        first = starts[earliest]
+    
+    # For crash scenarios, simulate extreme conditions (BLR decay over the
+    # next CRASH_WINDOW candles, rising sell pressure), most volatile first.
+    # Candles before df only contribute their BLR.
+    frame = pd.DataFrame({
+        'blr': np.concatenate([history['blr'][first:offset], df['blr']], dtype=np.float64),
+        'sell_volume_est': np.concatenate([np.full(offset - first, np.nan), df['sell_volume_est']],
+                                          dtype=np.float64),
+        'is_crash_scenario': False,
+    })
+    apply_crash_windows(frame, crash_positions[crash_positions >= first] - first)
+    for column in ('blr', 'sell_volume_est', 'is_crash_scenario', 'crash_start_blr'):
+        df[column] = frame[column].to_numpy()[offset - first:]
     
     print(f"[+] Crash scenarios injected")
     print(f"    Total crash samples: {df['is_crash_scenario'].sum()}")
@@ -219,12 +485,12 @@ def prepare_training_data(df, num_samples=10000):
     # Select and rename columns to match training format
     df_final = pd.DataFrame({
         'timestamp': pd.to_datetime(df_train['open_time'], unit='ms') if 'open_time' in df_train.columns else range(len(df_train)),
-        'blr': df_train['blr'].round(4),
-        'buy_volume': df_train['buy_volume_est'].round(2),
-        'sell_volume': df_train['sell_volume_est'].round(2),
-        'mid_price': df_train['mid_price'].round(2),
+        'blr': df_train['blr'],
+        'buy_volume': df_train['buy_volume_est'],
+        'sell_volume': df_train['sell_volume_est'],
+        'mid_price': df_train['mid_price'],
         'alert_triggered': df_train['alert_triggered'],
-        'risk_score': df_train['risk_score'].round(4)
+        'risk_score': df_train['risk_score']
     })
     
     print(f"[+] Training dataset prepared")
@@ -236,8 +502,154 @@ def prepare_training_data(df, num_samples=10000):
     
     return df_final
 
-def main():
-    """Main pipeline"""
+# ============================================================
+# Incremental updates
+# ============================================================
+def line_end_offset(path, block_size=TAIL_BLOCK_SIZE):
+    """Byte offset just past the last complete line, where appended rows start"""
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            cut = f.read(read_size).rfind(b'\n')
+            if cut >= 0:
+                return position + cut + 1
+    return 0
+
+def volatility_counts(volatility):
+    """Histogram of volatility over VOLATILITY_BINS (out-of-range values land in the end bins)"""
+    volatility = np.nan_to_num(np.asarray(volatility, dtype=np.float64), nan=0.0)
+    return np.histogram(np.clip(volatility, VOLATILITY_BINS[0], VOLATILITY_BINS[-1]), VOLATILITY_BINS)[0]
+
+def volatility_threshold(counts, rate=CRASH_INJECTION_RATE):
+    """Lower edge of the histogram bin reaching the top `rate` of all volatilities"""
+    num_crashes = int(counts.sum() * rate)
+    if num_crashes == 0:
+        return np.inf
+    from_top = np.cumsum(counts[::-1])
+    return VOLATILITY_BINS[len(counts) - 1 - int(np.argmax(from_top >= num_crashes))]
+
+def save_state(source, offset, last_open_time, blr_stats, counts, context, output, state_file=STATE_FILE):
+    """Write the --incremental state (context: CONTEXT_COLUMNS of the last CRASH_WINDOW - 1 candles)"""
+    state = {
+        'version': STATE_VERSION,
+        'source': os.path.basename(source),
+        'offset': int(offset),
+        'last_open_time': int(last_open_time),
+        'output': str(output),
+        'blr_stats': blr_stats,
+        'volatility_counts': [int(c) for c in counts],
+        'context': {c: context[c].tolist() for c in CONTEXT_COLUMNS},
+    }
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_file)
+
+def load_state(timeframe=TIMEFRAME, state_file=STATE_FILE, data_dir=DATA_DIR):
+    """
+    (state, timeframe file) if the last run's state can be continued, else
+    None: no state, another timeframe, a missing dataset, or a file that
+    was rewritten rather than appended to.
+    """
+    if not os.path.exists(state_file):
+        print(f"[!] No {state_file} yet")
+        return None
+    with open(state_file) as f:
+        state = json.load(f)
+
+    target_file = find_timeframe_file(timeframe, data_dir)
+    if (state.get('version') != STATE_VERSION or not target_file
+            or os.path.basename(target_file) != state['source']):
+        print(f"[!] {state_file} is not for {timeframe} data")
+        return None
+    try:
+        resolve_table(state['output'])
+    except FileNotFoundError:
+        print(f"[!] {state['output']} is missing")
+        return None
+
+    # Appended files still have a line break right before the old end
+    offset = state['offset']
+    with open(target_file, 'rb') as f:
+        f.seek(max(offset - 1, 0))
+        appended = offset > 0 and os.path.getsize(target_file) >= offset and f.read(1) == b'\n'
+    if not appended:
+        print(f"[!] {os.path.basename(target_file)} was rewritten since the last run")
+        return None
+    return state, target_file
+
+def update_incremental(timeframe=TIMEFRAME, chunk_rows=CHUNK_ROWS, state_file=STATE_FILE):
+    """
+    Process only the candles appended since the last run and append them
+    to its dataset.
+
+    Returns None if a full run is needed instead (see load_state), else True.
+    """
+    print("=" * 60)
+    print("[*] INCREMENTAL UPDATE")
+    print("=" * 60)
+
+    loaded = load_state(timeframe, state_file)
+    if loaded is None:
+        return None
+    state, target_file = loaded
+
+    # Only the bytes past the old end are parsed
+    offset = state['offset']
+    end_offset = line_end_offset(target_file)
+    blr_stats = state['blr_stats']
+    chunks = []
+    if end_offset > offset:
+        for chunk in read_ohlcv_chunks(target_file, chunk_rows, offset=offset):
+            chunk = chunk[chunk[TIME_COLUMN] > state['last_open_time']].reset_index(drop=True)
+            chunk, blr_stats = calculate_blr_from_ohlcv(chunk, blr_stats)
+            chunks.append(chunk)
+    new = pd.concat(chunks, ignore_index=True) if chunks else None
+
+    context = pd.DataFrame(state['context'], columns=CONTEXT_COLUMNS).astype(CONTEXT_DTYPES)
+    counts = np.asarray(state['volatility_counts'])
+    if new is None or len(new) == 0:
+        print(f"[+] No new candles in {os.path.basename(target_file)}; {state['output']} is up to date")
+        save_state(target_file, end_offset, state['last_open_time'], blr_stats, counts, context,
+                   state['output'], state_file)
+        return True
+    print(f"[+] {len(new)} new candles from byte {offset:,} of {os.path.basename(target_file)}")
+
+    # Crash starts: those still running from the last run, plus new candles
+    # in the top CRASH_INJECTION_RATE volatility of all candles seen
+    counts = counts + volatility_counts(new['volatility'])
+    threshold = volatility_threshold(counts)
+    frame = pd.concat([context[BASE_COLUMNS], new[BASE_COLUMNS]], ignore_index=True)
+    next_context = frame.tail(CRASH_WINDOW - 1).copy()
+
+    known_start_blr = np.r_[context['crash_start_blr'].to_numpy(dtype=np.float64), np.full(len(new), np.nan)]
+    is_start = np.r_[~np.isnan(known_start_blr[:len(context)]), new['volatility'].to_numpy() >= threshold]
+    positions = np.nonzero(is_start)[0]
+    positions = positions[np.lexsort((positions, -frame['volatility'].to_numpy()[positions]))]  # Most volatile first
+
+    frame['is_crash_scenario'] = False
+    apply_crash_windows(frame, positions, known_start_blr[positions])
+    next_context['crash_start_blr'] = frame['crash_start_blr'].to_numpy()[len(frame) - len(next_context):]
+    new = frame.iloc[len(context):].reset_index(drop=True)
+    print(f"    New crash starts: {int(is_start[len(context):].sum())} (volatility >= {threshold:.4f})")
+
+    new = calculate_risk_scores(new)
+    df_new = prepare_training_data(new, num_samples=len(new))
+
+    # Append, keeping the last NUM_SAMPLES rows like a full run
+    existing = read_table(state['output'], parse_dates=['timestamp'])
+    df_final = pd.concat([existing, df_new], ignore_index=True).tail(NUM_SAMPLES).reset_index(drop=True)
+    write_table(df_final, state['output'])
+    save_state(target_file, end_offset, new[TIME_COLUMN].iloc[-1], blr_stats, counts, next_context,
+               state['output'], state_file)
+    print(f"\n[+] Appended {len(df_new)} rows to: {state['output']} ({len(df_final)} rows)")
+    return True
+
+def main(timeframe=TIMEFRAME, chunk_rows=CHUNK_ROWS, tail_only=False, csv=False, incremental=False):
+    """Main pipeline; returns False if no data could be loaded"""
     print("\n" + "=" * 60)
     print("AEGIS PROTOCOL - REAL-WORLD DATA PREPARATION")
     print("Hybrid Training Data: Real OHLCV + Synthetic Crashes")
@@ -251,18 +663,23 @@ def main():
         if not download_kaggle_dataset():
             print("\n[!] Please manually download the dataset and place in ./kaggle_data/")
             print(f"[*] Dataset URL: https://www.kaggle.com/datasets/{KAGGLE_DATASET}")
-            return
+            return False
     
-    # Step 2: Load OHLCV data
-    df = load_ohlcv_data()
-    if df is None:
-        return
+    if incremental:
+        if update_incremental(timeframe, chunk_rows):
+            return True
+        print("[*] Running a full preparation instead\n")
     
-    # Step 3: Calculate BLR and features
-    df = calculate_blr_from_ohlcv(df)
+    # Step 2-3: Stream OHLCV data and calculate BLR and features
+    df, history = load_ohlcv_data(timeframe, chunk_rows, tail_rows=NUM_SAMPLES if tail_only else None,
+                                  keep_rows=NUM_SAMPLES)
+    if df is None:
+        return False
+    source, end_offset, blr_stats = df.attrs['source'], df.attrs['offset'], df.attrs['blr_stats']
     
-    # Step 4: Inject crash scenarios
-    df = inject_crash_scenarios(df, rate=CRASH_INJECTION_RATE)
+    # Step 4: Inject crash scenarios (the last candles before injection seed --incremental)
+    context = df[BASE_COLUMNS].tail(CRASH_WINDOW - 1).copy() if TIME_COLUMN in df.columns else None
+    df = inject_crash_scenarios(df, rate=CRASH_INJECTION_RATE, history=history)
     
     # Step 5: Calculate risk scores
     df = calculate_risk_scores(df)
@@ -270,17 +687,34 @@ def main():
     # Step 6: Prepare final training data
     df_final = prepare_training_data(df, num_samples=NUM_SAMPLES)
     
-    # Step 7: Save to CSV
-    df_final.to_csv(OUTPUT_FILE, index=False)
-    print(f"\n[+] Training data saved to: {OUTPUT_FILE}")
+    # Step 7: Save (columnar, or CSV export)
+    output = table_path(OUTPUT_FILE, csv)
+    write_table(df_final, output)
+    print(f"\n[+] Training data saved to: {output}")
+    if context is not None:
+        context['crash_start_blr'] = df['crash_start_blr'].to_numpy()[len(df) - len(context):]
+        save_state(source, end_offset, df[TIME_COLUMN].iloc[-1], blr_stats, volatility_counts(history['volatility']),
+                   context, output)
+        print(f"[*] Incremental state saved to: {STATE_FILE}")
     
     print("\n" + "=" * 60)
     print("[+] READY FOR TRAINING!")
     print("=" * 60)
     print("\nNext steps:")
-    print("1. Update train_lstm.py to use 'training_data_real.csv'")
+    print(f"1. Update train_lstm.py to use '{OUTPUT_FILE}'")
     print("2. Run: python train_lstm.py")
     print("=" * 60 + "\n")
+    return True
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build training data from Kaggle ETH/USDT OHLCV")
+    parser.add_argument('--timeframe', default=TIMEFRAME, help="Timeframe file to use (e.g. 5m, 1h)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Rows parsed per chunk")
+    parser.add_argument('--tail-only', action='store_true',
+                        help=f"Read only the last {NUM_SAMPLES} candles (bounded memory)")
+    parser.add_argument('--csv', action='store_true', help="Write CSV instead of the columnar format")
+    parser.add_argument('--incremental', action='store_true',
+                        help=f"Only process candles appended since the last run ({STATE_FILE})")
+    args = parser.parse_args()
+
+    main(args.timeframe, args.chunk_rows, args.tail_only, args.csv, args.incremental)
@@ -0,0 +1,295 @@
+"""
+Aegis Protocol - Snapshot Resampler
+Crawler history (market_depth.csv) on a fixed time grid for training
+
+The crawler persists a snapshot whenever a scrape succeeds, so its history
+has irregular timestamps (retries, downtime, changed SCRAPE_INTERVAL),
+while the LSTM assumes evenly spaced steps. This aligns the snapshots onto
+a grid of --cadence seconds, vectorized chunk by chunk so histories of any
+size stream through with bounded memory:
+- ffill:   each grid point takes the last snapshot at or before it
+- linear:  features are interpolated between the surrounding snapshots
+           (alert_triggered is always carried forward)
+
+Grid points too far from real data are flagged in a `gap` column: with
+ffill when the last snapshot is older than --max-gap seconds, with linear
+when the surrounding snapshots are more than --max-gap apart. The grid
+runs from the first to the last snapshot; nothing is extrapolated.
+
+Output is a columnar dataset (columnar.py) with the training columns:
+timestamp, FEATURE_COLUMNS in order, alert_triggered, risk_score (from
+the resampled features, as synthetic_market.calculate_risk_score) and
+gap. windowing.window_mask(gap) drops the windows that straddle a gap.
+
+Usage:
+    python resample_snapshots.py ../../data-pipeline/data/market_depth.csv --cadence 60
+    python resample_snapshots.py history.csv --method linear --max-gap 300 --output training_data_crawler
+    python columnar.py training_data_crawler training_data_crawler.csv   # CSV export
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.constants import FEATURE_COLUMNS, SEQUENCE_LENGTH
+from columnar import iter_table_chunks, replace_dir, is_csv, resolve_table, META_FILE, FORMAT_VERSION, CHUNK_ROWS
+from synthetic_market import calculate_risk_score
+from windowing import window_mask
+
+DEFAULT_INPUT = Path(__file__).parent.parent.parent / "data-pipeline" / "data" / "market_depth.csv"
+OUTPUT_DIR = 'training_data_crawler'
+# Crawler scrape interval (data-pipeline/src/crawler.js default)
+CADENCE_SECONDS = int(os.environ.get('SCRAPE_INTERVAL') or 60000) // 1000
+MAX_GAP_STEPS = 3  # Default --max-gap in grid steps
+METHODS = ('ffill', 'linear')
+
+# Crawler JSON keys -> training columns
+JSON_KEYS = {'blr': 'blr', 'buyVolume': 'buy_volume', 'sellVolume': 'sell_volume',
+             'midPrice': 'mid_price', 'alertTriggered': 'alert_triggered'}
+
+COLUMNS = {
+    'timestamp': 'datetime64[ms]',
+    **{name: np.float64 for name in FEATURE_COLUMNS},
+    'alert_triggered': np.bool_,
+    'risk_score': np.float64,
+    'gap': np.bool_,
+}
+
+# ============================================================
+# Input
+# ============================================================
+def to_millis(timestamps):
+    """Crawler ISO strings, datetimes or epoch numbers -> int64 ms since epoch (UTC)"""
+    timestamps = pd.Series(timestamps)
+    if timestamps.dtype.kind in 'iuf':
+        return timestamps.to_numpy(dtype=np.int64)
+    parsed = pd.to_datetime(timestamps, utc=True, format='ISO8601')
+    return parsed.dt.tz_localize(None).to_numpy(dtype='datetime64[ms]').astype(np.int64)
+
+def iter_snapshots(path, chunk_rows=CHUNK_ROWS):
+    """
+    Chunks of (millis, features, alerts) in file order.
+
+    CSV and columnar inputs stream chunk-wise; crawler JSON is one document
+    and is loaded whole.
+    """
+    columns = ['timestamp', *FEATURE_COLUMNS, 'alert_triggered']
+    if str(path).endswith('.json'):
+        with open(path) as f:
+            records = json.load(f)
+        df = pd.DataFrame(records, columns=['timestamp', *JSON_KEYS]).rename(columns=JSON_KEYS)
+        chunks = [df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows)]
+    else:
+        chunks = iter_table_chunks(path, columns, chunk_rows)
+
+    for df in chunks:
+        alerts = df['alert_triggered']
+        if alerts.dtype == object:
+            alerts = alerts.astype(str).str.lower() == 'true'
+        yield (to_millis(df['timestamp']),
+               df[FEATURE_COLUMNS].to_numpy(dtype=np.float64),
+               alerts.to_numpy(dtype=bool))
+
+def scan_span(path, chunk_rows=CHUNK_ROWS):
+    """(first ms, last ms, snapshots) of a history, which must be in time order"""
+    first = last = None
+    count = 0
+    for millis, _, _ in iter_snapshots(path, chunk_rows):
+        if len(millis) == 0:
+            continue
+        if (last is not None and millis[0] < last) or np.any(np.diff(millis) < 0):
+            raise ValueError(f"{path} is not in time order; sort it before resampling")
+        first = millis[0] if first is None else first
+        last = millis[-1]
+        count += len(millis)
+    if first is None:
+        raise ValueError(f"{path} has no snapshots")
+    return int(first), int(last), count
+
+# ============================================================
+# Resampling
+# ============================================================
+def grid_span(first, last, cadence_ms):
+    """First grid point (a multiple of the cadence) and grid length covering [first, last]"""
+    grid_start = -(-first // cadence_ms) * cadence_ms
+    rows = max((last - grid_start) // cadence_ms + 1, 0)
+    return grid_start, rows
+
+def resample_chunk(millis, features, alerts, grid, method='ffill', max_gap_ms=None):
+    """
+    Values at the grid points from snapshots that bracket them.
+
+    Every grid point must lie within [millis[0], millis[-1]]. Duplicate
+    timestamps resolve to the last snapshot.
+
+    Returns:
+        values: (len(grid), n_features) features
+        alerts: (len(grid),) alert flags carried forward
+        gap:    (len(grid),) True where the point is too far from real data
+    """
+    prev = np.searchsorted(millis, grid, side='right') - 1
+    age = grid - millis[prev]
+
+    if method == 'ffill':
+        values = features[prev]
+        gap = age > max_gap_ms if max_gap_ms is not None else np.zeros(len(grid), dtype=bool)
+    elif method == 'linear':
+        nxt = np.minimum(prev + 1, len(millis) - 1)
+        nxt = np.searchsorted(millis, millis[nxt], side='right') - 1
+        span = millis[nxt] - millis[prev]
+        weight = np.divide(age, span, out=np.zeros(len(grid)), where=span > 0)
+        values = features[prev] + weight[:, None] * (features[nxt] - features[prev])
+        # Only points inside a long interval are invented; exact hits are real
+        gap = (age > 0) & (span > max_gap_ms) if max_gap_ms is not None else np.zeros(len(grid), dtype=bool)
+    else:
+        raise ValueError(f"Unknown method '{method}' (expected one of {METHODS})")
+
+    return values, alerts[prev], gap
+
+def resample(path, output_dir=OUTPUT_DIR, cadence_seconds=CADENCE_SECONDS, method='ffill',
+             max_gap_seconds=None, chunk_rows=CHUNK_ROWS):
+    """
+    Resample a crawler history onto a fixed grid and write it as a columnar
+    dataset.
+
+    Two passes over the input: the first finds the time span (and checks
+    ordering) so every output column is preallocated as a .npy memory map,
+    the second fills the grid chunk by chunk. A later chunk may still hold
+    duplicates of a chunk's last timestamp, so each chunk only fills grid
+    points up to its previous distinct timestamp and carries that snapshot
+    and its last one into the next; the output is identical for any
+    chunk size.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}' (expected one of {METHODS})")
+    if max_gap_seconds is None:
+        max_gap_seconds = MAX_GAP_STEPS * cadence_seconds
+    cadence_ms = int(round(cadence_seconds * 1000))
+    max_gap_ms = int(round(max_gap_seconds * 1000))
+    if cadence_ms <= 0:
+        raise ValueError("cadence must be positive")
+
+    first, last, snapshots = scan_span(path, chunk_rows)
+    grid_start, rows = grid_span(first, last, cadence_ms)
+
+    output_dir = Path(output_dir)
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=output_dir.name + '.', dir=output_dir.parent))
+    try:
+        out = {name: np.lib.format.open_memmap(tmp_dir / f"{name}.npy", mode='w+', dtype=dtype, shape=(rows,))
+               for name, dtype in COLUMNS.items()}
+
+        def fill(millis, features, alerts, next_row, until_ms):
+            """Write grid points [next_row, ...) up to until_ms; returns the next row to fill"""
+            end_row = min(max((int(until_ms) - grid_start) // cadence_ms + 1, 0), rows)
+            if end_row <= next_row:
+                return next_row
+            grid = grid_start + cadence_ms * np.arange(next_row, end_row, dtype=np.int64)
+            values, grid_alerts, gap = resample_chunk(millis, features, alerts, grid, method, max_gap_ms)
+
+            block = slice(next_row, end_row)
+            out['timestamp'][block] = grid.astype('datetime64[ms]')
+            for j, name in enumerate(FEATURE_COLUMNS):
+                out[name][block] = values[:, j]
+            out['alert_triggered'][block] = grid_alerts
+            out['risk_score'][block] = calculate_risk_score(
+                *(values[:, FEATURE_COLUMNS.index(name)] for name in ('blr', 'buy_volume', 'sell_volume')))
+            out['gap'][block] = gap
+            return end_row
+
+        carry = None
+        next_row = 0
+        for millis, features, alerts in iter_snapshots(path, chunk_rows):
+            if len(millis) == 0:
+                continue
+            if carry is not None:
+                millis = np.concatenate([carry[0], millis])
+                features = np.concatenate([carry[1], features])
+                alerts = np.concatenate([carry[2], alerts])
+
+            # Duplicates resolve to their last row, so the last row before the
+            # final timestamp and the last row are all later points can need
+            before = np.searchsorted(millis, millis[-1], side='left') - 1
+            keep = [before, len(millis) - 1] if before >= 0 else [len(millis) - 1]
+            carry = (millis[keep], features[keep], alerts[keep])
+            if before >= 0:
+                next_row = fill(millis, features, alerts, next_row, millis[before])
+
+        # Grid points from the last distinct timestamp on
+        if carry is not None:
+            next_row = fill(*carry, next_row, carry[0][-1])
+
+        gaps = int(np.count_nonzero(out['gap']))
+        for column in out.values():
+            column.flush()
+        del out
+
+        meta = {
+            'rows': rows,
+            'columns': {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+            'format_version': FORMAT_VERSION,
+            'source': str(path),
+            'snapshots': snapshots,
+            'cadence_seconds': cadence_seconds,
+            'method': method,
+            'max_gap_seconds': max_gap_seconds,
+            'gap_rows': gaps,
+        }
+        with open(tmp_dir / META_FILE, 'w') as f:
+            json.dump(meta, f, indent=2)
+        replace_dir(tmp_dir, output_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return meta
+
+# ============================================================
+# Main
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description="Resample crawler snapshots onto a fixed time grid")
+    parser.add_argument('input', nargs='?', default=str(DEFAULT_INPUT),
+                        help="market_depth.csv / .json or a columnar history")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="Columnar output directory")
+    parser.add_argument('--cadence', type=float, default=CADENCE_SECONDS, help="Grid step in seconds")
+    parser.add_argument('--method', default='ffill', choices=METHODS)
+    parser.add_argument('--max-gap', type=float, default=None,
+                        help=f"Seconds before a grid point counts as a gap (default: {MAX_GAP_STEPS} x cadence)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    if is_csv(args.output):
+        parser.error("--output is a columnar directory; export with columnar.py")
+    source = args.input if args.input.endswith('.json') else resolve_table(args.input)
+
+    print("\n" + "=" * 60)
+    print("AEGIS PROTOCOL - SNAPSHOT RESAMPLER")
+    print("=" * 60)
+    print(f"[*] {source}: {args.method} onto a {args.cadence:g}s grid")
+
+    start = time.perf_counter()
+    meta = resample(source, args.output, args.cadence, args.method, args.max_gap, args.chunk_rows)
+    seconds = time.perf_counter() - start
+
+    rows = meta['rows']
+    gap = np.load(Path(args.output) / 'gap.npy', mmap_mode='r')
+    windows = int(np.count_nonzero(window_mask(gap, SEQUENCE_LENGTH)))
+    print(f"[+] {meta['snapshots']:,} snapshots -> {rows:,} grid rows in {seconds:.1f}s")
+    print(f"    Gap rows: {meta['gap_rows']:,} ({meta['gap_rows'] / max(rows, 1) * 100:.1f}%, "
+          f"max gap {meta['max_gap_seconds']:g}s)")
+    print(f"    Gap-free {SEQUENCE_LENGTH}-step windows: {windows:,}")
+    print(f"[*] Saved to: {args.output}/")
+    print("=" * 60 + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
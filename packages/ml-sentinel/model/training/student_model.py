@@ -0,0 +1,101 @@
+"""
+Aegis Protocol - Student Models
+Compact, circuit-friendly replacements for the LSTM teacher
+
+Both students read the same (batch, 60, 4) window as the LSTM and end in a
+sigmoid risk score, but only use ops EZKL supports (Gemm/Conv, Relu,
+Sigmoid, reshapes), so they export through export_onnx.py and compile to a
+circuit:
+- mlp: flattened window -> two ReLU layers -> risk
+- tcn: dilated Conv1d stack over the window -> last timestep -> risk
+       (receptive field 1 + (kernel_size - 1) * sum(dilations) rows)
+
+Checkpoints store the architecture next to the weights so export_onnx.py
+can rebuild the model without the training script.
+"""
+
+import io
+
+import torch
+import torch.nn as nn
+
+SEQUENCE_LENGTH = 60
+N_FEATURES = 4
+
+STUDENT_DEFAULTS = {
+    'mlp': {'hidden_sizes': [64, 16]},
+    'tcn': {'channels': 16, 'kernel_size': 3, 'dilations': [1, 2, 4, 8]},
+}
+
+class MLPStudent(nn.Module):
+    def __init__(self, sequence_length=SEQUENCE_LENGTH, n_features=N_FEATURES, hidden_sizes=(64, 16)):
+        super(MLPStudent, self).__init__()
+        layers = []
+        in_size = sequence_length * n_features
+        for size in hidden_sizes:
+            layers += [nn.Linear(in_size, size), nn.ReLU()]
+            in_size = size
+        layers += [nn.Linear(in_size, 1), nn.Sigmoid()]
+        self.net = nn.Sequential(*layers)
+
+    def forward(self, x):
+        return self.net(x.flatten(1))
+
+class TCNStudent(nn.Module):
+    def __init__(self, sequence_length=SEQUENCE_LENGTH, n_features=N_FEATURES, channels=16,
+                 kernel_size=3, dilations=(1, 2, 4, 8)):
+        super(TCNStudent, self).__init__()
+        layers = []
+        in_channels = n_features
+        for dilation in dilations:
+            # Unpadded ("valid") convolutions: no Pad op in the graph, the
+            # sequence shrinks by (kernel_size - 1) * dilation per layer
+            layers += [nn.Conv1d(in_channels, channels, kernel_size, dilation=dilation), nn.ReLU()]
+            in_channels = channels
+        self.convs = nn.Sequential(*layers)
+        self.fc = nn.Linear(channels, 1)
+        self.sigmoid = nn.Sigmoid()
+
+    def forward(self, x):
+        out = self.convs(x.transpose(1, 2))  # (batch, channels, time)
+        return self.sigmoid(self.fc(out[:, :, -1]))
+
+STUDENT_CLASSES = {'mlp': MLPStudent, 'tcn': TCNStudent}
+
+def build_student(kind, sequence_length=SEQUENCE_LENGTH, n_features=N_FEATURES, **config):
+    if kind not in STUDENT_CLASSES:
+        raise ValueError(f"Unknown student '{kind}' (expected one of {sorted(STUDENT_CLASSES)})")
+    config = dict(STUDENT_DEFAULTS[kind], **config)
+    return STUDENT_CLASSES[kind](sequence_length, n_features, **config)
+
+def save_student(model, kind, config, path, sequence_length=SEQUENCE_LENGTH, n_features=N_FEATURES):
+    torch.save({
+        'kind': kind,
+        'config': config,
+        'sequence_length': sequence_length,
+        'n_features': n_features,
+        'state_dict': model.state_dict(),
+    }, path)
+
+def load_student(path):
+    """Rebuild a student saved with save_student; returns (model, checkpoint)"""
+    checkpoint = torch.load(path, map_location='cpu')
+    model = build_student(checkpoint['kind'], checkpoint['sequence_length'], checkpoint['n_features'],
+                          **checkpoint['config'])
+    model.load_state_dict(checkpoint['state_dict'])
+    model.eval()
+    return model, checkpoint
+
+def student_to_onnx(model, sequence_length=SEQUENCE_LENGTH, n_features=N_FEATURES, opset=13):
+    """Export to an in-memory onnx.ModelProto with a dynamic batch axis"""
+    import onnx
+
+    model.eval()
+    buffer = io.BytesIO()
+    torch.onnx.export(
+        model, torch.zeros(1, sequence_length, n_features), buffer,
+        input_names=['input'], output_names=['output'],
+        dynamic_axes={'input': {0: 'batch_size'}, 'output': {0: 'batch_size'}},
+        opset_version=opset
+    )
+    return onnx.load_from_string(buffer.getvalue())
@@ -0,0 +1,225 @@
+"""
+Aegis Protocol - Hyperparameter Sweep
+Parallel search over the PyTorch LSTM configuration
+
+Fans trial configurations (sequence length, batch size, learning rate,
+layer widths) out over a process pool. Each worker is capped to
+--threads-per-worker intra-op threads so workers x threads never exceeds
+the cores, and all workers open the same read-only memory-mapped dataset
+cache entry (dataset_cache.py) instead of re-reading the dataset.
+
+Each trial records:
+- best validation MSE / MAE
+- single-window inference latency (median, batch of 1)
+- parameter count
+
+The report is the Pareto frontier of validation error vs latency.
+
+Usage:
+    python sweep_hyperparams.py --trials 16 --epochs 10
+    python sweep_hyperparams.py --trials 32 --threads-per-worker 1 --workers 16
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import numpy as np
+
+from dataset_cache import load_dataset
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+from shared.evaluation import pareto_front
+
+# Configuration
+DATA_FILE = 'training_data_final'
+SWEEP_DIR = Path('sweep_runs')
+RESULTS_FILE = 'sweep_results.json'
+PARETO_OBJECTIVES = ('latency_ms', 'val_mse')  # Frontier listed fastest first
+
+BASELINE = {
+    'sequence_length': 60,
+    'batch_size': 128,
+    'learning_rate': 0.001,
+    'hidden_size1': 128,
+    'hidden_size2': 64,
+    'fc_size': 32,
+}
+
+SEARCH_SPACE = {
+    'sequence_length': [30, 60, 90],
+    'batch_size': [64, 128, 256],
+    'learning_rate': [3e-4, 1e-3, 3e-3],
+    'hidden_size1': [32, 64, 128],
+    'hidden_size2': [16, 32, 64],
+    'fc_size': [16, 32],
+}
+
+LATENCY_WARMUP = 10
+LATENCY_RUNS = 100
+
+# ============================================================
+# Trials
+# ============================================================
+def sample_configs(num_trials, seed):
+    """Baseline first, then distinct random points of the grid"""
+    keys = list(SEARCH_SPACE)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    grid = [config for config in grid if config != BASELINE]
+    random.Random(seed).shuffle(grid)
+    return [dict(BASELINE)] + grid[:max(num_trials - 1, 0)]
+
+def init_worker(threads):
+    """Cap math-library and torch threads before the trainer is imported"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+def measure_latency_ms(model, sequence_length, n_features):
+    """Median single-window inference latency"""
+    import torch
+
+    model.eval()
+    window = torch.rand(1, sequence_length, n_features)
+    timings = []
+    with torch.no_grad():
+        for i in range(LATENCY_WARMUP + LATENCY_RUNS):
+            start = time.perf_counter()
+            model(window)
+            if i >= LATENCY_WARMUP:
+                timings.append(time.perf_counter() - start)
+    return 1000 * float(np.median(timings))
+
+def run_trial(trial_id, config, data_file, epochs, sweep_dir):
+    """Train one configuration; trainer output goes to the trial's log file"""
+    trial_dir = Path(sweep_dir) / f"trial_{trial_id:03d}"
+    trial_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    with open(trial_dir / 'train.log', 'w') as log, contextlib.redirect_stdout(log):
+        import torch
+        import train_lstm_pytorch as trainer
+
+        X, y, _ = load_dataset(data_file)
+        dataset = trainer.WindowedTimeSeriesDataset(X, y, config['sequence_length'])
+        train_dataset, val_dataset, _ = trainer.split_dataset(dataset)
+        train_loader = trainer.make_loader(train_dataset, config['batch_size'])
+        val_loader = trainer.make_loader(val_dataset, config['batch_size'])
+
+        n_features = X.shape[1]
+        model = trainer.LSTMModel(n_features, config['hidden_size1'], config['hidden_size2'],
+                                  fc_size=config['fc_size'])
+        save_path = trial_dir / 'model.pth'
+        history = trainer.train_model(model, train_loader, val_loader, epochs=epochs,
+                                      learning_rate=config['learning_rate'], save_path=save_path)
+
+        model.load_state_dict(torch.load(save_path))
+        best_epoch = int(np.argmin(history['val_loss']))
+        latency_ms = measure_latency_ms(model, config['sequence_length'], n_features)
+
+    return {
+        'trial': trial_id,
+        'config': config,
+        'val_mse': history['val_loss'][best_epoch],
+        'val_mae': history['val_mae'][best_epoch],
+        'best_epoch': best_epoch + 1,
+        'latency_ms': latency_ms,
+        'params': sum(p.numel() for p in model.parameters()),
+        'train_seconds': time.perf_counter() - start,
+        'model_path': str(save_path),
+    }
+
+# ============================================================
+# Report
+# ============================================================
+def print_results(results, front):
+    print("\n" + "=" * 60)
+    print("[=] SWEEP RESULTS - PARETO FRONTIER (val MSE vs latency)")
+    print("=" * 60)
+    print(f"  {'trial':>5} {'val MSE':>10} {'lat ms':>7} {'params':>8}  L    batch  lr      widths")
+    for r in front:
+        c = r['config']
+        widths = f"{c['hidden_size1']}/{c['hidden_size2']}/{c['fc_size']}"
+        print(f"  {r['trial']:>5} {r['val_mse']:>10.6f} {r['latency_ms']:>7.3f} {r['params']:>8}  "
+              f"{c['sequence_length']:<4} {c['batch_size']:<6} {c['learning_rate']:<7g} {widths}")
+
+    baseline = next((r for r in results if r['config'] == BASELINE), None)
+    if baseline:
+        print(f"\n  Baseline (trial {baseline['trial']}): val MSE {baseline['val_mse']:.6f}, "
+              f"{baseline['latency_ms']:.3f} ms, {baseline['params']} params")
+    print("=" * 60 + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel LSTM hyperparameter sweep")
+    parser.add_argument('--data', default=DATA_FILE, help="Training dataset (columnar or CSV)")
+    parser.add_argument('--trials', type=int, default=16)
+    parser.add_argument('--epochs', type=int, default=10, help="Epochs per trial")
+    parser.add_argument('--threads-per-worker', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Parallel trials (default: cores // threads-per-worker)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    workers = args.workers or max(1, (os.cpu_count() or 1) // args.threads_per_worker)
+    configs = sample_configs(args.trials, args.seed)
+
+    print("\n" + "=" * 60)
+    print("AEGIS PROTOCOL - HYPERPARAMETER SWEEP")
+    print("=" * 60)
+    print(f"[*] {len(configs)} trials x {args.epochs} epochs on {workers} workers "
+          f"({args.threads_per_worker} threads each)\n")
+
+    # Build the cache entry once; workers only memory-map it
+    load_dataset(args.data)
+
+    results = []
+    context = mp.get_context('spawn')  # Fresh interpreters: thread caps apply before torch starts
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=(args.threads_per_worker,)) as pool:
+        futures = {
+            pool.submit(run_trial, i, config, args.data, args.epochs, SWEEP_DIR): i
+            for i, config in enumerate(configs)
+        }
+        for future in as_completed(futures):
+            trial_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[!] Trial {trial_id} failed: {e}")
+                continue
+            results.append(result)
+            print(f"[+] Trial {trial_id:>3}: val MSE {result['val_mse']:.6f}, "
+                  f"{result['latency_ms']:.3f} ms, {result['params']} params "
+                  f"({result['train_seconds']:.0f}s)")
+
+    if not results:
+        print("[!] No trial completed")
+        return 1
+
+    front = pareto_front(results, PARETO_OBJECTIVES)
+    print_results(results, front)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'epochs': args.epochs,
+            'results': sorted(results, key=lambda r: r['trial']),
+            'pareto_front': [r['trial'] for r in front],
+        }, f, indent=2)
+    print(f"[+] Results saved to: {args.output}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
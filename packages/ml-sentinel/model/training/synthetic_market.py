@@ -0,0 +1,331 @@
+"""
+Aegis Protocol - Synthetic Market Generator
+Seeded, vectorized scenario presets for training and load-test datasets
+
+Replaces the per-row loops of the old generator scripts
+(generate_synthetic_data.py, generate_linear_crashes.py and
+generate_simple_data.py are now thin wrappers over this module).
+
+Every preset produces whole episodes as (num_episodes, steps) arrays in one
+shot:
+- healthy:            BLR ~ N(1.2, 0.2), random-walk price, no alerts
+- exponential_crash:  BLR decays exponentially 1.2 -> 0.35, price -15%
+- linear_crash:       noiseless linear BLR 1.2 -> 0.3, risk 0 -> 1
+- flash_crash:        healthy market, sudden liquidity withdrawal at a
+                      random step, partial recovery
+- blr_sweep:          noiseless BLR sweep 0.3 -> 1.5, risk = 1 - BLR/1.2
+
+Large datasets are built chunk by chunk in a process pool. Chunk k is
+seeded from SeedSequence([seed, k]), so the output does not depend on the
+worker count. Workers write straight into a column directory: one
+memory-mappable .npy per column plus meta.json (the columnar.py format).
+
+Usage:
+    python synthetic_market.py --rows 1000000 --output synthetic_1m
+    python synthetic_market.py --rows 100000000 --mix healthy=0.7,flash_crash=0.3 --workers 16
+    python synthetic_market.py --rows 10000 --preset linear_crash --csv crashes.csv
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from columnar import load_columns, replace_dir, META_FILE, FORMAT_VERSION
+
+# Market constants
+BASE_PRICE = 3000.0  # ETH/USDC base price
+BASE_VOLUME = 5000.0  # Base trading volume
+HEALTHY_BLR_MEAN = 1.2
+HEALTHY_BLR_STD = 0.2
+CRASH_BLR_FINAL = 0.35
+ALERT_BLR = 0.4
+
+# Dataset defaults
+DEFAULT_MIX = {'healthy': 0.7, 'exponential_crash': 0.1, 'linear_crash': 0.1, 'flash_crash': 0.1}
+STEPS_PER_EPISODE = 100
+CHUNK_ROWS = 1_000_000
+START_TIME = np.datetime64('2024-01-01T00:00:00', 's')
+STEP_SECONDS = 60
+
+COLUMNS = {
+    'timestamp': 'datetime64[s]',
+    'blr': np.float32,
+    'buy_volume': np.float32,
+    'sell_volume': np.float32,
+    'mid_price': np.float32,
+    'alert_triggered': np.bool_,
+    'risk_score': np.float32,
+}
+
+def calculate_risk_score(blr, buy_volume, sell_volume):
+    """
+    Risk score (0.0 to 1.0) from market conditions.
+
+    90% BLR (inverse, amplified with a power curve), 10% sell/buy volume
+    imbalance. BLR >= 1.5 is safe, BLR <= 0.4 gives risk >= 0.85.
+    """
+    blr_normalized = np.clip(blr / 1.5, 0, 1.0)
+    blr_risk = np.clip(1.0 - blr_normalized, 0, 1)
+    blr_risk = np.clip(np.power(blr_risk * 1.2, 1.6), 0, 1)
+
+    volume_ratio = sell_volume / (buy_volume + 1e-6)
+    volume_risk = np.clip((volume_ratio - 0.8) / 1.5, 0, 1)
+
+    risk_score = np.clip(0.9 * blr_risk + 0.1 * volume_risk, 0, 1)
+    return np.nan_to_num(risk_score, nan=0.0)
+
+# ============================================================
+# Scenario presets: (rng, episodes, steps) -> dict of (episodes, steps) arrays
+# ============================================================
+def healthy(rng, episodes, steps):
+    blr = np.clip(rng.normal(HEALTHY_BLR_MEAN, HEALTHY_BLR_STD, (episodes, steps)), 0.8, 1.8)
+    sell_volume = rng.uniform(BASE_VOLUME * 0.8, BASE_VOLUME * 1.2, (episodes, steps))
+    mid_price = BASE_PRICE + np.cumsum(rng.normal(0, 10, (episodes, steps)), axis=1)
+    return {
+        'blr': blr,
+        'buy_volume': blr * sell_volume,
+        'sell_volume': sell_volume,
+        'mid_price': np.clip(mid_price, BASE_PRICE * 0.9, BASE_PRICE * 1.1),
+        'alert_triggered': np.zeros((episodes, steps), dtype=bool),
+    }
+
+def exponential_crash(rng, episodes, steps, decay_rate=3.0):
+    t = np.linspace(0, 1, steps)
+    blr = HEALTHY_BLR_MEAN + (CRASH_BLR_FINAL - HEALTHY_BLR_MEAN) * (1 - np.exp(-decay_rate * t))
+    blr = np.clip(blr + rng.normal(0, 0.02, (episodes, steps)), 0.2, 1.5)
+
+    sell_volume = BASE_VOLUME * (1 + (1 - blr) * 2)  # More selling as BLR drops
+    price_drop = np.linspace(0, -BASE_PRICE * 0.15, steps)  # 15% drop
+    return {
+        'blr': blr,
+        'buy_volume': blr * sell_volume,
+        'sell_volume': sell_volume,
+        'mid_price': BASE_PRICE + price_drop + rng.normal(0, 5, (episodes, steps)),
+        'alert_triggered': blr < ALERT_BLR,
+    }
+
+def linear_crash(rng, episodes, steps):
+    progress = np.broadcast_to(np.arange(steps) / steps, (episodes, steps))
+    blr = 1.2 - 0.9 * progress
+    sell_volume = BASE_VOLUME * (1 + progress)
+    return {
+        'blr': blr,
+        'buy_volume': blr * sell_volume,
+        'sell_volume': sell_volume,
+        'mid_price': 3000.0 - 300.0 * progress,
+        'alert_triggered': blr < ALERT_BLR,
+        'risk_score': progress,  # Linear target, not calculate_risk_score
+    }
+
+def flash_crash(rng, episodes, steps, crash_steps=5, recovery=0.5):
+    market = healthy(rng, episodes, steps)
+    step = np.arange(steps)
+    onset = rng.integers(steps // 4, max(steps // 2, steps // 4 + 1), size=(episodes, 1))
+    depth = rng.uniform(0.6, 0.85, size=(episodes, 1))  # BLR lost at the bottom
+
+    # 0 before onset, 1 after crash_steps, then partial recovery towards 1 - recovery
+    since = step - onset
+    shock = np.clip(since / crash_steps, 0, 1)
+    recovering = np.clip((since - crash_steps) / max(steps - crash_steps, 1), 0, 1)
+    shock = shock * (1 - recovery * recovering)
+
+    blr = np.clip(market['blr'] * (1 - depth * shock), 0.2, 1.8)
+    sell_volume = market['sell_volume'] * (1 + 2 * shock)
+    mid_price = market['mid_price'] * (1 - 0.2 * depth * shock)
+    return {
+        'blr': blr,
+        'buy_volume': blr * sell_volume,
+        'sell_volume': sell_volume,
+        'mid_price': mid_price,
+        'alert_triggered': blr < ALERT_BLR,
+    }
+
+def blr_sweep(rng, episodes, steps, blr_min=0.3, blr_max=1.5):
+    blr = np.broadcast_to(np.linspace(blr_min, blr_max, steps), (episodes, steps))
+    risk_score = np.clip(1.0 - blr / 1.2, 0, 1)
+    return {
+        'blr': blr,
+        'buy_volume': blr * 5000,
+        'sell_volume': (1.2 - blr) * 5000,
+        'mid_price': 3000 - (blr - 0.9) * 500,
+        'alert_triggered': risk_score > 0.6,
+        'risk_score': risk_score,
+    }
+
+PRESETS = {
+    'healthy': healthy,
+    'exponential_crash': exponential_crash,
+    'linear_crash': linear_crash,
+    'flash_crash': flash_crash,
+    'blr_sweep': blr_sweep,
+}
+
+def generate_episodes(preset, num_episodes, steps, rng=None, seed=None, **params):
+    """
+    Flat (num_episodes * steps,) arrays for one preset, episodes back to back.
+
+    risk_score comes from calculate_risk_score unless the preset defines it.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset '{preset}' (expected one of {sorted(PRESETS)})")
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    data = PRESETS[preset](rng, num_episodes, steps, **params)
+    if 'risk_score' not in data:
+        data['risk_score'] = calculate_risk_score(data['blr'], data['buy_volume'], data['sell_volume'])
+    return {name: np.ascontiguousarray(values).reshape(-1) for name, values in data.items()}
+
+def to_frame(data, start_time=START_TIME, step_seconds=STEP_SECONDS, offset=0):
+    """Training-format DataFrame (timestamp first) from generated arrays"""
+    n = len(data['blr'])
+    timestamps = start_time + (offset + np.arange(n)) * np.timedelta64(step_seconds, 's')
+    return pd.DataFrame({'timestamp': timestamps, **{c: data[c] for c in COLUMNS if c != 'timestamp'}})
+
+# ============================================================
+# Chunked, parallel dataset generation
+# ============================================================
+def generate_chunk(chunk_index, chunk_rows, mix, steps, seed):
+    """Rows [chunk_index * chunk_rows, ...) as a mix of preset episodes"""
+    rng = np.random.default_rng(np.random.SeedSequence([seed, chunk_index]))
+    num_episodes = -(-chunk_rows // steps)
+    presets = list(mix)
+    weights = np.array([mix[p] for p in presets], dtype=np.float64)
+    choice = rng.choice(len(presets), size=num_episodes, p=weights / weights.sum())
+
+    columns = {c: np.empty(num_episodes * steps, dtype=COLUMNS[c]) for c in COLUMNS if c != 'timestamp'}
+    rows = (np.arange(num_episodes)[:, None] * steps + np.arange(steps)).reshape(num_episodes, steps)
+    for k, preset in enumerate(presets):
+        episodes = np.nonzero(choice == k)[0]
+        if len(episodes) == 0:
+            continue
+        data = generate_episodes(preset, len(episodes), steps, rng)
+        target = rows[episodes].reshape(-1)
+        for name, column in columns.items():
+            column[target] = data[name]
+    return {name: column[:chunk_rows] for name, column in columns.items()}
+
+def write_chunk(output_dir, chunk_index, chunk_rows, total_rows, mix, steps, seed, start_time, step_seconds):
+    """Worker: generate one chunk and write it into the column files in place"""
+    start = chunk_index * chunk_rows
+    rows = min(chunk_rows, total_rows - start)
+    data = generate_chunk(chunk_index, rows, mix, steps, seed)
+    data['timestamp'] = start_time + (start + np.arange(rows)) * np.timedelta64(step_seconds, 's')
+
+    for name, values in data.items():
+        column = np.load(Path(output_dir) / f"{name}.npy", mmap_mode='r+')
+        column[start:start + rows] = values
+        column.flush()
+        del column
+    return rows
+
+def generate_dataset(output_dir, total_rows, mix=DEFAULT_MIX, steps=STEPS_PER_EPISODE, seed=42,
+                     chunk_rows=CHUNK_ROWS, workers=None, start_time=START_TIME, step_seconds=STEP_SECONDS):
+    """
+    Write total_rows rows to output_dir as <column>.npy files + meta.json.
+
+    Chunks are generated in parallel; the result only depends on
+    (total_rows, mix, steps, seed, chunk_rows). The directory is built next
+    to output_dir and swapped in when complete, so an existing dataset is
+    never left half-overwritten.
+    """
+    output_dir = Path(output_dir)
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=output_dir.name + '.', dir=output_dir.parent))
+    try:
+        for name, dtype in COLUMNS.items():
+            column = np.lib.format.open_memmap(tmp_dir / f"{name}.npy", mode='w+',
+                                               dtype=dtype, shape=(total_rows,))
+            del column
+
+        num_chunks = -(-total_rows // chunk_rows)
+        workers = workers or min(num_chunks, os.cpu_count() or 1)
+        args = (total_rows, mix, steps, seed, start_time, step_seconds)
+        if workers <= 1:
+            for k in range(num_chunks):
+                write_chunk(tmp_dir, k, chunk_rows, *args)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(write_chunk, [tmp_dir] * num_chunks, range(num_chunks),
+                              [chunk_rows] * num_chunks, *[[a] * num_chunks for a in args]))
+
+        meta = {
+            'rows': total_rows,
+            'columns': {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+            'format_version': FORMAT_VERSION,
+            'mix': mix,
+            'steps_per_episode': steps,
+            'seed': seed,
+            'chunk_rows': chunk_rows,
+            'start_time': str(start_time),
+            'step_seconds': step_seconds,
+        }
+        with open(tmp_dir / META_FILE, 'w') as f:
+            json.dump(meta, f, indent=2)
+        replace_dir(tmp_dir, output_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return meta
+
+def load_dataset_columns(output_dir, mmap_mode='r'):
+    """Memory-mapped columns of a generated dataset"""
+    return load_columns(output_dir, mmap_mode=mmap_mode)
+
+def parse_mix(text):
+    """'healthy=0.7,flash_crash=0.3' -> {'healthy': 0.7, 'flash_crash': 0.3}"""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name not in PRESETS:
+            raise ValueError(f"Unknown preset '{name}' (expected one of {sorted(PRESETS)})")
+        mix[name] = float(weight or 1.0)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic market datasets")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--mix', default=None, help="preset=weight,... (default: %s)" %
+                        ','.join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    parser.add_argument('--preset', default=None, choices=sorted(PRESETS), help="Single preset (overrides --mix)")
+    parser.add_argument('--steps', type=int, default=STEPS_PER_EPISODE, help="Steps per episode")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='synthetic_market', help="Column directory")
+    parser.add_argument('--csv', default=None, help="Also export to CSV (small datasets only)")
+    args = parser.parse_args()
+
+    mix = {args.preset: 1.0} if args.preset else (parse_mix(args.mix) if args.mix else DEFAULT_MIX)
+
+    print("\n" + "=" * 60)
+    print("AEGIS PROTOCOL - SYNTHETIC MARKET GENERATOR")
+    print("=" * 60)
+    print(f"[*] {args.rows:,} rows, {args.steps}-step episodes, mix {mix}")
+
+    start = time.perf_counter()
+    generate_dataset(args.output, args.rows, mix, args.steps, args.seed, args.chunk_rows, args.workers)
+    seconds = time.perf_counter() - start
+
+    columns = load_dataset_columns(args.output)
+    alerts = int(np.count_nonzero(columns['alert_triggered']))
+    print(f"[+] Generated in {seconds:.1f}s ({args.rows / max(seconds, 1e-9):,.0f} rows/s)")
+    print(f"    Alerts triggered: {alerts:,} ({alerts / max(args.rows, 1) * 100:.1f}%)")
+    print(f"    Mean BLR: {float(np.mean(columns['blr'], dtype=np.float64)):.4f}")
+    print(f"[*] Saved to: {args.output}/")
+
+    if args.csv:
+        pd.DataFrame({name: np.asarray(values) for name, values in columns.items()}).to_csv(args.csv, index=False)
+        print(f"[*] CSV: {args.csv}")
+    print("=" * 60 + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Aegis Protocol - Data-Parallel CPU Training
+torch.distributed (gloo) launcher for train_lstm_pytorch.LSTMModel
+
+LSTM timesteps are sequential, so one process cannot keep a many-core box
+busy. This launcher starts N local worker processes that:
+- memory-map the same cached dataset entry (dataset_cache.py), so the
+  training arrays exist once in the page cache for all ranks
+- read disjoint shards through a DistributedSampler (global batch size is
+  kept at BATCH_SIZE, split across ranks)
+- all-reduce gradients via DistributedDataParallel
+- checkpoint and save the best model from rank 0 only
+
+--scaling 1,2,4,8 trains a few epochs at each world size and reports
+throughput and parallel efficiency.
+
+Usage:
+    python train_ddp.py --workers 8
+    python train_ddp.py --workers 8 --resume
+    python train_ddp.py --scaling 1,2,4,8,16 --scaling-epochs 2
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import contextlib
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, BatchSampler
+from torch.utils.data.distributed import DistributedSampler
+
+from checkpointing import CheckpointManager, CHECKPOINT_DIR, KEEP_LAST, SAVE_EVERY
+
+# Configuration
+SCALING_EPOCHS = 2
+SCALING_REPORT_FILE = 'ddp_scaling.json'
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def all_reduce_sum(*values):
+    """Sum Python numbers over all ranks"""
+    tensor = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor.tolist()
+
+# ============================================================
+# Worker
+# ============================================================
+def run_worker(rank, world_size, config, results):
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(config['port'])
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+    torch.set_num_threads(config['threads_per_worker'])
+
+    # Only rank 0 talks
+    with contextlib.ExitStack() as stack:
+        if rank != 0:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        try:
+            result = train_worker(rank, world_size, config)
+        finally:
+            dist.destroy_process_group()
+
+    if rank == 0:
+        results.put(result)
+
+def train_worker(rank, world_size, config):
+    import train_lstm_pytorch as trainer
+    from dataset_cache import load_dataset
+
+    torch.manual_seed(config['seed'])  # Identical init on every rank (DDP also broadcasts rank 0)
+
+    X, y, _ = load_dataset(config['data_file'])
+    dataset = trainer.WindowedTimeSeriesDataset(X, y, trainer.SEQUENCE_LENGTH)
+    train_dataset, val_dataset, _ = trainer.split_dataset(dataset)
+
+    batch_size = max(1, trainer.BATCH_SIZE // world_size)
+    train_sampler = DistributedSampler(train_dataset, world_size, rank, shuffle=False)
+    val_sampler = DistributedSampler(val_dataset, world_size, rank, shuffle=False)
+    train_loader = DataLoader(train_dataset, sampler=BatchSampler(train_sampler, batch_size, False), batch_size=None)
+    val_loader = DataLoader(val_dataset, sampler=BatchSampler(val_sampler, batch_size, False), batch_size=None)
+
+    model = trainer.LSTMModel(X.shape[1])
+    ddp_model = DistributedDataParallel(model)
+    criterion = torch.nn.MSELoss()
+    optimizer = torch.optim.Adam(ddp_model.parameters(), lr=trainer.LEARNING_RATE)
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min', factor=0.5,
+                                                           patience=10, min_lr=1e-7)
+
+    history = {'train_loss': [], 'val_loss': [], 'train_mae': [], 'val_mae': []}
+    best_val_loss = float('inf')
+    start_epoch = 0
+    checkpoints = config['checkpoints']
+    if checkpoints is not None and config['resume']:
+        # Every rank loads the same checkpoint, so replicas stay identical
+        start_epoch, saved_history, best_val_loss = trainer.restore_checkpoint(checkpoints, model, optimizer, scheduler)
+        history = saved_history or history
+
+    print("=" * 60)
+    print(f"[*] DATA-PARALLEL TRAINING ({world_size} workers x {config['threads_per_worker']} threads)")
+    print("=" * 60)
+    print(f"Training samples: {len(train_dataset)} (per-rank batch {batch_size})")
+    print(f"Validation samples: {len(val_dataset)}\n")
+
+    train_seconds = 0.0
+    train_samples = 0
+    for epoch in range(start_epoch, config['epochs']):
+        train_sampler.set_epoch(epoch)
+
+        # Training
+        ddp_model.train()
+        loss_sum = mae_sum = count = 0.0
+        dist.barrier()
+        epoch_start = time.perf_counter()
+        for X_batch, y_batch in train_loader:
+            y_batch = y_batch.unsqueeze(1)
+            optimizer.zero_grad()
+            outputs = ddp_model(X_batch)
+            loss = criterion(outputs, y_batch)
+            loss.backward()  # Gradients are all-reduced here
+            optimizer.step()
+
+            n = len(X_batch)
+            loss_sum += loss.item() * n
+            mae_sum += torch.abs(outputs - y_batch).sum().item()
+            count += n
+        dist.barrier()
+        epoch_seconds = time.perf_counter() - epoch_start
+        loss_sum, mae_sum, count = all_reduce_sum(loss_sum, mae_sum, count)
+        train_seconds += epoch_seconds
+        train_samples += count
+
+        # Validation (each rank scores its shard)
+        ddp_model.eval()
+        val_loss_sum = val_mae_sum = val_count = 0.0
+        with torch.no_grad():
+            for X_batch, y_batch in val_loader:
+                y_batch = y_batch.unsqueeze(1)
+                outputs = model(X_batch)
+                val_loss_sum += criterion(outputs, y_batch).item() * len(X_batch)
+                val_mae_sum += torch.abs(outputs - y_batch).sum().item()
+                val_count += len(X_batch)
+        val_loss_sum, val_mae_sum, val_count = all_reduce_sum(val_loss_sum, val_mae_sum, val_count)
+
+        train_loss, val_loss = loss_sum / count, val_loss_sum / val_count
+        history['train_loss'].append(train_loss)
+        history['val_loss'].append(val_loss)
+        history['train_mae'].append(mae_sum / count)
+        history['val_mae'].append(val_mae_sum / val_count)
+        scheduler.step(val_loss)  # Same global value on every rank
+
+        if rank == 0:
+            if config['save_model'] and val_loss < best_val_loss:
+                torch.save(model.state_dict(), trainer.MODEL_SAVE_PATH)
+            if checkpoints is not None and checkpoints.should_save(epoch + 1):
+                trainer.save_checkpoint(checkpoints, epoch + 1, model, optimizer, scheduler,
+                                        history, min(best_val_loss, val_loss))
+        best_val_loss = min(best_val_loss, val_loss)
+        dist.barrier()
+
+        print(f"Epoch {epoch+1}/{config['epochs']} - Loss: {train_loss:.6f} - Val Loss: {val_loss:.6f} - "
+              f"{epoch_seconds:.1f}s - {count / epoch_seconds:.0f} samples/s")
+
+    return {
+        'world_size': world_size,
+        'threads_per_worker': config['threads_per_worker'],
+        'epochs': len(history['val_loss']) - start_epoch,
+        'samples_per_sec': train_samples / max(train_seconds, 1e-9),
+        'best_val_loss': best_val_loss,
+        'history': history,
+    }
+
+# ============================================================
+# Launcher
+# ============================================================
+def launch(world_size, config):
+    """Run world_size local workers; returns rank 0's result"""
+    config = dict(config, port=free_port())
+    results = mp.get_context('spawn').SimpleQueue()
+    mp.spawn(run_worker, args=(world_size, config, results), nprocs=world_size, join=True)
+    return results.get()
+
+def scaling_report(world_sizes, config):
+    print("\n" + "=" * 60)
+    print(f"[*] SCALING REPORT ({config['epochs']} epochs per run)")
+    print("=" * 60)
+
+    runs = []
+    for world_size in world_sizes:
+        threads = config['threads_per_worker'] or max(1, (os.cpu_count() or 1) // world_size)
+        result = launch(world_size, dict(config, threads_per_worker=threads))
+        runs.append(result)
+        print(f"[+] {world_size} worker(s): {result['samples_per_sec']:.0f} samples/s")
+
+    base = runs[0]['samples_per_sec'] / runs[0]['world_size']
+    print("\n" + "=" * 60)
+    print("[=] DATA-PARALLEL SCALING")
+    print("=" * 60)
+    print(f"  {'workers':>7} {'threads':>7} {'samples/s':>10} {'speedup':>8} {'efficiency':>10} {'val loss':>10}")
+    for run in runs:
+        speedup = run['samples_per_sec'] / runs[0]['samples_per_sec']
+        efficiency = run['samples_per_sec'] / (base * run['world_size'])
+        print(f"  {run['world_size']:>7} {run['threads_per_worker']:>7} {run['samples_per_sec']:>10.0f} "
+              f"{speedup:>7.2f}x {efficiency:>9.0%} {run['best_val_loss']:>10.6f}")
+    print("=" * 60 + "\n")
+
+    with open(SCALING_REPORT_FILE, 'w') as f:
+        json.dump([{k: v for k, v in run.items() if k != 'history'} for run in runs], f, indent=2)
+    print(f"[+] Report saved to: {SCALING_REPORT_FILE}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Data-parallel (gloo) CPU training of the LSTM model")
+    parser.add_argument('--workers', type=int, default=4, help="Local worker processes")
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help="Intra-op threads per worker (default: cores // workers)")
+    parser.add_argument('--epochs', type=int, default=None, help="Default: trainer EPOCHS")
+    parser.add_argument('--data', default=None, help="Default: trainer DATA_FILE")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scaling', default=None, help="Comma-separated worker counts, e.g. 1,2,4,8")
+    parser.add_argument('--scaling-epochs', type=int, default=SCALING_EPOCHS)
+    parser.add_argument('--resume', action='store_true', help="Continue from the latest checkpoint")
+    parser.add_argument('--checkpoint-dir', default=os.path.join(CHECKPOINT_DIR, 'ddp'))
+    parser.add_argument('--checkpoint-every', type=int, default=SAVE_EVERY)
+    parser.add_argument('--keep-checkpoints', type=int, default=KEEP_LAST)
+    args = parser.parse_args()
+
+    import train_lstm_pytorch as trainer
+    from dataset_cache import load_dataset
+
+    config = {
+        'data_file': args.data or trainer.DATA_FILE,
+        'epochs': args.epochs or trainer.EPOCHS,
+        'seed': args.seed,
+        'threads_per_worker': args.threads_per_worker,
+        'resume': args.resume,
+        'checkpoints': CheckpointManager(args.checkpoint_dir, args.keep_checkpoints, args.checkpoint_every),
+        'save_model': True,
+    }
+
+    # Build the cache entry once before the workers memory-map it
+    load_dataset(config['data_file'])
+
+    if args.scaling:
+        world_sizes = [int(n) for n in args.scaling.split(',')]
+        scaling_report(world_sizes, dict(config, epochs=args.scaling_epochs, resume=False,
+                                         checkpoints=None, save_model=False))
+        return 0
+
+    config['threads_per_worker'] = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    result = launch(args.workers, config)
+
+    print("\n" + "=" * 60)
+    print("[+] TRAINING COMPLETE!")
+    print("=" * 60)
+    print(f"   Throughput: {result['samples_per_sec']:.0f} samples/s")
+    print(f"   Best val loss: {result['best_val_loss']:.6f}")
+    print(f"\n[*] Model saved to: {trainer.MODEL_SAVE_PATH}")
+    print("=" * 60 + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
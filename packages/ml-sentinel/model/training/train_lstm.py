@@ -11,13 +11,18 @@ Model predicts Risk Score (0.0 = safe, 1.0 = crash imminent)
 """
 
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.preprocessing import MinMaxScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 
+from windowing import sliding_windows, num_windows
+from dataset_cache import load_dataset
+from checkpointing import (
+    CheckpointManager, capture_rng_state, restore_rng_state,
+    CHECKPOINT_DIR, KEEP_LAST, SAVE_EVERY
+)
+
 import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras.models import Sequential
@@ -25,6 +30,10 @@ from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLROnPlateau
 
 import os
+import json
+import time
+import hashlib
+import argparse
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'  # Suppress TF warnings
 
 # ============================================================
@@ -66,7 +75,7 @@ else:
 print("=" * 60 + "\n")
 
 # Configuration
-DATA_FILE = 'training_data_simple.csv'  # Ultra-simple: zero randomness, perfect linear
+DATA_FILE = 'training_data_simple'  # Ultra-simple: zero randomness, perfect linear
 MODEL_SAVE_PATH = 'aegis_lstm_model.h5'
 SEQUENCE_LENGTH = 60  # Use last 60 time steps to predict next (increased for better patterns)
 TRAIN_SPLIT = 0.8
@@ -75,35 +84,12 @@ EPOCHS = 100
 LEARNING_RATE = 0.001
 ENABLE_EARLY_STOPPING = False  # Set to False to train full 100 epochs
 
-def load_and_preprocess_data(filepath):
-    """Load and preprocess training data"""
-    print("=" * 60)
-    print("[*] LOADING TRAINING DATA")
-    print("=" * 60)
-    
-    # Load CSV
-    df = pd.read_csv(filepath)
-    print(f"[+] Loaded {len(df)} samples from {filepath}\n")
-    
-    # Display info
-    print("Dataset columns:", df.columns.tolist())
-    print("\nDataset shape:", df.shape)
-    print("\nFirst few rows:")
-    print(df.head())
-    
-    # Extract features and target
-    feature_cols = ['blr', 'buy_volume', 'sell_volume', 'mid_price']
-    target_col = 'risk_score'
-    
-    X = df[feature_cols].values
-    y = df[target_col].values
-    
-    print(f"\n[+] Features shape: {X.shape}")
-    print(f"[+] Target shape: {y.shape}\n")
-    
-    return X, y, df
+# tf.data input pipeline (--pipeline tf.data)
+TFDATA_CACHE_DIR = 'tfdata_cache'  # Windowed splits are cached here after the first epoch
+SHUFFLE_BUFFER = 10000
+COMPARE_EPOCHS = 3  # Epochs per pipeline for --compare-pipelines
 
-def create_sequences(X, y, sequence_length=50):
+def create_sequences(X, y, sequence_length=50, stride=1, horizon=1):
     """
     Create sequences for LSTM input.
     
@@ -111,26 +97,184 @@ def create_sequences(X, y, sequence_length=50):
     (n_samples - sequence_length, sequence_length, n_features)
     
     Each sample contains the last `sequence_length` time steps.
+    The result is a strided view of X (see windowing.py), not a copy.
     """
     print("=" * 60)
     print(f"[*] CREATING SEQUENCES (Length: {sequence_length})")
     print("=" * 60)
     
-    X_seq = []
-    y_seq = []
-    
-    for i in range(sequence_length, len(X)):
-        X_seq.append(X[i-sequence_length:i])
-        y_seq.append(y[i])
-    
-    X_seq = np.array(X_seq)
-    y_seq = np.array(y_seq)
+    X_seq, y_seq = sliding_windows(X, y, sequence_length, stride=stride, horizon=horizon)
     
     print(f"[+] Sequence features shape: {X_seq.shape}")
     print(f"[+] Sequence target shape: {y_seq.shape}\n")
     
     return X_seq, y_seq
 
+def split_sequences(X_scaled, y):
+    """In-memory windows with the original shuffled train/validation/test split"""
+    X_seq, y_seq = create_sequences(X_scaled, y, sequence_length=SEQUENCE_LENGTH)
+    
+    print("=" * 60)
+    print("[+] SPLITTING DATA")
+    print("=" * 60)
+    # Split into train/test sets
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_seq, y_seq, train_size=TRAIN_SPLIT, shuffle=True, random_state=42  # SHUFFLE to mix BLR values!
+    )
+    
+    # Further split train into train/validation
+    X_train, X_val, y_train, y_val = train_test_split(
+        X_train, y_train,
+        train_size=0.9,
+        shuffle=False
+    )
+    
+    print(f"Training set:   {X_train.shape[0]} samples")
+    print(f"Validation set: {X_val.shape[0]} samples")
+    print(f"Test set:       {X_test.shape[0]} samples\n")
+    
+    return X_train, X_val, X_test, y_train, y_val, y_test
+
+def time_ordered_split(n_windows):
+    """Chronological (start, stop) window ranges for train / validation / test"""
+    n_train_full = int(n_windows * TRAIN_SPLIT)
+    n_train = int(n_train_full * 0.9)
+    return {
+        'train': (0, n_train),
+        'val': (n_train, n_train_full),
+        'test': (n_train_full, n_windows)
+    }
+
+def build_tf_datasets(X, y, sequence_length=SEQUENCE_LENGTH):
+    """
+    tf.data pipeline built from the raw (n_samples, n_features) matrix.
+    
+    Windows are sliced on the fly from one in-graph feature tensor (same
+    alignment as create_sequences), split in time order, cached to
+    TFDATA_CACHE_DIR and prefetched so input prep overlaps with training.
+    Only the training split is shuffled (deterministically, seed 42).
+    """
+    print("=" * 60)
+    print(f"[*] BUILDING tf.data PIPELINE (Length: {sequence_length})")
+    print("=" * 60)
+    
+    AUTOTUNE = tf.data.AUTOTUNE
+    n_features = X.shape[1]
+    features = tf.constant(X, dtype=tf.float32)
+    targets = tf.constant(y, dtype=tf.float32)
+    
+    # Cache files are keyed by the data, so a new CSV never reads a stale cache
+    fingerprint = hashlib.sha256(np.ascontiguousarray(X).tobytes() + np.ascontiguousarray(y).tobytes())
+    fingerprint = f"{fingerprint.hexdigest()[:12]}_L{sequence_length}"
+    os.makedirs(TFDATA_CACHE_DIR, exist_ok=True)
+    
+    def window(start):
+        X_window = tf.ensure_shape(features[start:start + sequence_length], (sequence_length, n_features))
+        return X_window, targets[start + sequence_length]
+    
+    splits = time_ordered_split(num_windows(len(X), sequence_length))
+    datasets = {}
+    for name, (start, stop) in splits.items():
+        ds = tf.data.Dataset.range(start, stop)
+        ds = ds.map(window, num_parallel_calls=AUTOTUNE, deterministic=True)
+        ds = ds.cache(os.path.join(TFDATA_CACHE_DIR, f"{name}_{fingerprint}"))
+        if name == 'train':
+            ds = ds.shuffle(SHUFFLE_BUFFER, seed=42, reshuffle_each_iteration=True)
+        datasets[name] = ds.batch(BATCH_SIZE).prefetch(AUTOTUNE)
+        print(f"[+] {name:<5} windows {start}..{stop} ({stop - start} samples)")
+    
+    print(f"[+] Cache: {TFDATA_CACHE_DIR}/*_{fingerprint}\n")
+    
+    y_test = y[splits['test'][0] + sequence_length:splits['test'][1] + sequence_length]
+    return datasets, {name: stop - start for name, (start, stop) in splits.items()}, y_test
+
+class ThroughputLogger(keras.callbacks.Callback):
+    """Log training steps/sec per epoch (validation time excluded)"""
+    
+    def __init__(self, batch_size=BATCH_SIZE):
+        super().__init__()
+        self.batch_size = batch_size
+        self.steps_per_sec = []
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+        self.last_step = self.epoch_start
+        self.steps = 0
+    
+    def on_train_batch_end(self, batch, logs=None):
+        self.steps += 1
+        self.last_step = time.perf_counter()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        rate = self.steps / max(self.last_step - self.epoch_start, 1e-9)
+        self.steps_per_sec.append(rate)
+        print(f"    [throughput] {rate:.1f} steps/s ({rate * self.batch_size:.0f} samples/s)")
+    
+    def steady_state(self):
+        """Mean steps/sec without the first epoch (tracing, cache fill)"""
+        rates = self.steps_per_sec[1:] or self.steps_per_sec
+        return float(np.mean(rates)) if rates else 0.0
+
+class ResumableCheckpoint(keras.callbacks.Callback):
+    """
+    Periodic resumable checkpoint (see checkpointing.py).
+    
+    model.keras holds weights and optimizer state (including the current
+    learning rate); state.json holds epoch, history, RNG states and the
+    internal counters of the tracked callbacks (best / wait / cooldown).
+    """
+    STATE_ATTRS = ('best', 'wait', 'cooldown_counter', 'best_epoch')
+    
+    def __init__(self, manager, tracked_callbacks, resume_state=None):
+        super().__init__()
+        self.manager = manager
+        self.tracked_callbacks = tracked_callbacks
+        self.resume_state = resume_state
+        self.history = dict(resume_state['history']) if resume_state else {}
+    
+    def on_train_begin(self, logs=None):
+        # Runs after the tracked callbacks reset themselves in their own on_train_begin
+        if self.resume_state:
+            for callback, saved in zip(self.tracked_callbacks, self.resume_state['callbacks']):
+                for attr, value in saved.items():
+                    setattr(callback, attr, value)
+    
+    def on_epoch_end(self, epoch, logs=None):
+        for key, value in (logs or {}).items():
+            self.history.setdefault(key, []).append(float(value))
+        if self.manager.should_save(epoch + 1):
+            self.manager.save(epoch + 1, lambda tmp_dir: self._write(tmp_dir, epoch + 1))
+    
+    def _write(self, tmp_dir, epoch):
+        self.model.save(tmp_dir / 'model.keras')
+        state = {
+            'epoch': epoch,
+            'history': self.history,
+            'callbacks': [
+                {attr: float(getattr(callback, attr)) for attr in self.STATE_ATTRS
+                 if isinstance(getattr(callback, attr, None), (int, float, np.number))}
+                for callback in self.tracked_callbacks
+            ],
+            'rng': capture_rng_state(),
+        }
+        with open(tmp_dir / 'state.json', 'w') as f:
+            json.dump(state, f)
+
+def load_checkpoint(checkpoints):
+    """(model, state) from the latest checkpoint, or (None, None)"""
+    path = checkpoints.latest()
+    if path is None:
+        print("[*] No checkpoint found - starting from epoch 0")
+        return None, None
+    
+    model = keras.models.load_model(path / 'model.keras')
+    with open(path / 'state.json') as f:
+        state = json.load(f)
+    restore_rng_state(state['rng'])
+    
+    print(f"[+] Resumed from {path} (epoch {state['epoch']})")
+    return model, state
+
 def build_lstm_model(input_shape):
     """
     Build LSTM architecture:
@@ -184,17 +328,24 @@ def build_lstm_model(input_shape):
     
     return model
 
-def train_model(model, X_train, y_train, X_val, y_val):
-    """Train the LSTM model with callbacks"""
+def train_model(model, train_data, val_data, num_train, num_val, checkpoints=None, resume=False):
+    """
+    Train the LSTM model with callbacks
+    
+    train_data / val_data are (X, y) arrays or batched tf.data.Datasets.
+    With resume, training continues from the latest checkpoint (the model is
+    replaced by the checkpointed one). Returns (history, model).
+    """
     print("=" * 60)
     print("[*] TRAINING LSTM MODEL")
     print("=" * 60)
-    print(f"Training samples: {len(X_train)}")
-    print(f"Validation samples: {len(X_val)}")
+    print(f"Training samples: {num_train}")
+    print(f"Validation samples: {num_val}")
     print(f"Batch size: {BATCH_SIZE}")
     print(f"Max epochs: {EPOCHS}\n")
     
     # Callbacks
+    throughput = ThroughputLogger()
     callbacks = [
         # Save best model
         ModelCheckpoint(
@@ -211,7 +362,10 @@ def train_model(model, X_train, y_train, X_val, y_val):
             patience=10,
             min_lr=1e-7,
             verbose=1
-        )
+        ),
+        
+        # Log steps/sec
+        throughput
     ]
     
     # Add early stopping only if enabled
@@ -226,19 +380,78 @@ def train_model(model, X_train, y_train, X_val, y_val):
     else:
         print("[*] Early stopping: DISABLED - Training full {} epochs".format(EPOCHS))
     
+    # Resumable checkpoints
+    initial_epoch = 0
+    checkpoint = None
+    if checkpoints is not None:
+        resume_state = None
+        if resume:
+            resumed_model, resume_state = load_checkpoint(checkpoints)
+            if resumed_model is not None:
+                model = resumed_model
+                initial_epoch = resume_state['epoch']
+        
+        tracked = [cb for cb in callbacks if isinstance(cb, (ModelCheckpoint, ReduceLROnPlateau, EarlyStopping))]
+        checkpoint = ResumableCheckpoint(checkpoints, tracked, resume_state)
+        callbacks.append(checkpoint)
+        print(f"[*] Checkpoints: every {checkpoints.every} epoch(s) to {checkpoints.directory} "
+              f"(keeping {checkpoints.keep_last})")
+    
     # Train
     history = model.fit(
-        X_train, y_train,
-        validation_data=(X_val, y_val),
-        batch_size=BATCH_SIZE,
+        **fit_inputs(train_data, val_data),
         epochs=EPOCHS,
+        initial_epoch=initial_epoch,
         callbacks=callbacks,
         verbose=1
     )
+    print(f"[+] Steady-state throughput: {throughput.steady_state():.1f} steps/s")
+    
+    if checkpoint is not None:
+        history.history = checkpoint.history  # Include epochs from before the resume
     
     print("\n[+] Training completed!\n")
     
-    return history
+    return history, model
+
+def fit_inputs(train_data, val_data):
+    """model.fit arguments for array or tf.data inputs"""
+    if isinstance(train_data, tf.data.Dataset):
+        return {'x': train_data, 'validation_data': val_data}
+    X_train, y_train = train_data
+    return {'x': X_train, 'y': y_train, 'validation_data': val_data, 'batch_size': BATCH_SIZE}
+
+def compare_pipelines(X_scaled, y):
+    """Train a fresh model for COMPARE_EPOCHS with each input pipeline and report steps/sec"""
+    print("=" * 60)
+    print(f"[*] COMPARING INPUT PIPELINES ({COMPARE_EPOCHS} epochs each)")
+    print("=" * 60)
+    
+    results = {}
+    for pipeline in ('numpy', 'tf.data'):
+        print(f"\n[*] Pipeline: {pipeline}")
+        if pipeline == 'numpy':
+            X_train, X_val, _, y_train, y_val, _ = split_sequences(X_scaled, y)
+            train_data, val_data = (X_train, y_train), (X_val, y_val)
+        else:
+            datasets, _, _ = build_tf_datasets(X_scaled, y)
+            train_data, val_data = datasets['train'], datasets['val']
+        
+        model = build_lstm_model((SEQUENCE_LENGTH, X_scaled.shape[1]))
+        throughput = ThroughputLogger()
+        model.fit(**fit_inputs(train_data, val_data), epochs=COMPARE_EPOCHS,
+                  callbacks=[throughput], verbose=2)
+        results[pipeline] = throughput.steady_state()
+    
+    print("\n" + "=" * 60)
+    print("[=] INPUT PIPELINE THROUGHPUT (steady state)")
+    print("=" * 60)
+    for pipeline, rate in results.items():
+        speedup = rate / results['numpy'] if results['numpy'] else 0.0
+        print(f"  {pipeline:<8} {rate:>8.1f} steps/s  {rate * BATCH_SIZE:>9.0f} samples/s  ({speedup:.2f}x)")
+    print("=" * 60 + "\n")
+    
+    return results
 
 def evaluate_model(model, X_test, y_test):
     """Evaluate model performance"""
@@ -330,56 +543,43 @@ def plot_predictions(y_test, y_pred):
     plt.savefig('prediction_results.png', dpi=150)
     print("[+] Prediction results plot saved to: prediction_results.png\n")
 
-def main():
+def main(pipeline='numpy', compare=False, checkpoints=None, resume=False):
     """Main training pipeline"""
     print("\n" + "=" * 60)
     print("AEGIS PROTOCOL - LSTM TRAINING PIPELINE")
     print("Market Crash Prediction Model")
     print("=" * 60 + "\n")
     
-    # Step 1: Load data
-    X, y, df = load_and_preprocess_data(DATA_FILE)
+    # Step 1-2: Load normalized features (cached, see dataset_cache.py)
+    X_scaled, y, _ = load_dataset(DATA_FILE)
     
-    # Step 2: Normalize features
-    print("=" * 60)
-    print("[*] NORMALIZING FEATURES")
-    print("=" * 60)
-    scaler = MinMaxScaler()
-    X_scaled = scaler.fit_transform(X)
-    print("[+] Features normalized to [0, 1] range\n")
+    if compare:
+        compare_pipelines(X_scaled, y)
+        return
     
-    # Step 3: Create sequences
-    X_seq, y_seq = create_sequences(X_scaled, y, sequence_length=SEQUENCE_LENGTH)
-    
-    # Step 4: Train/test split
-    print("=" * 60)
-    print("[+] SPLITTING DATA")
-    print("=" * 60)
-    # Split into train/test sets
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_seq, y_seq, train_size=TRAIN_SPLIT, shuffle=True, random_state=42  # SHUFFLE to mix BLR values!
-    )
-    
-    # Further split train into train/validation
-    X_train, X_val, y_train, y_val = train_test_split(
-        X_train, y_train,
-        train_size=0.9,
-        shuffle=False
-    )
-    
-    print(f"Training set:   {X_train.shape[0]} samples")
-    print(f"Validation set: {X_val.shape[0]} samples")
-    print(f"Test set:       {X_test.shape[0]} samples\n")
+    # Step 3-4: Create sequences and split
+    if pipeline == 'tf.data':
+        datasets, sizes, y_test = build_tf_datasets(X_scaled, y, sequence_length=SEQUENCE_LENGTH)
+        train_data, val_data, test_data = datasets['train'], datasets['val'], datasets['test']
+        
+        print(f"Training set:   {sizes['train']} samples")
+        print(f"Validation set: {sizes['val']} samples")
+        print(f"Test set:       {sizes['test']} samples\n")
+    else:
+        X_train, X_val, X_test, y_train, y_val, y_test = split_sequences(X_scaled, y)
+        train_data, val_data, test_data = (X_train, y_train), (X_val, y_val), X_test
+        sizes = {'train': len(X_train), 'val': len(X_val)}
     
     # Step 5: Build model
-    input_shape = (X_train.shape[1], X_train.shape[2])  # (sequence_length, n_features)
+    input_shape = (SEQUENCE_LENGTH, X_scaled.shape[1])  # (sequence_length, n_features)
     model = build_lstm_model(input_shape)
     
     # Step 6: Train model
-    history = train_model(model, X_train, y_train, X_val, y_val)
+    history, model = train_model(model, train_data, val_data, sizes['train'], sizes['val'],
+                                 checkpoints=checkpoints, resume=resume)
     
     # Step 7: Evaluate model
-    y_pred, metrics = evaluate_model(model, X_test, y_test)
+    y_pred, metrics = evaluate_model(model, test_data, y_test)
     
     # Step 8: Visualizations
     print("=" * 60)
@@ -411,5 +611,17 @@ def main():
     print("=" * 60 + "\n")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train the Aegis LSTM crash-risk model")
+    parser.add_argument('--pipeline', choices=['numpy', 'tf.data'], default='numpy',
+                        help="Input pipeline: in-memory windows (numpy) or streaming tf.data")
+    parser.add_argument('--compare-pipelines', action='store_true',
+                        help=f"Train {COMPARE_EPOCHS} epochs with each pipeline and report steps/sec")
+    parser.add_argument('--resume', action='store_true', help="Continue from the latest checkpoint")
+    parser.add_argument('--checkpoint-dir', default=os.path.join(CHECKPOINT_DIR, 'keras'))
+    parser.add_argument('--checkpoint-every', type=int, default=SAVE_EVERY, help="Epochs between checkpoints")
+    parser.add_argument('--keep-checkpoints', type=int, default=KEEP_LAST, help="Checkpoints to keep")
+    args = parser.parse_args()
+    
+    checkpoints = CheckpointManager(args.checkpoint_dir, args.keep_checkpoints, args.checkpoint_every)
+    main(pipeline=args.pipeline, compare=args.compare_pipelines, checkpoints=checkpoints, resume=args.resume)
 
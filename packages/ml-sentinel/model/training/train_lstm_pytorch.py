@@ -6,14 +6,21 @@ GPU-Accelerated Training for Market Crash Prediction
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
-import pandas as pd
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+import os
 import time
+import argparse
+from contextlib import nullcontext
+
+from windowing import sliding_windows
+from dataset_cache import load_dataset
+from checkpointing import (
+    CheckpointManager, capture_rng_state, restore_rng_state,
+    CHECKPOINT_DIR, KEEP_LAST, SAVE_EVERY
+)
 
 # ============================================================
 # GPU CONFIGURATION
@@ -30,32 +37,94 @@ print("[*] Training time: ~10 minutes")
 print("=" * 60 + "\n")
 
 # Configuration
-DATA_FILE = 'training_data_final.csv'
+DATA_FILE = 'training_data_final'
 MODEL_SAVE_PATH = 'aegis_lstm_pytorch.pth'
 SEQUENCE_LENGTH = 60
 BATCH_SIZE = 128  # Good for GPU
 EPOCHS = 100
 LEARNING_RATE = 0.001
 
+# CPU performance mode (--perf enables all of these)
+NUM_THREADS = None  # Intra-op threads (None = PyTorch default)
+NUM_WORKERS = 0  # DataLoader worker processes
+COMPILE_MODEL = False  # torch.compile LSTMModel
+USE_BF16 = False  # bf16 autocast (only if the CPU supports bf16)
+
 # ============================================================
 # Dataset Class
 # ============================================================
-class TimeSeriesDataset(Dataset):
-    def __init__(self, X, y):
-        self.X = torch.FloatTensor(X)
-        self.y = torch.FloatTensor(y)
+class WindowedTimeSeriesDataset(Dataset):
+    """
+    LSTM windows sliced on demand from a single (n_samples, n_features) array.
+
+    Only the base features and targets are stored (O(N) memory, not O(N x 60));
+    the windows are a strided view that is gathered per batch. The base may be
+    a memory-mapped array (np.load(path, mmap_mode='r')), then only the rows a
+    batch touches are read from disk.
+
+    Indexing with an int returns one (window, target) pair; indexing with a
+    list / array of indices gathers a whole batch in one index op (see
+    make_loader).
+    """
+    def __init__(self, features, targets, sequence_length=SEQUENCE_LENGTH, indices=None):
+        self.features = features
+        self.targets_base = targets
+        self.sequence_length = sequence_length
+        self.windows, self.targets = sliding_windows(features, targets, sequence_length)
+        if indices is None:
+            indices = np.arange(len(self.windows))
+        self.indices = np.asarray(indices, dtype=np.int64)
     
     def __len__(self):
-        return len(self.X)
+        return len(self.indices)
     
     def __getitem__(self, idx):
-        return self.X[idx], self.y[idx]
+        rows = self.indices[idx]
+        X = self.windows[rows].astype(np.float32)
+        y = np.asarray(self.targets[rows]).astype(np.float32)
+        return torch.from_numpy(X), torch.from_numpy(y)
+    
+    def __getstate__(self):
+        # Workers get the base arrays, not the (copied-on-pickle) window view
+        return {'features': self.features, 'targets': self.targets_base,
+                'sequence_length': self.sequence_length, 'indices': self.indices}
+    
+    def __setstate__(self, state):
+        self.__init__(state['features'], state['targets'], state['sequence_length'], state['indices'])
+    
+    def subset(self, start, stop):
+        """Chronological slice of the windows sharing the same base array"""
+        return WindowedTimeSeriesDataset(self.features, self.targets_base, self.sequence_length,
+                                         self.indices[start:stop])
+    
+    def target_array(self):
+        return np.asarray(self.targets[self.indices])
+
+def split_dataset(dataset):
+    """Chronological train / validation / test (sizes of train_test_split(shuffle=False))"""
+    n_train_full = int(len(dataset) * 0.8)
+    n_train = int(n_train_full * 0.9)
+    return (dataset.subset(0, n_train),
+            dataset.subset(n_train, n_train_full),
+            dataset.subset(n_train_full, len(dataset)))
+
+def make_loader(dataset, batch_size, shuffle=False, num_workers=0):
+    """DataLoader that fetches each batch with a single gather"""
+    base_sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(base_sampler, batch_size=batch_size, drop_last=False),
+        batch_size=None,  # Batches come pre-assembled from __getitem__
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,  # Keep workers alive across epochs
+        pin_memory=device.type == 'cuda'
+    )
 
 # ============================================================
 # LSTM Model
 # ============================================================
 class LSTMModel(nn.Module):
-    def __init__(self, input_size, hidden_size1=128, hidden_size2=64, dropout=0.3):
+    def __init__(self, input_size, hidden_size1=128, hidden_size2=64, dropout=0.3, fc_size=32):
         super(LSTMModel, self).__init__()
         
         # First LSTM layer
@@ -67,10 +136,10 @@ class LSTMModel(nn.Module):
         self.dropout2 = nn.Dropout(dropout)
         
         # Dense layers
-        self.fc1 = nn.Linear(hidden_size2, 32)
+        self.fc1 = nn.Linear(hidden_size2, fc_size)
         self.relu = nn.ReLU()
         self.dropout3 = nn.Dropout(0.2)
-        self.fc2 = nn.Linear(32, 1)
+        self.fc2 = nn.Linear(fc_size, 1)
         self.sigmoid = nn.Sigmoid()
     
     def forward(self, x):
@@ -94,85 +163,137 @@ class LSTMModel(nn.Module):
         return out
 
 # ============================================================
-# Data Loading
+# CPU Performance
 # ============================================================
-def load_and_preprocess_data(filepath):
-    print("=" * 60)
-    print("[*] LOADING TRAINING DATA")
-    print("=" * 60)
-    
-    df = pd.read_csv(filepath)
-    print(f"[+] Loaded {len(df)} samples from {filepath}\n")
-    
-    # Extract features and target
-    feature_cols = ['blr', 'buy_volume', 'sell_volume', 'mid_price']
-    target_col = 'risk_score'
-    
-    X = df[feature_cols].values
-    y = df[target_col].values
-    
-    print(f"[+] Features shape: {X.shape}")
-    print(f"[+] Target shape: {y.shape}\n")
-    
-    return X, y
+def cpu_supports_bf16():
+    """True if the CPU has native bf16 instructions (AVX512-BF16 or AMX)"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
 
-def create_sequences(X, y, sequence_length=60):
+def configure_cpu(num_threads=NUM_THREADS, use_bf16=USE_BF16):
+    """Set thread counts; returns the autocast dtype to train with (or None)"""
     print("=" * 60)
-    print(f"[*] CREATING SEQUENCES (Length: {sequence_length})")
+    print("[*] CPU PERFORMANCE SETTINGS")
     print("=" * 60)
     
-    X_seq = []
-    y_seq = []
-    
-    for i in range(sequence_length, len(X)):
-        X_seq.append(X[i-sequence_length:i])
-        y_seq.append(y[i])
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    print(f"[+] Intra-op threads: {torch.get_num_threads()} ({os.cpu_count()} logical CPUs)")
     
-    X_seq = np.array(X_seq)
-    y_seq = np.array(y_seq)
+    autocast_dtype = None
+    if use_bf16:
+        if cpu_supports_bf16():
+            autocast_dtype = torch.bfloat16
+            print("[+] bf16 autocast enabled")
+        else:
+            print("[!] CPU has no native bf16 support - staying in fp32")
     
-    print(f"[+] Sequence features shape: {X_seq.shape}")
-    print(f"[+] Sequence target shape: {y_seq.shape}\n")
-    
-    return X_seq, y_seq
+    print("=" * 60 + "\n")
+    return autocast_dtype
+
+def autocast(autocast_dtype):
+    if autocast_dtype is None:
+        return nullcontext()
+    return torch.autocast(device_type=device.type, dtype=autocast_dtype)
+
+def unwrap(model):
+    """Underlying LSTMModel of a torch.compile'd model (for state_dict I/O)"""
+    return getattr(model, '_orig_mod', model)
+
+# ============================================================
+# Checkpoints
+# ============================================================
+def save_checkpoint(checkpoints, epoch, model, optimizer, scheduler, history, best_val_loss):
+    """Write everything needed to continue training after `epoch`"""
+    state = {
+        'epoch': epoch,
+        'model': unwrap(model).state_dict(),
+        'optimizer': optimizer.state_dict(),
+        'scheduler': scheduler.state_dict(),
+        'history': history,
+        'best_val_loss': best_val_loss,
+        'rng': capture_rng_state(),
+        'torch_rng': torch.get_rng_state(),
+    }
+    return checkpoints.save(epoch, lambda tmp_dir: torch.save(state, tmp_dir / 'state.pt'))
+
+def restore_checkpoint(checkpoints, model, optimizer, scheduler):
+    """Load the latest checkpoint in place; returns (epoch, history, best_val_loss)"""
+    path = checkpoints.latest()
+    if path is None:
+        print("[*] No checkpoint found - starting from epoch 0")
+        return 0, None, float('inf')
+    
+    state = torch.load(path / 'state.pt')
+    unwrap(model).load_state_dict(state['model'])
+    optimizer.load_state_dict(state['optimizer'])
+    scheduler.load_state_dict(state['scheduler'])
+    restore_rng_state(state['rng'])
+    torch.set_rng_state(state['torch_rng'])
+    
+    print(f"[+] Resumed from {path} (epoch {state['epoch']})")
+    return state['epoch'], state['history'], state['best_val_loss']
 
 # ============================================================
 # Training Function
 # ============================================================
-def train_model(model, train_loader, val_loader, epochs=100):
+def train_model(model, train_loader, val_loader, epochs=100, autocast_dtype=None,
+                learning_rate=LEARNING_RATE, save_path=MODEL_SAVE_PATH,
+                checkpoints=None, resume=False):
     print("=" * 60)
     print("[*] TRAINING LSTM MODEL (GPU)")
     print("=" * 60)
     
     criterion = nn.MSELoss()
-    optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
+    optimizer = optim.Adam(model.parameters(), lr=learning_rate)
+    # Same schedule as the Keras trainer's ReduceLROnPlateau
+    scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min', factor=0.5,
+                                                     patience=10, min_lr=1e-7)
     
     history = {'train_loss': [], 'val_loss': [], 'train_mae': [], 'val_mae': []}
     best_val_loss = float('inf')
+    start_epoch = 0
+    
+    if checkpoints is not None and resume:
+        start_epoch, saved_history, best_val_loss = restore_checkpoint(checkpoints, model, optimizer, scheduler)
+        history = saved_history or history
     
     start_time = time.time()
+    train_seconds = 0.0
+    train_samples = 0
     
-    for epoch in range(epochs):
+    for epoch in range(start_epoch, epochs):
         # Training
         model.train()
         train_loss = 0
         train_mae = 0
+        epoch_start = time.perf_counter()
+        epoch_samples = 0
         
         for X_batch, y_batch in train_loader:
             X_batch = X_batch.to(device)
             y_batch = y_batch.to(device).unsqueeze(1)
             
             optimizer.zero_grad()
-            outputs = model(X_batch)
+            with autocast(autocast_dtype):
+                outputs = model(X_batch).float()
             loss = criterion(outputs, y_batch)
             loss.backward()
             optimizer.step()
+            epoch_samples += len(X_batch)
             
             train_loss += loss.item()
             train_mae += torch.mean(torch.abs(outputs - y_batch)).item()
         
         train_loss /= len(train_loader)
         train_mae /= len(train_loader)
+        epoch_seconds = time.perf_counter() - epoch_start
+        train_seconds += epoch_seconds
+        train_samples += epoch_samples
         
         # Validation
         model.eval()
@@ -184,7 +305,8 @@ def train_model(model, train_loader, val_loader, epochs=100):
                 X_batch = X_batch.to(device)
                 y_batch = y_batch.to(device).unsqueeze(1)
                 
-                outputs = model(X_batch)
+                with autocast(autocast_dtype):
+                    outputs = model(X_batch).float()
                 loss = criterion(outputs, y_batch)
                 
                 val_loss += loss.item()
@@ -198,19 +320,27 @@ def train_model(model, train_loader, val_loader, epochs=100):
         history['train_mae'].append(train_mae)
         history['val_mae'].append(val_mae)
         
+        scheduler.step(val_loss)
+        
         # Save best model
         if val_loss < best_val_loss:
             best_val_loss = val_loss
-            torch.save(model.state_dict(), MODEL_SAVE_PATH)
+            torch.save(unwrap(model).state_dict(), save_path)
+        
+        # Periodic resumable checkpoint
+        if checkpoints is not None and checkpoints.should_save(epoch + 1):
+            save_checkpoint(checkpoints, epoch + 1, model, optimizer, scheduler, history, best_val_loss)
         
         if (epoch + 1) % 10 == 0:
             elapsed = time.time() - start_time
             print(f"Epoch {epoch+1}/{epochs} - "
                   f"Loss: {train_loss:.6f} - Val Loss: {val_loss:.6f} - "
-                  f"Time: {elapsed:.1f}s")
+                  f"Time: {elapsed:.1f}s - "
+                  f"{epoch_samples / epoch_seconds:.0f} samples/s")
     
     total_time = time.time() - start_time
-    print(f"\n[+] Training completed in {total_time/60:.1f} minutes!\n")
+    print(f"\n[+] Training completed in {total_time/60:.1f} minutes!")
+    print(f"[+] Training throughput: {train_samples / max(train_seconds, 1e-9):.0f} samples/s\n")
     
     return history
 
@@ -250,65 +380,64 @@ def evaluate_model(model, test_loader, y_test):
 # ============================================================
 # Main Pipeline
 # ============================================================
-def main():
+def main(num_threads=NUM_THREADS, num_workers=NUM_WORKERS, compile_model=COMPILE_MODEL, use_bf16=USE_BF16,
+         checkpoints=None, resume=False):
     print("\n" + "=" * 60)
     print("AEGIS PROTOCOL - PYTORCH GPU TRAINING")
     print("Market Crash Prediction - LSTM Model")
     print("=" * 60 + "\n")
     
-    # Load data
-    X, y = load_and_preprocess_data(DATA_FILE)
+    autocast_dtype = configure_cpu(num_threads, use_bf16)
+    
+    # Load normalized features (cached, see dataset_cache.py)
+    X_scaled, y, _ = load_dataset(DATA_FILE)
     
-    # Normalize
+    # Create windows (views into X_scaled, sliced per batch)
     print("=" * 60)
-    print("[*] NORMALIZING FEATURES")
+    print(f"[*] CREATING SEQUENCES (Length: {SEQUENCE_LENGTH})")
     print("=" * 60)
-    scaler = MinMaxScaler()
-    X_scaled = scaler.fit_transform(X)
-    print("[+] Features normalized to [0, 1] range\n")
+    dataset = WindowedTimeSeriesDataset(X_scaled, y, SEQUENCE_LENGTH)
+    print(f"[+] Windows: {len(dataset)} x ({SEQUENCE_LENGTH}, {X_scaled.shape[1]}) "
+          f"backed by {X_scaled.nbytes / 1024**2:.1f} MB of features\n")
     
-    # Create sequences
-    X_seq, y_seq = create_sequences(X_scaled, y, sequence_length=SEQUENCE_LENGTH)
-    
-    # Train/test split
+    # Train/test split (chronological, same sizes as train_test_split(shuffle=False))
     print("=" * 60)
     print("[+] SPLITTING DATA")
     print("=" * 60)
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_seq, y_seq, train_size=0.8, shuffle=False
-    )
+    train_dataset, val_dataset, test_dataset = split_dataset(dataset)
+    y_test = test_dataset.target_array()
     
-    X_train, X_val, y_train, y_val = train_test_split(
-        X_train, y_train, train_size=0.9, shuffle=False
-    )
-    
-    print(f"Training set:   {X_train.shape[0]} samples")
-    print(f"Validation set: {X_val.shape[0]} samples")
-    print(f"Test set:       {X_test.shape[0]} samples\n")
+    print(f"Training set:   {len(train_dataset)} samples")
+    print(f"Validation set: {len(val_dataset)} samples")
+    print(f"Test set:       {len(test_dataset)} samples\n")
     
-    # Create datasets and loaders
-    train_dataset = TimeSeriesDataset(X_train, y_train)
-    val_dataset = TimeSeriesDataset(X_val, y_val)
-    test_dataset = TimeSeriesDataset(X_test, y_test)
-    
-    train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=False)
-    val_loader = DataLoader(val_dataset, batch_size=BATCH_SIZE, shuffle=False)
-    test_loader = DataLoader(test_dataset, batch_size=BATCH_SIZE, shuffle=False)
+    # Create loaders
+    train_loader = make_loader(train_dataset, BATCH_SIZE, shuffle=False, num_workers=num_workers)
+    val_loader = make_loader(val_dataset, BATCH_SIZE, shuffle=False, num_workers=num_workers)
+    test_loader = make_loader(test_dataset, BATCH_SIZE, shuffle=False)
     
     # Build model
     print("=" * 60)
     print("[*] BUILDING LSTM MODEL")
     print("=" * 60)
-    input_size = X_train.shape[2]
+    input_size = X_scaled.shape[1]
     model = LSTMModel(input_size).to(device)
     print(model)
     print()
     
+    if compile_model:
+        if hasattr(torch, 'compile'):
+            model = torch.compile(model)
+            print("[+] Model compiled with torch.compile\n")
+        else:
+            print("[!] torch.compile requires PyTorch 2.x - running eagerly\n")
+    
     # Train
-    history = train_model(model, train_loader, val_loader, epochs=EPOCHS)
+    history = train_model(model, train_loader, val_loader, epochs=EPOCHS, autocast_dtype=autocast_dtype,
+                          checkpoints=checkpoints, resume=resume)
     
     # Load best model
-    model.load_state_dict(torch.load(MODEL_SAVE_PATH))
+    unwrap(model).load_state_dict(torch.load(MODEL_SAVE_PATH))
     
     # Evaluate
     predictions, metrics = evaluate_model(model, test_loader, y_test)
@@ -325,4 +454,23 @@ def main():
     print("=" * 60 + "\n")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train the Aegis LSTM crash-risk model (PyTorch)")
+    parser.add_argument('--perf', action='store_true',
+                        help="CPU performance mode: loader workers, torch.compile, bf16 if supported")
+    parser.add_argument('--threads', type=int, default=NUM_THREADS, help="Intra-op threads")
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS, help="DataLoader worker processes")
+    parser.add_argument('--compile', action='store_true', default=COMPILE_MODEL, help="torch.compile the model")
+    parser.add_argument('--bf16', action='store_true', default=USE_BF16, help="bf16 autocast on supported CPUs")
+    parser.add_argument('--resume', action='store_true', help="Continue from the latest checkpoint")
+    parser.add_argument('--checkpoint-dir', default=os.path.join(CHECKPOINT_DIR, 'pytorch'))
+    parser.add_argument('--checkpoint-every', type=int, default=SAVE_EVERY, help="Epochs between checkpoints")
+    parser.add_argument('--keep-checkpoints', type=int, default=KEEP_LAST, help="Checkpoints to keep")
+    args = parser.parse_args()
+    
+    if args.perf:
+        # Threads stay at PyTorch's default (one per physical core) unless given
+        args.workers = args.workers or 2
+        args.compile = args.bf16 = True
+    
+    checkpoints = CheckpointManager(args.checkpoint_dir, args.keep_checkpoints, args.checkpoint_every)
+    main(args.threads, args.workers, args.compile, args.bf16, checkpoints, args.resume)
@@ -0,0 +1,332 @@
+"""
+Aegis Protocol - Walk-Forward Validation
+Time-ordered out-of-sample evaluation of the PyTorch LSTM, one process per fold
+
+The trainers score a single split (train_lstm.py even shuffles windows
+before splitting, so neighbouring, overlapping windows land on both sides).
+This splits the windows of a chronological dataset into NUM_FOLDS + 1
+blocks; fold k tests on block k + 1 and trains on what came before it:
+- expanding: every window before the test block
+- rolling:    a fixed-size span right before it (--train-size windows,
+              default the size of fold 0's span)
+The last VAL_FRACTION of each training span picks the best epoch. Spans
+are separated by --gap windows (default: the sequence length) so no
+training window or target overlaps the rows that follow it.
+
+Folds train concurrently in a spawn process pool with --threads-per-worker
+intra-op threads each (as sweep_hyperparams.py). Every worker memory-maps
+the same dataset cache entry (dataset_cache.py); features are rescaled per
+fold to the min/max of its training rows on the fly, so no statistics of
+later data leak into a fold.
+
+Per fold and aggregated over folds:
+- MSE / RMSE / MAE / R² of the risk score
+- confusion matrix of alert decisions (normal / warning / critical at
+  WARNING_THRESHOLD / CRASH_THRESHOLD), actual vs predicted
+- crash alert precision / recall
+
+Use a time-ordered dataset: training_data_final is shuffled by
+create_final_dataset.py, which makes walk-forward splits meaningless.
+
+Usage:
+    python walk_forward.py --folds 5 --epochs 20
+    python walk_forward.py --data training_data_crawler --mode rolling --train-size 20000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import numpy as np
+
+ML_SENTINEL_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ML_SENTINEL_ROOT))
+from config.constants import CRASH_THRESHOLD, WARNING_THRESHOLD
+from shared.evaluation import classify_alerts
+from dataset_cache import load_dataset
+from sweep_hyperparams import init_worker, BASELINE
+from windowing import num_windows
+
+# Configuration
+DATA_FILE = 'training_data_real'
+RUNS_DIR = Path('walk_forward_runs')
+RESULTS_FILE = 'walk_forward_results.json'
+NUM_FOLDS = 5
+MODES = ('expanding', 'rolling')
+VAL_FRACTION = 0.1  # Tail of each training span used for best-epoch selection
+EPOCHS = 20
+PREDICT_BATCH_SIZE = 1024
+DECISIONS = ['normal', 'warning', 'critical']
+
+# ============================================================
+# Folds
+# ============================================================
+def fold_bounds(n_windows, num_folds=NUM_FOLDS, mode='expanding', gap=0, train_size=None,
+                val_fraction=VAL_FRACTION):
+    """
+    Window index ranges [start, stop) of every fold's train / val / test span.
+
+    The windows are cut into num_folds + 1 equal blocks (the last fold's
+    test block takes the remainder); fold k tests on block k + 1.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}' (expected one of {MODES})")
+    block = n_windows // (num_folds + 1)
+    if train_size is None:
+        train_size = block - gap
+
+    folds = []
+    for k in range(num_folds):
+        test_start = (k + 1) * block
+        test_stop = n_windows if k == num_folds - 1 else test_start + block
+        train_stop = test_start - gap
+        train_start = 0 if mode == 'expanding' else max(train_stop - train_size, 0)
+        val_start = train_stop - max(int((train_stop - train_start) * val_fraction), 1)
+        fit_stop = val_start - gap
+        if fit_stop - train_start < 1 or test_stop <= test_start:
+            raise ValueError(f"{n_windows} windows are too few for {num_folds} folds with a gap of {gap}")
+        folds.append({
+            'fold': k,
+            'train': [train_start, fit_stop],
+            'val': [val_start, train_stop],
+            'test': [test_start, test_stop],
+        })
+    return folds
+
+class RescaledWindows:
+    """
+    Windows of a WindowedTimeSeriesDataset rescaled per batch to
+    (X - low) * scale, leaving the shared base array untouched.
+    """
+    def __init__(self, dataset, low, scale):
+        import torch
+
+        self.dataset = dataset
+        self.low = torch.from_numpy(np.asarray(low, dtype=np.float32))
+        self.scale = torch.from_numpy(np.asarray(scale, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        X, y = self.dataset[idx]
+        return (X - self.low) * self.scale, y
+
+# ============================================================
+# Metrics
+# ============================================================
+def regression_metrics(y_true, y_pred):
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    mse = float(np.mean((y_pred - y_true) ** 2))
+    variance = float(np.var(y_true))
+    return {
+        'mse': mse,
+        'rmse': float(np.sqrt(mse)),
+        'mae': float(np.mean(np.abs(y_pred - y_true))),
+        'r2': 1.0 - mse / variance if variance > 0 else None,
+    }
+
+def decision_confusion(y_true, y_pred):
+    """3x3 counts of alert decisions, rows = actual, columns = predicted"""
+    actual = classify_alerts(y_true)
+    predicted = classify_alerts(y_pred)
+    classes = len(DECISIONS)
+    return np.bincount(actual * classes + predicted, minlength=classes * classes).reshape(classes, classes)
+
+def crash_metrics(confusion):
+    """Precision / recall of critical (crash) alerts from a decision confusion matrix"""
+    confusion = np.asarray(confusion)
+    hits = int(confusion[2, 2])
+    predicted = int(confusion[:, 2].sum())
+    actual = int(confusion[2, :].sum())
+    return {
+        'crash_precision': hits / predicted if predicted else None,
+        'crash_recall': hits / actual if actual else None,
+        'decision_accuracy': float(np.trace(confusion) / max(confusion.sum(), 1)),
+    }
+
+def aggregate(results):
+    """Mean / std of every per-fold metric and the summed confusion matrix"""
+    summary = {}
+    for name in results[0]['metrics']:
+        values = [r['metrics'][name] for r in results if r['metrics'][name] is not None]
+        if values:
+            summary[name] = {'mean': float(np.mean(values)), 'std': float(np.std(values))}
+    confusion = np.sum([r['confusion'] for r in results], axis=0)
+    return {'metrics': summary, 'confusion': confusion.tolist(), 'pooled': crash_metrics(confusion)}
+
+# ============================================================
+# Folds in workers
+# ============================================================
+def predict(model, dataset, batch_size=PREDICT_BATCH_SIZE):
+    import torch
+
+    model.eval()
+    with torch.no_grad():
+        return np.concatenate([
+            model(dataset[np.arange(i, min(i + batch_size, len(dataset)))][0]).numpy().reshape(-1)
+            for i in range(0, len(dataset), batch_size)
+        ])
+
+def run_fold(fold, config, data_file, epochs, runs_dir, seed):
+    """Train and test one fold; trainer output goes to the fold's log file"""
+    fold_dir = Path(runs_dir) / f"fold_{fold['fold']:02d}"
+    fold_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    with open(fold_dir / 'train.log', 'w') as log, contextlib.redirect_stdout(log):
+        import torch
+        import train_lstm_pytorch as trainer
+
+        torch.manual_seed(seed + fold['fold'])
+        X, y, _ = load_dataset(data_file)
+        sequence_length = config['sequence_length']
+        dataset = trainer.WindowedTimeSeriesDataset(X, y, sequence_length)
+
+        # Fold scaling from the rows its training windows cover
+        train_start, train_stop = fold['train']
+        train_rows = np.asarray(X[train_start:train_stop + sequence_length - 1])
+        low = train_rows.min(axis=0)
+        scale = 1.0 / np.maximum(train_rows.max(axis=0) - low, 1e-12)
+        spans = {name: RescaledWindows(dataset.subset(*fold[name]), low, scale)
+                 for name in ('train', 'val', 'test')}
+
+        model = trainer.LSTMModel(X.shape[1], config['hidden_size1'], config['hidden_size2'],
+                                  fc_size=config['fc_size'])
+        save_path = fold_dir / 'model.pth'
+        history = trainer.train_model(model,
+                                      trainer.make_loader(spans['train'], config['batch_size'], shuffle=True),
+                                      trainer.make_loader(spans['val'], config['batch_size']),
+                                      epochs=epochs, learning_rate=config['learning_rate'], save_path=save_path)
+
+        model.load_state_dict(torch.load(save_path))
+        y_test = dataset.subset(*fold['test']).target_array()
+        y_pred = predict(model, spans['test'])
+
+    confusion = decision_confusion(y_test, y_pred)
+    return {
+        **fold,
+        'metrics': {**regression_metrics(y_test, y_pred), **crash_metrics(confusion)},
+        'confusion': confusion.tolist(),
+        'best_epoch': int(np.argmin(history['val_loss'])) + 1,
+        'train_seconds': time.perf_counter() - start,
+        'model_path': str(save_path),
+    }
+
+# ============================================================
+# Report
+# ============================================================
+def format_metric(value, width=9, digits=4):
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}.{digits}f}"
+
+def print_results(results, summary):
+    print("\n" + "=" * 60)
+    print("[=] WALK-FORWARD RESULTS")
+    print("=" * 60)
+    print(f"  {'fold':>4} {'train':>8} {'test':>7} {'MSE':>9} {'MAE':>9} {'R2':>9} {'crash P':>9} {'crash R':>9}")
+    for r in results:
+        m = r['metrics']
+        print(f"  {r['fold']:>4} {r['train'][1] - r['train'][0]:>8} {r['test'][1] - r['test'][0]:>7} "
+              f"{format_metric(m['mse'], digits=6)} {format_metric(m['mae'])} {format_metric(m['r2'])} "
+              f"{format_metric(m['crash_precision'])} {format_metric(m['crash_recall'])}")
+
+    print("\n  Mean +/- std over folds:")
+    for name, stats in summary['metrics'].items():
+        print(f"    {name:<18} {stats['mean']:.6f} +/- {stats['std']:.6f}")
+
+    print(f"\n  Alert decisions, all folds (rows = actual, columns = predicted):")
+    print(f"    {'':<10}" + "".join(f"{name:>10}" for name in DECISIONS))
+    for name, row in zip(DECISIONS, summary['confusion']):
+        print(f"    {name:<10}" + "".join(f"{count:>10}" for count in row))
+    pooled = summary['pooled']
+    print(f"  Pooled crash precision {format_metric(pooled['crash_precision'], 0)}, "
+          f"recall {format_metric(pooled['crash_recall'], 0)} "
+          f"(CRASH_THRESHOLD={CRASH_THRESHOLD}, WARNING_THRESHOLD={WARNING_THRESHOLD})")
+    print("=" * 60 + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward validation of the PyTorch LSTM")
+    parser.add_argument('--data', default=DATA_FILE, help="Time-ordered dataset (columnar or CSV)")
+    parser.add_argument('--folds', type=int, default=NUM_FOLDS)
+    parser.add_argument('--mode', default='expanding', choices=MODES)
+    parser.add_argument('--train-size', type=int, default=None,
+                        help="Training windows per fold with --mode rolling (default: fold 0's span)")
+    parser.add_argument('--gap', type=int, default=None,
+                        help="Windows skipped between spans (default: the sequence length)")
+    parser.add_argument('--epochs', type=int, default=EPOCHS, help="Epochs per fold")
+    parser.add_argument('--threads-per-worker', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Parallel folds (default: cores // threads-per-worker)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    config = dict(BASELINE)
+    gap = config['sequence_length'] if args.gap is None else args.gap
+
+    print("\n" + "=" * 60)
+    print("AEGIS PROTOCOL - WALK-FORWARD VALIDATION")
+    print("=" * 60)
+
+    # Build the cache entry once; workers only memory-map it
+    X, _, _ = load_dataset(args.data)
+    total = num_windows(len(X), config['sequence_length'])
+    folds = fold_bounds(total, args.folds, args.mode, gap, args.train_size)
+    workers = args.workers or max(1, min(len(folds), (os.cpu_count() or 1) // args.threads_per_worker))
+    print(f"[*] {len(folds)} {args.mode} folds over {total:,} windows (gap {gap}), {args.epochs} epochs each, "
+          f"on {workers} workers ({args.threads_per_worker} threads each)\n")
+
+    results = []
+    context = mp.get_context('spawn')  # Fresh interpreters: thread caps apply before torch starts
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker, initargs=(args.threads_per_worker,)) as pool:
+        # Longest training spans first, so the short ones fill in behind them
+        by_size = sorted(folds, key=lambda f: f['train'][1] - f['train'][0], reverse=True)
+        futures = {
+            pool.submit(run_fold, fold, config, args.data, args.epochs, RUNS_DIR, args.seed): fold['fold']
+            for fold in by_size
+        }
+        for future in as_completed(futures):
+            fold_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[!] Fold {fold_id} failed: {e}")
+                continue
+            results.append(result)
+            m = result['metrics']
+            print(f"[+] Fold {fold_id:>2}: test MSE {m['mse']:.6f}, MAE {m['mae']:.4f}, "
+                  f"crash recall {format_metric(m['crash_recall'], 0)} ({result['train_seconds']:.0f}s)")
+
+    if not results:
+        print("[!] No fold completed")
+        return 1
+
+    results.sort(key=lambda r: r['fold'])
+    summary = aggregate(results)
+    print_results(results, summary)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'data': str(args.data),
+            'mode': args.mode,
+            'gap': gap,
+            'epochs': args.epochs,
+            'config': config,
+            'thresholds': {'crash': CRASH_THRESHOLD, 'warning': WARNING_THRESHOLD},
+            'folds': results,
+            'summary': summary,
+        }, f, indent=2)
+    print(f"[+] Results saved to: {args.output}")
+
+    return 0 if len(results) == len(folds) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
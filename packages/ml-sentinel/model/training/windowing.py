@@ -0,0 +1,72 @@
+"""
+Aegis Protocol - Sliding Window Sequences
+Shared LSTM windowing for the trainers and evaluation tools
+
+Windows are strided views into the (n_samples, n_features) array, so
+building them costs O(1) memory instead of a copy of every window
+(~sequence_length x the dataset). Index or slice the view to materialize
+only the windows a batch needs.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def num_windows(n_samples, sequence_length, stride=1, horizon=1, with_targets=True):
+    """Number of windows sliding_windows() returns for n_samples rows"""
+    last_start = n_samples - sequence_length - (horizon if with_targets else 0)
+    if last_start < 0:
+        return 0
+    return last_start // stride + 1
+
+def sliding_windows(X, y=None, sequence_length=60, stride=1, horizon=1):
+    """
+    Build LSTM input windows without copying.
+
+    Window k covers rows [s, s + sequence_length) with s = k * stride.
+    Its target is y[s + sequence_length - 1 + horizon], i.e. `horizon` steps
+    after the last row of the window (horizon=1 is the next row, the
+    trainers' original alignment).
+
+    Returns:
+        X_view: read-only (n_windows, sequence_length, n_features) view of X
+        y_view: (n_windows,) view of y, or None if y is None
+    """
+    X = np.asarray(X)
+    if X.ndim != 2:
+        raise ValueError(f"X must be (n_samples, n_features), got shape {X.shape}")
+    if sequence_length < 1 or stride < 1 or horizon < 0:
+        raise ValueError("sequence_length and stride must be >= 1, horizon >= 0")
+
+    n = num_windows(len(X), sequence_length, stride, horizon, with_targets=y is not None)
+    if n == 0:
+        empty = np.empty((0, sequence_length, X.shape[1]), dtype=X.dtype)
+        return empty, (None if y is None else np.asarray(y)[:0])
+
+    # (n_samples - L + 1, n_features, L) -> (n_windows, L, n_features), still a view
+    X_view = sliding_window_view(X, sequence_length, axis=0).transpose(0, 2, 1)
+    X_view = X_view[::stride][:n]
+
+    if y is None:
+        return X_view, None
+
+    y = np.asarray(y)
+    first_target = sequence_length - 1 + horizon
+    y_view = y[first_target::stride][:n]
+
+    return X_view, y_view
+
+def window_mask(gap, sequence_length=60, stride=1, horizon=1, with_targets=True):
+    """
+    Boolean mask over sliding_windows() output: True where no row of the
+    window (or its target row) is flagged in gap.
+
+    X_view[mask] keeps only the windows that do not straddle a gap, e.g. in
+    resampled crawler history (resample_snapshots.py).
+    """
+    gap = np.asarray(gap, dtype=bool)
+    n = num_windows(len(gap), sequence_length, stride, horizon, with_targets)
+    span = sequence_length + (horizon if with_targets else 0)
+    # Gaps in rows [s, s + span) via a running count
+    counts = np.concatenate([[0], np.cumsum(gap)])
+    starts = np.arange(n) * stride
+    return counts[starts + span] == counts[starts]
@@ -0,0 +1,147 @@
+"""
+Aegis Protocol - Build Manifests
+Content hashing and staleness checks shared by the incremental build tools
+
+Used by zk-circuit/scripts/zk_setup.py (circuit artifacts), model/pipeline.py
+(training stages) and model/training/dataset_cache.py (preprocessed datasets).
+
+A stage is a dict with a name, the `outputs` it writes and the `inputs` it
+reads (plus optional `depends_on` paths that must exist but are not
+hashed). Its build record in the manifest holds the output hashes and a
+fingerprint: a dict of fields compared against the current one, where
+'inputs' / 'sources' map file names to content hashes and every other
+field (command, toolchain, params) is compared by value.
+
+File hashes can be memoized in a stat index (cached_sha256): a file is
+only re-read when its size or mtime changed.
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+
+HASH_CHUNK_SIZE = 1 << 20
+FILE_FIELDS = {'inputs': 'input', 'sources': 'source'}
+FIELD_REASONS = {
+    'toolchain': "toolchain version changed",
+    'command': "command arguments changed",
+    'params': "parameters changed",
+}
+
+# ============================================================
+# Content hashing
+# ============================================================
+def file_sha256(path):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cached_sha256(path, hashes):
+    """
+    Content hash, reused from the `hashes` index while size and mtime are
+    unchanged (new hashes are added to it). A directory (columnar dataset)
+    hashes the names and hashes of its files.
+    """
+    path = Path(path)
+    if path.is_dir():
+        digest = hashlib.sha256()
+        for file in sorted(p for p in path.rglob('*') if p.is_file()):
+            digest.update(f"{file.relative_to(path)}:{cached_sha256(file, hashes)}\n".encode())
+        return digest.hexdigest()
+    stat = path.stat()
+    entry = hashes.get(str(path))
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+    sha = file_sha256(path)
+    hashes[str(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha}
+    return sha
+
+# ============================================================
+# Manifest files
+# ============================================================
+def load_manifest(path):
+    """Load a JSON manifest (empty if missing or corrupt)"""
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest, dict) else {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest, path):
+    """Write manifest atomically so an interrupted run never corrupts it"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+# ============================================================
+# Staleness
+# ============================================================
+def stale_reason(stage, record, pending, fingerprint, hash_file=file_sha256, key=str):
+    """
+    Return why a stage must be rebuilt, or None if it is up to date.
+
+    `fingerprint(stage)` computes the current fingerprint; outputs are
+    recorded under key(path) and hashed with hash_file. `pending` holds
+    artifacts that will be rebuilt earlier in this run; their new hashes
+    are unknown until then, so dependents are stale too.
+    """
+    if record is None:
+        return "no build record"
+
+    for output in stage["outputs"]:
+        if not output.exists():
+            return f"{output.name} missing"
+        if record["outputs"].get(key(output)) != hash_file(output):
+            return f"{output.name} modified since last build"
+
+    for path in stage["inputs"] + stage.get("depends_on", []):
+        if path in pending:
+            return f"{path.name} will be rebuilt"
+        if not path.exists():
+            return f"input {path.name} missing"
+
+    recorded = record["fingerprint"]
+    for field, value in fingerprint(stage).items():
+        if field in FILE_FIELDS:
+            previous = recorded.get(field) or {}
+            if set(value) != set(previous):
+                return f"{FILE_FIELDS[field]} files changed"
+            for name, digest in value.items():
+                if previous[name] != digest:
+                    return f"{Path(name).name} changed"
+        elif value != recorded.get(field):
+            return FIELD_REASONS.get(field, f"{field} changed")
+
+    return None
+
+def plan_stages(stages, stale, forced=()):
+    """
+    Decide which stages to rebuild; returns list of (stage, reason or None).
+
+    `stale(stage, pending)` gives a stage's stale_reason; forced stages are
+    rebuilt regardless.
+    """
+    pending = set()
+    plan = []
+    for stage in stages:
+        reason = "forced" if stage["name"] in forced else stale(stage, pending)
+        if reason is not None:
+            pending.update(stage["outputs"])
+        plan.append((stage, reason))
+    return plan
+
+def print_plan(plan, detail=lambda stage: ""):
+    """Print rebuild plan, with detail(stage) after each stage's status"""
+    for stage, reason in plan:
+        if reason is None:
+            print(f"  [=] {stage['name']:<9} {'up to date':<12} {detail(stage)}".rstrip())
+        else:
+            print(f"  [*] {stage['name']:<9} {'REBUILD':<12} {detail(stage)}".rstrip() + f" - {reason}")
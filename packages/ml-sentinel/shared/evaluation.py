@@ -0,0 +1,51 @@
+"""
+Shared Evaluation Helpers
+Feature normalization, alert decisions and Pareto selection
+
+Used by the training scripts (distill_student.py, walk_forward.py,
+sweep_hyperparams.py) and the ZK tooling (zk_calibrate.py), so both judge
+models on the same inputs and decisions as the production inference engine.
+"""
+
+import numpy as np
+
+from config.constants import (
+    FEATURE_COLUMNS, CRASH_THRESHOLD, WARNING_THRESHOLD,
+    BLR_MIN, BLR_MAX, VOLUME_MIN, VOLUME_MAX, PRICE_MIN, PRICE_MAX
+)
+
+# Same normalization as SentinelInferenceEngine.normalize_features
+FEATURE_RANGES = {
+    'blr': (BLR_MIN, BLR_MAX),
+    'buy_volume': (VOLUME_MIN, VOLUME_MAX),
+    'sell_volume': (VOLUME_MIN, VOLUME_MAX),
+    'mid_price': (PRICE_MIN, PRICE_MAX),
+}
+
+def normalize_features(df):
+    """(n_rows, n_features) float32 FEATURE_COLUMNS of df, scaled and clipped to [0, 1]"""
+    features = np.empty((len(df), len(FEATURE_COLUMNS)), dtype=np.float32)
+    for j, col in enumerate(FEATURE_COLUMNS):
+        lo, hi = FEATURE_RANGES[col]
+        features[:, j] = np.clip((df[col].values - lo) / (hi - lo), 0, 1)
+    return features
+
+def classify_alerts(scores):
+    """Map risk scores to decisions: 0 = normal, 1 = warning, 2 = critical"""
+    scores = np.asarray(scores).reshape(-1)
+    return np.where(scores > CRASH_THRESHOLD, 2, np.where(scores > WARNING_THRESHOLD, 1, 0))
+
+def pareto_front(results, objectives):
+    """
+    Results not dominated on every objective (lower is better), sorted by
+    the objectives in order.
+    """
+    front = []
+    for r in results:
+        dominated = any(
+            all(o[k] <= r[k] for k in objectives) and any(o[k] < r[k] for k in objectives)
+            for o in results
+        )
+        if not dominated:
+            front.append(r)
+    return sorted(front, key=lambda r: tuple(r[k] for k in objectives))
@@ -0,0 +1,349 @@
+"""
+ZK Proof Pipeline Benchmark
+Measures the cost of the proof orchestration apart from the prover itself
+
+Runs N proof jobs through the real pipeline code (prove_crash.py stages and
+the prove_adapter.py receipt writer) against fake_ezkl.py, a stand-in
+prover with a configurable latency model. Every job works in its own
+directory inside a temporary workspace, so nothing in the repo is touched.
+
+Reports:
+- throughput (jobs/s) and end-to-end latency
+- queueing delay (submit -> start) for the chosen arrival pattern
+- per-stage wall time, simulated prover time and orchestration overhead
+- file I/O volume per stage
+- jobs that failed, and the exceptions of jobs that raised
+
+Usage:
+    python bench_proof_pipeline.py --jobs 20 --workers 2
+    python bench_proof_pipeline.py --jobs 50 --workers 4 --arrival-rate 5 --prove-seconds 0.5
+"""
+
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+import statistics
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Paths
+SCRIPT_DIR = Path(__file__).parent
+ML_SENTINEL_ROOT = SCRIPT_DIR.parent
+FAKE_EZKL = SCRIPT_DIR / "fake_ezkl.py"
+
+sys.path.append(str(ML_SENTINEL_ROOT))
+sys.path.append(str(SCRIPT_DIR))
+from config.constants import SEQUENCE_LENGTH, FEATURE_COLUMNS
+from prove_crash import artifact_paths, save_proof_input, generate_proof
+from prove_adapter import MockRiscZeroProofGenerator
+
+STAGES = ["input_save", "load_input", "witness", "prove", "metadata", "receipt"]
+SPAWN_SAMPLES = 5
+ERROR_SAMPLES = 3  # Exceptions shown in the report
+
+class FixedRiskModel:
+    """Model stand-in for the receipt writer (returns the job's risk score)"""
+
+    def __init__(self, risk_score):
+        self.risk_score = risk_score
+
+    def predict(self, x, verbose=0):
+        return np.array([[self.risk_score]])
+
+# ============================================================
+# Workspace
+# ============================================================
+def create_artifacts(zk_dir, pk_mb):
+    """Write placeholder setup artifacts so prerequisite checks pass"""
+    artifacts = artifact_paths(zk_dir)
+    zk_dir.mkdir(parents=True, exist_ok=True)
+
+    rng = np.random.default_rng(0)
+    with open(artifacts["pk"], 'wb') as f:
+        for _ in range(pk_mb):
+            f.write(rng.bytes(1 << 20))
+    for name in ("circuit", "vk", "srs"):
+        artifacts[name].write_bytes(rng.bytes(4096))
+    artifacts["settings"].write_text(json.dumps({"run_args": {"logrows": 17}}))
+
+    return artifacts
+
+def sample_job_inputs(num_jobs, seed):
+    """Normalized market windows and features for each job"""
+    rng = np.random.default_rng(seed)
+    jobs = []
+    for _ in range(num_jobs):
+        sequence = rng.random((SEQUENCE_LENGTH, len(FEATURE_COLUMNS)))
+        features = dict(zip(FEATURE_COLUMNS, (float(v) for v in sequence[-1])))
+        jobs.append({
+            "sequence": sequence,
+            "features": features,
+            "risk_score": float(rng.uniform(0.3, 1.0)),
+        })
+    return jobs
+
+def sample_latencies(num_jobs, args):
+    """Lognormal prover latencies around the configured medians"""
+    rng = np.random.default_rng(args.seed + 1)
+    jitter = args.jitter
+    return [
+        {
+            "witness": args.witness_seconds * float(rng.lognormal(0.0, jitter)),
+            "prove": args.prove_seconds * float(rng.lognormal(0.0, jitter)),
+        }
+        for _ in range(num_jobs)
+    ]
+
+def measure_spawn_seconds():
+    """Median cost of starting the stand-in prover process (no work)"""
+    samples = []
+    for _ in range(SPAWN_SAMPLES):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(FAKE_EZKL), "--version"],
+                       capture_output=True, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+# ============================================================
+# Jobs
+# ============================================================
+def run_job(job_id, job, latency, zk_dir, workspace, args):
+    """Run one job through the proof pipeline and account time / bytes"""
+    job_dir = workspace / f"job_{job_id:04d}"
+    job_dir.mkdir()
+    input_file = job_dir / "crash_input.json"
+    witness_file = job_dir / "witness.json"
+    proof_file = job_dir / "crash_proof.json"
+    receipt_file = job_dir / "risk_receipt.dat"
+
+    ezkl_cmd = (
+        sys.executable, str(FAKE_EZKL),
+        "--witness-latency", f"{latency['witness']:.6f}",
+        "--prove-latency", f"{latency['prove']:.6f}",
+        "--proof-bytes", str(args.proof_bytes),
+    )
+
+    timings = {}
+    start = time.perf_counter()
+    save_proof_input(input_file, job["features"], list(job["sequence"]))
+    timings["input_save"] = time.perf_counter() - start
+
+    ok = generate_proof(input_file, proof_file, witness_file, zk_dir, ezkl_cmd, timings)
+
+    if ok:
+        start = time.perf_counter()
+        generator = MockRiscZeroProofGenerator(proof_output=receipt_file, latency_seconds=0.0)
+        ok = generator.generate_proof(FixedRiskModel(job["risk_score"]), job["sequence"])
+        timings["receipt"] = time.perf_counter() - start
+
+    return {"ok": ok, "timings": timings, "io": stage_io(job_dir, zk_dir) if ok else {}}
+
+def stage_io(job_dir, zk_dir):
+    """Bytes read / written per stage, from the files each stage touches"""
+    size = lambda p: p.stat().st_size
+    input_bytes = size(job_dir / "crash_input.json")
+    witness_bytes = size(job_dir / "witness.json")
+    proof_file = job_dir / "crash_proof.json"
+    with open(proof_file, 'r') as f:
+        raw_proof_bytes = len(json.dumps(json.load(f)["proof"]))
+    pk_bytes = size(artifact_paths(zk_dir)["pk"])
+
+    return {
+        "input_save": {"read": 0, "written": input_bytes},
+        "load_input": {"read": input_bytes, "written": 0},
+        "witness": {"read": input_bytes, "written": witness_bytes},
+        "prove": {"read": witness_bytes + pk_bytes, "written": raw_proof_bytes},
+        "metadata": {"read": raw_proof_bytes, "written": size(proof_file)},
+        "receipt": {"read": 0, "written": size(job_dir / "risk_receipt.dat")},
+    }
+
+def run_jobs(jobs, latencies, zk_dir, workspace, args):
+    """
+    Submit jobs (burst or Poisson arrivals) to a worker pool.
+
+    Returns (records, errors, wall_seconds); errors maps the id of every
+    job that raised to its exception.
+    """
+    rng = np.random.default_rng(args.seed + 2)
+    records = [None] * len(jobs)
+    lock = threading.Lock()
+
+    def worker(job_id, submitted):
+        started = time.perf_counter()
+        result = run_job(job_id, jobs[job_id], latencies[job_id], zk_dir, workspace, args)
+        finished = time.perf_counter()
+        result.update({
+            "queue_delay": started - submitted,
+            "service_time": finished - started,
+            "latency": finished - submitted,
+            "simulated": latencies[job_id],
+        })
+        with lock:
+            records[job_id] = result
+
+    futures = {}
+    bench_start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            for job_id in range(len(jobs)):
+                if args.arrival_rate and job_id > 0:
+                    time.sleep(rng.exponential(1.0 / args.arrival_rate))
+                futures[pool.submit(worker, job_id, time.perf_counter())] = job_id
+    wall_seconds = time.perf_counter() - bench_start
+
+    errors = {}
+    for future, job_id in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            errors[job_id] = f"{type(e).__name__}: {e}"
+
+    return records, errors, wall_seconds
+
+# ============================================================
+# Report
+# ============================================================
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def summarize(records, errors, wall_seconds, spawn_seconds, args):
+    """Aggregate job records into the benchmark report"""
+    done = [r for r in records if r and r["ok"]]
+
+    stages = {}
+    for stage in STAGES:
+        wall = [r["timings"][stage] for r in done]
+        simulated = [r["simulated"].get(stage, 0.0) for r in done]
+        overhead = [w - s for w, s in zip(wall, simulated)]
+        stages[stage] = {
+            "mean_wall_ms": 1000 * statistics.fmean(wall) if wall else 0.0,
+            "mean_simulated_ms": 1000 * statistics.fmean(simulated) if simulated else 0.0,
+            "mean_overhead_ms": 1000 * statistics.fmean(overhead) if overhead else 0.0,
+            "bytes_read": sum(r["io"][stage]["read"] for r in done),
+            "bytes_written": sum(r["io"][stage]["written"] for r in done),
+        }
+
+    service = [r["service_time"] for r in done]
+    simulated_total = [sum(r["simulated"].values()) for r in done]
+    queue = [r["queue_delay"] for r in done]
+    latency = [r["latency"] for r in done]
+
+    return {
+        "config": {
+            "jobs": args.jobs,
+            "workers": args.workers,
+            "arrival_rate": args.arrival_rate,
+            "prove_seconds": args.prove_seconds,
+            "witness_seconds": args.witness_seconds,
+            "jitter": args.jitter,
+            "proof_bytes": args.proof_bytes,
+            "pk_mb": args.pk_mb,
+            "seed": args.seed,
+        },
+        "completed": len(done),
+        "failed": len(records) - len(done),
+        "errors": len(errors),
+        "error_samples": {str(job_id): errors[job_id] for job_id in sorted(errors)[:ERROR_SAMPLES]},
+        "wall_seconds": wall_seconds,
+        "throughput_jobs_per_s": len(done) / wall_seconds if wall_seconds else 0.0,
+        "latency_s": {"p50": percentile(latency, 50), "p95": percentile(latency, 95), "max": max(latency, default=0.0)},
+        "queue_delay_s": {"p50": percentile(queue, 50), "p95": percentile(queue, 95), "max": max(queue, default=0.0)},
+        "overhead": {
+            "mean_service_ms": 1000 * statistics.fmean(service) if service else 0.0,
+            "mean_prover_ms": 1000 * statistics.fmean(simulated_total) if simulated_total else 0.0,
+            "mean_glue_ms": 1000 * statistics.fmean([s - p for s, p in zip(service, simulated_total)]) if service else 0.0,
+            "process_spawn_ms": 1000 * spawn_seconds,
+            "spawns_per_job": 2,
+        },
+        "stages": stages,
+    }
+
+def print_report(report):
+    print("\n" + "=" * 60)
+    print("PROOF PIPELINE BENCHMARK")
+    print("=" * 60)
+
+    config = report["config"]
+    arrivals = f"Poisson {config['arrival_rate']}/s" if config["arrival_rate"] else "burst"
+    print(f"\n  Jobs:        {report['completed']} ok, {report['failed']} failed "
+          f"({report['errors']} raised; {config['workers']} workers, {arrivals})")
+    for job_id, error in report["error_samples"].items():
+        print(f"  [!] job {job_id}: {error}")
+    print(f"  Throughput:  {report['throughput_jobs_per_s']:.2f} jobs/s over {report['wall_seconds']:.2f}s")
+    print(f"  Latency:     p50 {report['latency_s']['p50']:.3f}s  p95 {report['latency_s']['p95']:.3f}s")
+    print(f"  Queue delay: p50 {report['queue_delay_s']['p50']:.3f}s  p95 {report['queue_delay_s']['p95']:.3f}s"
+          f"  max {report['queue_delay_s']['max']:.3f}s")
+
+    overhead = report["overhead"]
+    print(f"\n  Per job: {overhead['mean_service_ms']:.1f} ms service = "
+          f"{overhead['mean_prover_ms']:.1f} ms prover + {overhead['mean_glue_ms']:.1f} ms glue")
+    print(f"  (glue includes {overhead['spawns_per_job']} prover process spawns "
+          f"at ~{overhead['process_spawn_ms']:.1f} ms each)")
+
+    print(f"\n  {'Stage':<12} {'wall ms':>9} {'prover ms':>10} {'glue ms':>9} {'read KB':>10} {'written KB':>11}")
+    for stage, s in report["stages"].items():
+        print(f"  {stage:<12} {s['mean_wall_ms']:>9.1f} {s['mean_simulated_ms']:>10.1f} "
+              f"{s['mean_overhead_ms']:>9.1f} {s['bytes_read'] / 1024:>10.1f} {s['bytes_written'] / 1024:>11.1f}")
+
+    print("=" * 60 + "\n")
+
+def benchmark(args):
+    workspace = Path(tempfile.mkdtemp(prefix="proof_bench_"))
+    try:
+        zk_dir = workspace / "artifacts"
+        print(f"[*] Workspace: {workspace}")
+        print(f"[*] Writing placeholder artifacts ({args.pk_mb} MB proving key)...")
+        create_artifacts(zk_dir, args.pk_mb)
+
+        print("[*] Measuring prover process spawn cost...")
+        spawn_seconds = measure_spawn_seconds()
+
+        jobs = sample_job_inputs(args.jobs, args.seed)
+        latencies = sample_latencies(args.jobs, args)
+
+        print(f"[*] Running {args.jobs} jobs...")
+        records, errors, wall_seconds = run_jobs(jobs, latencies, zk_dir, workspace, args)
+        report = summarize(records, errors, wall_seconds, spawn_seconds, args)
+    finally:
+        if not args.keep_workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[+] Report saved: {args.output}")
+
+    return report["failed"] == 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ZK proof pipeline with a stand-in prover")
+    parser.add_argument("--jobs", type=int, default=20, help="Number of proof jobs")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent proof workers")
+    parser.add_argument("--arrival-rate", type=float, default=None,
+                        help="Poisson arrival rate in jobs/s (default: submit all at once)")
+    parser.add_argument("--prove-seconds", type=float, default=0.5, help="Median simulated proving time")
+    parser.add_argument("--witness-seconds", type=float, default=0.05, help="Median simulated witness time")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Lognormal sigma of prover latencies")
+    parser.add_argument("--proof-bytes", type=int, default=16384, help="Size of the raw proof")
+    parser.add_argument("--pk-mb", type=int, default=8, help="Size of the placeholder proving key")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None, help="Write the report as JSON")
+    parser.add_argument("--keep-workspace", action="store_true", help="Keep per-job files for inspection")
+    args = parser.parse_args()
+
+    success = benchmark(args)
+    sys.exit(0 if success else 1)
+
+if __name__ == "__main__":
+    main()
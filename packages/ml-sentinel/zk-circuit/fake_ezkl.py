@@ -0,0 +1,100 @@
+"""
+Stand-in EZKL Prover
+Command-line compatible with the ezkl subcommands used by prove_crash.py
+
+Does the file I/O a real prover does (reads input / witness / proving key,
+writes witness / proof) and sleeps for a configured latency instead of
+proving. Used by bench_proof_pipeline.py.
+
+Usage:
+    python fake_ezkl.py --prove-latency 0.5 prove -M model.ezkl -W witness.json ...
+"""
+
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+VERSION = "0.0.0-standin"
+
+def read_bytes(path, chunk_size=1 << 20):
+    """Read a file fully (like the prover loading it) and return its digest"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def gen_witness(args):
+    """Write a witness derived from the input file"""
+    input_digest = read_bytes(args.input)
+    with open(args.input, 'r') as f:
+        input_data = json.load(f)
+
+    time.sleep(args.witness_latency)
+
+    witness = {
+        "inputs": input_data.get("input_tensor", []),
+        "outputs": [[input_digest[:16]]],
+        "input_digest": input_digest,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(witness, f)
+
+def prove(args):
+    """Write a proof of the configured size"""
+    witness_digest = read_bytes(args.witness)
+    read_bytes(args.pk_path)
+
+    time.sleep(args.prove_latency)
+
+    seed = hashlib.sha256(witness_digest.encode()).digest()
+    proof_bytes = (seed * (args.proof_bytes // len(seed) + 1))[:args.proof_bytes]
+    proof = {
+        "protocol": "standin",
+        "instances": [[witness_digest[:16]]],
+        "proof": proof_bytes.hex(),
+    }
+    with open(args.proof_path, 'w') as f:
+        json.dump(proof, f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in EZKL prover")
+    parser.add_argument("--version", action="store_true")
+    parser.add_argument("--witness-latency", type=float, default=0.0)
+    parser.add_argument("--prove-latency", type=float, default=0.0)
+    parser.add_argument("--proof-bytes", type=int, default=16384)
+    subparsers = parser.add_subparsers(dest="command")
+
+    witness_parser = subparsers.add_parser("gen-witness")
+    witness_parser.add_argument("-M", dest="model")
+    witness_parser.add_argument("-I", dest="input", required=True)
+    witness_parser.add_argument("-O", dest="output", required=True)
+    witness_parser.add_argument("-S", dest="settings")
+
+    prove_parser = subparsers.add_parser("prove")
+    prove_parser.add_argument("-M", dest="model")
+    prove_parser.add_argument("-W", dest="witness", required=True)
+    prove_parser.add_argument("--pk-path", required=True)
+    prove_parser.add_argument("--proof-path", required=True)
+    prove_parser.add_argument("--srs-path")
+
+    args = parser.parse_args()
+
+    if args.version:
+        print(f"ezkl {VERSION}")
+        return 0
+
+    if args.command == "gen-witness":
+        gen_witness(args)
+    elif args.command == "prove":
+        prove(args)
+    else:
+        parser.print_usage(sys.stderr)
+        return 2
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+"""
+Durable Proof Job Queue
+SQLite-backed queue of crash proof requests that survives engine restarts
+
+Every crash alert is stored with its market window before any proving starts,
+so a crash of the engine or a worker never loses a pending proof.
+
+- Priority: risk score, boosted by age so old jobs cannot starve
+- Leases: a worker claims a job for PROOF_LEASE_SECONDS and renews it while
+  proving; jobs whose lease expired are retried (up to PROOF_MAX_ATTEMPTS)
+- No duplicates: jobs are keyed by a hash of their payload, receipts are
+  written to a per-job path, and only the current lease owner can complete;
+  re-enqueueing a permanently failed job makes it pending again
+- Compaction: finished jobs are deleted after a retention period and the
+  database file is vacuumed when enough pages are free
+
+Usage:
+    python proof_queue.py worker            # process jobs until interrupted
+    python proof_queue.py worker --once     # drain the queue and exit
+    python proof_queue.py stats
+    python proof_queue.py compact
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+import contextlib
+from pathlib import Path
+
+import numpy as np
+
+# Paths
+SCRIPT_DIR = Path(__file__).parent
+sys.path.append(str(SCRIPT_DIR.parent))
+sys.path.append(str(SCRIPT_DIR))
+from config.constants import (
+    PROOF_QUEUE_DB, RECEIPT_DIR, PROOF_LEASE_SECONDS, PROOF_MAX_ATTEMPTS
+)
+
+logger = logging.getLogger(__name__)
+
+LATEST_RECEIPT = Path(RECEIPT_DIR) / "risk_receipt.dat"  # Read by risc0-verifier host
+
+AGE_WEIGHT = 1.0 / 3600  # One hour of waiting counts as much as +1.0 risk
+RETRY_BACKOFF_SECONDS = 10
+POLL_INTERVAL_SECONDS = 2
+DONE_RETENTION_SECONDS = 7 * 24 * 3600
+FAILED_RETENTION_SECONDS = 30 * 24 * 3600
+COMPACT_EVERY = 50  # Completed jobs between automatic compactions
+VACUUM_FREE_RATIO = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_key TEXT NOT NULL UNIQUE,
+    risk_score REAL NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    finished_at REAL,
+    receipt_path TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, available_at);
+"""
+
+def job_key(risk_score, sequence):
+    """Content key of a proof request (same alert -> same job)"""
+    digest = hashlib.sha256()
+    digest.update(f"{risk_score:.8f}".encode())
+    digest.update(np.ascontiguousarray(sequence, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+class ProofQueue:
+    """Priority queue of proof jobs with leases, stored in SQLite"""
+
+    def __init__(self, db_path=PROOF_QUEUE_DB, lease_seconds=PROOF_LEASE_SECONDS,
+                 max_attempts=PROOF_MAX_ATTEMPTS):
+        self.db_path = Path(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: every write below runs in an explicit transaction
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT, serialized across threads and processes"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    # ============================================================
+    # Producer
+    # ============================================================
+    def enqueue(self, risk_score, features, sequence):
+        """
+        Persist a proof request; returns the job id (existing id if already
+        queued). A job that failed permanently is reset to pending with a
+        fresh attempt budget, so a repeated alert is proven again.
+        """
+        sequence = np.asarray(sequence, dtype=np.float64)
+        key = job_key(risk_score, sequence)
+        payload = json.dumps({
+            "risk_score": float(risk_score),
+            "features": features,
+            "sequence": sequence.tolist(),
+        }, default=float)
+        now = time.time()
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_key, risk_score, payload, created_at, available_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (job_key) DO UPDATE SET status = 'pending', attempts = 0, "
+                "available_at = excluded.available_at, finished_at = NULL "
+                "WHERE status = 'failed'",
+                (key, float(risk_score), payload, now, now)
+            )
+            row = conn.execute("SELECT id FROM jobs WHERE job_key = ?", (key,)).fetchone()
+        return row["id"]
+
+    # ============================================================
+    # Worker side
+    # ============================================================
+    def _expire_leases(self, conn, now):
+        """Return jobs with expired leases to the queue (or fail them)"""
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, lease_owner = NULL, "
+            "error = 'lease expired after final attempt' "
+            "WHERE status = 'leased' AND lease_expires <= ? AND attempts >= ?",
+            (now, now, self.max_attempts)
+        )
+        return conn.execute(
+            "UPDATE jobs SET status = 'pending', lease_owner = NULL, available_at = ? "
+            "WHERE status = 'leased' AND lease_expires <= ?",
+            (now, now)
+        ).rowcount
+
+    def claim(self, worker_id, job_id=None):
+        """
+        Lease the highest-priority available job (or job_id only, if it is
+        available); returns a job dict or None
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            expired = self._expire_leases(conn, now)
+            if expired:
+                logger.warning(f"Requeued {expired} job(s) with expired leases")
+
+            if job_id is None:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'pending' AND available_at <= ? "
+                    "ORDER BY risk_score + ? * (? - created_at) DESC, id LIMIT 1",
+                    (now, AGE_WEIGHT, now)
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE id = ? AND status = 'pending' AND available_at <= ?",
+                    (job_id, now)
+                ).fetchone()
+            if row is None:
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker_id, now + self.lease_seconds, row["id"])
+            )
+
+        job = dict(row)
+        job["attempts"] += 1
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def renew_lease(self, job_id, worker_id):
+        """Extend a lease; False if the worker no longer owns the job"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET lease_expires = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, job_id, worker_id)
+            ).rowcount == 1
+
+    def complete(self, job_id, worker_id, receipt_path):
+        """Mark a job done; False if the lease was lost (another worker owns it)"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, receipt_path = ?, "
+                "lease_owner = NULL, error = NULL "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time(), str(receipt_path), job_id, worker_id)
+            ).rowcount == 1
+
+    def fail(self, job_id, worker_id, error):
+        """Release a failed job for retry with backoff, or fail it permanently"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+
+            if row["attempts"] >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, lease_owner = NULL, error = ? "
+                    "WHERE id = ?",
+                    (now, str(error), job_id)
+                )
+            else:
+                backoff = RETRY_BACKOFF_SECONDS * 2 ** (row["attempts"] - 1)
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', available_at = ?, lease_owner = NULL, error = ? "
+                    "WHERE id = ?",
+                    (now + backoff, str(error), job_id)
+                )
+        return True
+
+    # ============================================================
+    # Maintenance
+    # ============================================================
+    def stats(self):
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def compact(self, done_retention=DONE_RETENTION_SECONDS, failed_retention=FAILED_RETENTION_SECONDS):
+        """Delete finished jobs past retention; vacuum if the file is mostly free pages"""
+        now = time.time()
+        with self._transaction() as conn:
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE (status = 'done' AND finished_at <= ?) "
+                "OR (status = 'failed' AND finished_at <= ?)",
+                (now - done_retention, now - failed_retention)
+            ).rowcount
+
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            free_pages = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+            total_pages = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            vacuumed = total_pages > 0 and free_pages / total_pages >= VACUUM_FREE_RATIO
+            if vacuumed:
+                self.conn.execute("VACUUM")
+
+        return {"deleted": deleted, "vacuumed": vacuumed}
+
+# ============================================================
+# Proving
+# ============================================================
+def receipt_path_for(job):
+    return Path(RECEIPT_DIR) / "receipts" / f"risk_receipt_{job['job_key'][:16]}.dat"
+
+def prove_job(job):
+    """Generate the receipt for a job (idempotent: one receipt path per job)"""
+    from prove_adapter import MockRiscZeroProofGenerator
+
+    receipt_path = receipt_path_for(job)
+    if not receipt_path.exists():
+        payload = job["payload"]
+        generator = MockRiscZeroProofGenerator(proof_output=receipt_path)
+        if not generator.generate_proof(None, np.array(payload["sequence"]), payload["risk_score"]):
+            raise RuntimeError("proof generation failed")
+    else:
+        logger.info(f"Receipt already written by an earlier attempt: {receipt_path}")
+
+    # Publish as the latest receipt
+    tmp_path = LATEST_RECEIPT.with_name(LATEST_RECEIPT.name + ".tmp")
+    shutil.copyfile(receipt_path, tmp_path)
+    os.replace(tmp_path, LATEST_RECEIPT)
+
+    return receipt_path
+
+def process_job(queue, job, worker_id, prove=prove_job):
+    """Prove one leased job, renewing the lease while the prover runs"""
+    stop = threading.Event()
+
+    def keep_lease():
+        while not stop.wait(queue.lease_seconds / 3):
+            if not queue.renew_lease(job["id"], worker_id):
+                logger.warning(f"Lost lease on job {job['id']}")
+                return
+
+    keeper = threading.Thread(target=keep_lease, daemon=True)
+    keeper.start()
+    try:
+        receipt_path = prove(job)
+    except Exception as e:
+        logger.error(f"Job {job['id']} failed (attempt {job['attempts']}): {e}")
+        queue.fail(job["id"], worker_id, e)
+        return False
+    finally:
+        stop.set()
+        keeper.join()
+
+    if not queue.complete(job["id"], worker_id, receipt_path):
+        logger.warning(f"Job {job['id']} was reassigned before completion; receipt kept at {receipt_path}")
+        return False
+
+    logger.info(f"Job {job['id']} done (risk={job['risk_score']:.4f}) → {receipt_path}")
+    return True
+
+def run_worker(queue, worker_id=None, max_jobs=None, exit_when_idle=False, prove=prove_job):
+    """Claim and prove jobs; returns the number of completed jobs"""
+    worker_id = worker_id or default_worker_id()
+    completed = 0
+    processed = 0
+
+    while max_jobs is None or processed < max_jobs:
+        job = queue.claim(worker_id)
+        if job is None:
+            if exit_when_idle:
+                break
+            time.sleep(POLL_INTERVAL_SECONDS)
+            continue
+
+        processed += 1
+        if process_job(queue, job, worker_id, prove):
+            completed += 1
+            if completed % COMPACT_EVERY == 0:
+                queue.compact()
+
+    return completed
+
+def main():
+    parser = argparse.ArgumentParser(description="Durable proof job queue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    worker_parser = subparsers.add_parser("worker", help="Process proof jobs")
+    worker_parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    worker_parser.add_argument("--worker-id", default=None)
+    subparsers.add_parser("stats", help="Show job counts by status")
+    subparsers.add_parser("compact", help="Delete old finished jobs and vacuum")
+
+    parser.add_argument("--db", default=PROOF_QUEUE_DB, help="Queue database path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    queue = ProofQueue(args.db)
+
+    try:
+        if args.command == "worker":
+            worker_id = args.worker_id or default_worker_id()
+            print(f"[*] Worker {worker_id} on {args.db}")
+            completed = run_worker(queue, worker_id, exit_when_idle=args.once)
+            print(f"[+] Completed {completed} job(s)")
+        elif args.command == "stats":
+            for status, count in queue.stats().items():
+                print(f"  {status:<8} {count}")
+        elif args.command == "compact":
+            result = queue.compact()
+            print(f"[+] Deleted {result['deleted']} job(s), vacuumed: {result['vacuumed']}")
+    except KeyboardInterrupt:
+        print("\n[!] Worker stopped (leased job will be retried after its lease expires)")
+    finally:
+        queue.close()
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,7 @@ Simulates proof generation without actual zkVM compilation
 USE THIS FOR DEMO - Replace with real Risc Zero after hackathon on Linux
 """
 
+import os
 import json
 import time
 import hashlib
@@ -16,30 +17,34 @@ logger = logging.getLogger(__name__)
 class MockRiscZeroProofGenerator:
     """Mock proof generator for demonstration purposes"""
     
-    def __init__(self):
+    def __init__(self, proof_output=None, latency_seconds=2.0):
         self.zk_input_path = Path("packages/ml-sentinel/zk-circuit/zk_input.json")
-        self.proof_output = Path("packages/verification-proofs/proofs/risk_receipt.dat")
+        self.proof_output = Path(proof_output or "packages/verification-proofs/proofs/risk_receipt.dat")
+        self.latency_seconds = latency_seconds
     
-    def generate_proof(self, model, market_sequence):
+    def generate_proof(self, model, market_sequence, risk_score=None):
         """
         MOCK proof generation for hackathon demo
         
         In production (Linux), this would call real Risc Zero
+        If risk_score is given, the model is not evaluated again.
         """
         try:
             logger.info("🎭 DEMO MODE: Generating mock zero-knowledge proof...")
             logger.info("   (Using simulated zkVM for hackathon demonstration)")
             
             # Simulate proof generation time
-            time.sleep(2)  # 2 seconds instead of 60
+            time.sleep(self.latency_seconds)  # 2 seconds instead of 60
             
             # Create mock proof data
-            proof_data = self._create_mock_proof(model, market_sequence)
+            proof_data = self._create_mock_proof(model, market_sequence, risk_score)
             
-            # Save to expected location
+            # Save to expected location (atomically, a reader never sees a partial receipt)
             self.proof_output.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.proof_output, 'wb') as f:
+            tmp_path = self.proof_output.with_name(self.proof_output.name + ".tmp")
+            with open(tmp_path, 'wb') as f:
                 f.write(proof_data)
+            os.replace(tmp_path, self.proof_output)
             
             logger.info("✅ MOCK PROOF GENERATED SUCCESSFULLY")
             logger.info(f"   Proof saved to: {self.proof_output}")
@@ -51,13 +56,15 @@ class MockRiscZeroProofGenerator:
             logger.error(f"Mock proof generation failed: {e}")
             return False
     
-    def _create_mock_proof(self, model, market_sequence):
+    def _create_mock_proof(self, model, market_sequence, risk_score=None):
         """Create a mock proof receipt"""
         
         # Get risk score from model
         import numpy as np
-        sequence = np.array(market_sequence).reshape(1, 60, 4)
-        risk_score = float(model.predict(sequence, verbose=0)[0][0])
+        market_sequence = np.asarray(market_sequence)
+        if risk_score is None:
+            sequence = market_sequence.reshape(1, 60, 4)
+            risk_score = float(model.predict(sequence, verbose=0)[0][0])
         
         # Create deterministic "proof" using hash
         proof_input = f"{risk_score}_{market_sequence.tobytes().hex()}"
@@ -7,23 +7,24 @@ It creates a cryptographic proof that can be verified on-chain.
 
 Input: crash_input.json (market data that triggered crash detection)
 Output: ../../packages/blockchain-evm/proofs/crash_proof.json
+
+The pipeline is split into stages (input save, witness, prove, metadata
+rewrite) so it can be driven with other paths or a stand-in prover, e.g.
+by bench_proof_pipeline.py.
 """
 
 import os
 import sys
 import json
+import time
 import subprocess
+import numpy as np
 from pathlib import Path
 from datetime import datetime
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
-ZK_DIR = SCRIPT_DIR.parent
-COMPILED_CIRCUIT = ZK_DIR / "model.ezkl"
-PK_FILE = ZK_DIR / "pk.key"
-VK_FILE = ZK_DIR / "vk.key"
-SRS_FILE = ZK_DIR / "kzg.srs"
-SETTINGS_FILE = ZK_DIR / "settings.json"
+ZK_DIR = SCRIPT_DIR  # Artifacts written by scripts/zk_setup.py
 
 # Input/Output paths
 INPUT_DATA_FILE = ZK_DIR / "crash_input.json"
@@ -31,46 +32,130 @@ WITNESS_FILE = ZK_DIR / "witness.json"
 PROOF_FILE = Path("../../packages/blockchain-evm/proofs/crash_proof.json")
 PROOF_FILE = (SCRIPT_DIR / PROOF_FILE).resolve()
 
-def check_prerequisites():
+EZKL_CMD = ("ezkl",)
+
+def artifact_paths(zk_dir=ZK_DIR):
+    """Setup artifacts required for proving"""
+    zk_dir = Path(zk_dir)
+    return {
+        "circuit": zk_dir / "model.ezkl",
+        "pk": zk_dir / "pk.key",
+        "vk": zk_dir / "vk.key",
+        "srs": zk_dir / "kzg.srs",
+        "settings": zk_dir / "settings.json",
+    }
+
+def check_prerequisites(input_file=INPUT_DATA_FILE, zk_dir=ZK_DIR):
     """Verify all required files exist"""
+    artifacts = artifact_paths(zk_dir)
     required_files = [
-        (COMPILED_CIRCUIT, "Compiled circuit"),
-        (PK_FILE, "Proving key"),
-        (VK_FILE, "Verification key"),
-        (SRS_FILE, "SRS file"),
-        (SETTINGS_FILE, "Settings file"),
-        (INPUT_DATA_FILE, "Input data")
+        (artifacts["circuit"], "Compiled circuit"),
+        (artifacts["pk"], "Proving key"),
+        (artifacts["vk"], "Verification key"),
+        (artifacts["srs"], "SRS file"),
+        (artifacts["settings"], "Settings file"),
+        (Path(input_file), "Input data")
     ]
-    
+
     missing = []
     for file_path, name in required_files:
         if not file_path.exists():
             missing.append(f"  - {name}: {file_path}")
-    
+
     if missing:
         print("❌ Missing required files:")
         print("\n".join(missing))
         print("\nRun zk_setup.py first!")
         return False
-    
+
     return True
 
-def generate_proof(input_path=None):
-    """Generate ZK proof for crash prediction"""
+# ============================================================
+# Pipeline stages
+# ============================================================
+def save_proof_input(path, features, input_tensor):
+    """Write the market data that triggered a crash alert (proof input)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    crash_data = {
+        "timestamp": datetime.now().isoformat(),
+        "features": features,
+        "input_tensor": input_tensor
+    }
+
+    with open(path, 'w') as f:
+        json.dump(crash_data, f, indent=2, default=lambda x: x.tolist() if isinstance(x, np.ndarray) else x)
+
+    return path
+
+def run_ezkl(args, ezkl_cmd=EZKL_CMD):
+    """Run an EZKL subcommand (raises CalledProcessError on failure)"""
+    return subprocess.run([*ezkl_cmd, *args], capture_output=True, text=True, check=True)
+
+def generate_witness(input_file, witness_file, zk_dir=ZK_DIR, ezkl_cmd=EZKL_CMD):
+    """Compute the circuit witness for an input"""
+    artifacts = artifact_paths(zk_dir)
+    return run_ezkl([
+        "gen-witness",
+        "-M", str(artifacts["circuit"]),
+        "-I", str(input_file),
+        "-O", str(witness_file),
+        "-S", str(artifacts["settings"])
+    ], ezkl_cmd)
+
+def prove_witness(witness_file, proof_file, zk_dir=ZK_DIR, ezkl_cmd=EZKL_CMD):
+    """Generate the zero-knowledge proof for a witness"""
+    artifacts = artifact_paths(zk_dir)
+    return run_ezkl([
+        "prove",
+        "-M", str(artifacts["circuit"]),
+        "-W", str(witness_file),
+        "--pk-path", str(artifacts["pk"]),
+        "--proof-path", str(proof_file),
+        "--srs-path", str(artifacts["srs"])
+    ], ezkl_cmd)
+
+def attach_metadata(proof_file, input_data):
+    """Rewrite the proof file with timestamp and input metadata"""
+    with open(proof_file, 'r') as f:
+        proof_data = json.load(f)
+
+    proof_with_metadata = {
+        "proof": proof_data,
+        "timestamp": datetime.now().isoformat(),
+        "input": input_data,
+        "type": "market_crash_prediction"
+    }
+
+    with open(proof_file, 'w') as f:
+        json.dump(proof_with_metadata, f, indent=2)
+
+def generate_proof(input_path=None, proof_file=PROOF_FILE, witness_file=WITNESS_FILE,
+                   zk_dir=ZK_DIR, ezkl_cmd=EZKL_CMD, timings=None):
+    """
+    Generate ZK proof for crash prediction
+
+    `timings`, if given, is filled with wall-clock seconds per stage.
+    """
     print("\n" + "=" * 60)
     print("ZK PROOF GENERATION")
     print("=" * 60)
-    
+
+    timings = {} if timings is None else timings
+    proof_file = Path(proof_file)
+
     # Use provided input or default
     if input_path:
         input_file = Path(input_path)
     else:
         input_file = INPUT_DATA_FILE
-    
-    if not check_prerequisites():
+
+    if not check_prerequisites(input_file, zk_dir):
         return False
-    
+
     print(f"\n[1/3] Loading input data: {input_file}")
+    start = time.perf_counter()
     try:
         with open(input_file, 'r') as f:
             input_data = json.load(f)
@@ -78,63 +163,45 @@ def generate_proof(input_path=None):
     except Exception as e:
         print(f"  ✗ Failed to load input: {e}")
         return False
-    
+    timings["load_input"] = time.perf_counter() - start
+
     # Create proof output directory
-    os.makedirs(PROOF_FILE.parent, exist_ok=True)
-    
+    os.makedirs(proof_file.parent, exist_ok=True)
+
     # Generate witness
     print(f"\n[2/3] Generating witness...")
+    start = time.perf_counter()
     try:
-        result = subprocess.run([
-            "ezkl", "gen-witness",
-            "-M", str(COMPILED_CIRCUIT),
-            "-I", str(input_file),
-            "-O", str(WITNESS_FILE),
-            "-S", str(SETTINGS_FILE)
-        ], capture_output=True, text=True, check=True)
+        generate_witness(input_file, witness_file, zk_dir, ezkl_cmd)
         print(f"  ✓ Witness generated")
     except subprocess.CalledProcessError as e:
         print(f"  ✗ Witness generation failed: {e.stderr}")
         return False
-    
+    timings["witness"] = time.perf_counter() - start
+
     # Generate proof
     print(f"\n[3/3] Generating zero-knowledge proof...")
+    start = time.perf_counter()
     try:
-        result = subprocess.run([
-            "ezkl", "prove",
-            "-M", str(COMPILED_CIRCUIT),
-            "-W", str(WITNESS_FILE),
-            "--pk-path", str(PK_FILE),
-            "--proof-path", str(PROOF_FILE),
-            "--srs-path", str(SRS_FILE)
-        ], capture_output=True, text=True, check=True)
+        prove_witness(witness_file, proof_file, zk_dir, ezkl_cmd)
         print(f"  ✓ Proof generated")
     except subprocess.CalledProcessError as e:
         print(f"  ✗ Proof generation failed: {e.stderr}")
         return False
-    
+    timings["prove"] = time.perf_counter() - start
+
     # Add metadata to proof
+    start = time.perf_counter()
     try:
-        with open(PROOF_FILE, 'r') as f:
-            proof_data = json.load(f)
-        
-        # Add metadata
-        proof_with_metadata = {
-            "proof": proof_data,
-            "timestamp": datetime.now().isoformat(),
-            "input": input_data,
-            "type": "market_crash_prediction"
-        }
-        
-        with open(PROOF_FILE, 'w') as f:
-            json.dump(proof_with_metadata, f, indent=2)
-        
+        attach_metadata(proof_file, input_data)
+
         print(f"\n✅ PROOF GENERATED SUCCESSFULLY!")
-        print(f"   Saved to: {PROOF_FILE}")
-        print(f"   Size: {PROOF_FILE.stat().st_size} bytes")
+        print(f"   Saved to: {proof_file}")
+        print(f"   Size: {proof_file.stat().st_size} bytes")
     except Exception as e:
         print(f"Warning: Could not add metadata: {e}")
-    
+    timings["metadata"] = time.perf_counter() - start
+
     print("=" * 60 + "\n")
     return True
 
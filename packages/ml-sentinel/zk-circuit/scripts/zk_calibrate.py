@@ -0,0 +1,547 @@
+"""
+ZK Circuit Calibration Sweep
+Finds the smallest circuit settings that preserve alert decisions
+
+The placeholder settings hard-code logrows=17 and input/param scale 7.
+Proving time roughly doubles with every extra logrow, so this tool sweeps
+(input_scale, param_scale, lookup_range, logrows) over representative market
+windows and records, per candidate:
+- proving time and proving/verification key size
+- output error against the float model
+- agreement of alert decisions (CRASH_THRESHOLD / WARNING_THRESHOLD)
+
+Two backends:
+- ezkl:     runs gen-settings / compile / setup / prove per candidate
+- stand-in: no toolchain needed. Emulates fixed-point quantization with
+            onnxruntime, bounds lookup inputs analytically from the weights,
+            and models proving time / key size from the row count.
+
+Outputs:
+- calibration_report.json:    every candidate + the Pareto frontier
+- calibrated_settings.json:   chosen settings (picked up by zk_setup.py)
+
+Usage:
+    python zk_calibrate.py --data ../../model/training/training_data_real
+    python zk_calibrate.py --backend ezkl --num-windows 16
+"""
+
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import subprocess
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Paths
+SCRIPT_DIR = Path(__file__).parent.parent
+ML_SENTINEL_ROOT = SCRIPT_DIR.parent
+ONNX_MODEL = SCRIPT_DIR / "../model/trained/network.onnx"
+ZK_DIR = SCRIPT_DIR
+DEFAULT_DATA_FILE = ML_SENTINEL_ROOT / "model" / "training" / "training_data_real"
+CALIBRATED_SETTINGS_FILE = ZK_DIR / "calibrated_settings.json"
+REPORT_FILE = ZK_DIR / "calibration_report.json"
+
+sys.path.append(str(ML_SENTINEL_ROOT))
+sys.path.append(str(ML_SENTINEL_ROOT / "model" / "training"))
+from config.constants import SEQUENCE_LENGTH, FEATURE_COLUMNS
+from shared.evaluation import normalize_features, classify_alerts, pareto_front
+from windowing import sliding_windows
+
+# Sweep space
+SCALES = list(range(4, 11))
+LOOKUP_BITS = list(range(12, 18))  # lookup_range = [-2^b, 2^b]
+LOGROWS = list(range(12, 25))
+NUM_INNER_COLS = 2
+
+# Circuit model (stand-in backend)
+RESERVED_BLINDING_ROWS = 6
+REFERENCE_LOGROWS = 17
+PROVE_SECONDS_AT_REFERENCE = 30.0  # Measured EZKL proving time at logrows=17
+PK_BYTES_PER_ROW = 1024
+VK_BYTES = 4096
+
+# Ops that EZKL implements with lookup tables
+LOOKUP_OPS = {'Sigmoid', 'Tanh', 'Relu', 'LeakyRelu', 'Exp', 'Erf', 'Softmax'}
+# Ops that only move/reshape data
+PASSTHROUGH_OPS = {
+    'Transpose', 'Squeeze', 'Unsqueeze', 'Reshape', 'Flatten', 'Identity',
+    'Slice', 'Gather', 'Concat', 'Dropout', 'Cast', 'Expand'
+}
+ELEMENTWISE_OPS = {'Add', 'Sub', 'Mul', 'Div'}
+
+# ============================================================
+# Representative windows
+# ============================================================
+def load_features(data_file):
+    """
+    (n_rows, n_features) float32 features of a market dataset (columnar
+    or CSV), normalized exactly like the production inference engine.
+    """
+    from columnar import read_table
+
+    return normalize_features(read_table(data_file, columns=FEATURE_COLUMNS))
+
+def load_windows(data_file, num_windows, sequence_length=SEQUENCE_LENGTH):
+    """
+    Load evenly spaced (num_windows, sequence_length, n_features) windows.
+
+    Features are normalized like the production inference engine, so the
+    circuit is calibrated on the inputs it will actually prove.
+    """
+    windows, _ = sliding_windows(load_features(data_file), sequence_length=sequence_length)
+    if len(windows) == 0:
+        raise ValueError(f"{data_file} has fewer than {sequence_length} rows")
+
+    picks = np.unique(np.linspace(0, len(windows) - 1, num_windows).astype(np.int64))
+    return windows[picks]
+
+# ============================================================
+# Graph analysis
+# ============================================================
+def _initializers(model):
+    """
+    Constant tensors by name: initializers plus Cast chains over them
+    (export_onnx.py --fp16 stores weights as float16 behind a Cast)
+    """
+    from onnx import numpy_helper, helper
+    weights = {init.name: numpy_helper.to_array(init) for init in model.graph.initializer}
+    for node in model.graph.node:
+        if node.op_type == 'Cast' and node.input[0] in weights:
+            to = next(a.i for a in node.attribute if a.name == 'to')
+            weights[node.output[0]] = weights[node.input[0]].astype(helper.tensor_dtype_to_np_dtype(to))
+    return weights
+
+def _static_shapes(model, batch_size=1):
+    """Infer tensor shapes with every dynamic dimension pinned to batch_size"""
+    import onnx
+    from onnx import shape_inference
+
+    pinned = onnx.ModelProto()
+    pinned.CopyFrom(model)
+    for value in list(pinned.graph.input) + list(pinned.graph.output):
+        for dim in value.type.tensor_type.shape.dim:
+            if dim.HasField('dim_param') or dim.dim_value == 0:
+                dim.dim_value = batch_size
+    inferred = shape_inference.infer_shapes(pinned)
+
+    shapes = {}
+    graph = inferred.graph
+    for value in list(graph.input) + list(graph.output) + list(graph.value_info):
+        dims = value.type.tensor_type.shape.dim
+        shapes[value.name] = [d.dim_value if d.dim_value > 0 else batch_size for d in dims]
+    for init in graph.initializer:
+        shapes[init.name] = list(init.dims)
+    return shapes
+
+def estimate_circuit_rows(model, num_inner_cols=NUM_INNER_COLS):
+    """
+    Rough EZKL row count for one inference (batch size 1).
+
+    Counts multiply-accumulates, element-wise ops and lookup evaluations per
+    node and spreads them over num_inner_cols columns. This is an estimate
+    for comparing graphs/settings, not an exact circuit layout.
+    """
+    shapes = _static_shapes(model)
+    macs = lookups = elementwise = 0
+
+    for node in model.graph.node:
+        out_shape = shapes.get(node.output[0]) if node.output else None
+        out_size = int(np.prod(out_shape)) if out_shape else 0
+
+        if node.op_type == 'LSTM':
+            seq_len, batch, input_size = shapes[node.input[0]]
+            hidden = next(a.i for a in node.attribute if a.name == 'hidden_size')
+            steps = seq_len * batch
+            macs += steps * 4 * hidden * (input_size + hidden)
+            lookups += steps * 5 * hidden  # 3 sigmoid gates + 2 tanh
+            elementwise += steps * 4 * hidden  # bias add, c/h updates
+        elif node.op_type in ('MatMul', 'Gemm'):
+            inner = shapes[node.input[0]][-1]
+            macs += out_size * inner
+        elif node.op_type == 'Conv':
+            # Weight: (out_channels, in_channels / group, *kernel)
+            macs += out_size * int(np.prod(shapes[node.input[1]][1:]))
+        elif node.op_type in LOOKUP_OPS:
+            lookups += out_size
+        elif node.op_type in ELEMENTWISE_OPS:
+            elementwise += out_size
+
+    rows = math.ceil((macs + lookups + elementwise) / num_inner_cols)
+    return {'rows': rows, 'macs': macs, 'lookups': lookups, 'elementwise': elementwise}
+
+def lookup_input_bound(model, input_bound=1.0):
+    """
+    Upper bound on |x| for every tensor that feeds a lookup-table op.
+
+    Propagates max-abs magnitudes through the graph using the weights, so
+    the required lookup_range can be checked without running the circuit.
+    """
+    weights = _initializers(model)
+    shapes = _static_shapes(model)
+    bounds = {value.name: input_bound for value in model.graph.input}
+    bounds.update({name: float(np.max(np.abs(w))) if w.size else 0.0 for name, w in weights.items()})
+    worst = 0.0
+
+    for node in model.graph.node:
+        inputs = [bounds.get(name, 0.0) for name in node.input if name]
+        x = inputs[0] if inputs else 0.0
+
+        if node.op_type == 'LSTM':
+            W = np.abs(weights[node.input[1]][0])
+            R = np.abs(weights[node.input[2]][0])
+            hidden = R.shape[1]
+            bias = 0.0
+            if len(node.input) > 3 and node.input[3] in weights:
+                b = weights[node.input[3]][0]
+                bias = np.abs(b[:4 * hidden] + b[4 * hidden:])
+            gates = W.sum(axis=1) * x + R.sum(axis=1) * 1.0 + bias  # |h| <= 1
+            seq_len = shapes[node.input[0]][0]
+            worst = max(worst, float(np.max(gates)), float(seq_len))  # |c_t| <= t
+            out = 1.0
+        elif node.op_type in ('MatMul', 'Gemm'):
+            weight = weights.get(node.input[1])
+            if weight is not None:
+                if node.op_type == 'Gemm' and any(a.name == 'transB' and a.i for a in node.attribute):
+                    weight = weight.T
+                out = float(np.max(np.abs(weight).sum(axis=0))) * x
+                if len(node.input) > 2:
+                    out += bounds.get(node.input[2], 0.0)
+            else:
+                out = x * inputs[1] * shapes[node.input[0]][-1]
+        elif node.op_type in ('Add', 'Sub'):
+            out = sum(inputs)
+        elif node.op_type in ('Mul',):
+            out = float(np.prod(inputs))
+        elif node.op_type in LOOKUP_OPS:
+            worst = max(worst, x)
+            out = x if node.op_type in ('Relu', 'LeakyRelu') else 1.0
+        elif node.op_type in PASSTHROUGH_OPS:
+            out = max(inputs) if node.op_type == 'Concat' else x
+        else:
+            out = x
+        for name in node.output:
+            bounds[name] = out
+
+    return worst
+
+def quantized_session(model, param_scale):
+    """onnxruntime session with every float weight rounded to 2^-param_scale"""
+    import onnx
+    import onnxruntime as ort
+    from onnx import numpy_helper
+
+    quantized = onnx.ModelProto()
+    quantized.CopyFrom(model)
+    step = 2.0 ** -param_scale
+    for i, init in enumerate(quantized.graph.initializer):
+        array = numpy_helper.to_array(init)
+        if array.dtype in (np.float16, np.float32, np.float64) and array.ndim > 0:
+            rounded = (np.round(array / step) * step).astype(array.dtype)
+            quantized.graph.initializer[i].CopyFrom(numpy_helper.from_array(rounded, init.name))
+    options = ort.SessionOptions()
+    options.log_severity_level = 3
+    return ort.InferenceSession(quantized.SerializeToString(), options, providers=['CPUExecutionProvider'])
+
+def run_session(session, windows):
+    """Run a session over windows one at a time (the circuit proves batch 1)"""
+    input_name = session.get_inputs()[0].name
+    return np.array([
+        session.run(None, {input_name: w[np.newaxis].astype(np.float32)})[0].reshape(-1)[0]
+        for w in windows
+    ])
+
+# ============================================================
+# Candidates
+# ============================================================
+def min_logrows(rows, lookup_bits):
+    """Smallest logrows that fits the circuit rows and the lookup table"""
+    needed = max(rows, 2 ** (lookup_bits + 1)) + RESERVED_BLINDING_ROWS
+    return max(1, math.ceil(math.log2(needed)))
+
+def enumerate_candidates(rows, bound, scales, lookup_bits, logrows):
+    """Yield every (input_scale, param_scale, lookup_bits, logrows) that fits"""
+    for input_scale in scales:
+        required = bound * (2 ** input_scale)
+        for param_scale in scales:
+            for bits in lookup_bits:
+                if required > 2 ** bits:
+                    continue
+                smallest = min_logrows(rows, bits)
+                for k in logrows:
+                    if k >= smallest:
+                        yield {
+                            'input_scale': input_scale,
+                            'param_scale': param_scale,
+                            'lookup_range': [-(2 ** bits), 2 ** bits],
+                            'logrows': k,
+                        }
+
+def score_outputs(reference, outputs, input_scale):
+    """Error and decision agreement of circuit outputs vs the float model"""
+    step = 2.0 ** -input_scale
+    outputs = np.round(np.asarray(outputs) / step) * step  # Output rebased to input scale
+    error = np.abs(outputs - reference)
+    return {
+        'max_abs_error': float(error.max()),
+        'mean_abs_error': float(error.mean()),
+        'decision_agreement': float(np.mean(classify_alerts(outputs) == classify_alerts(reference))),
+    }
+
+class StandInBackend:
+    """Toolchain-free backend: quantization emulation + analytical cost model"""
+
+    name = 'stand-in'
+
+    def __init__(self, model, windows, reference):
+        self.model = model
+        self.windows = windows
+        self.reference = reference
+        self._outputs = {}
+
+    def evaluate(self, candidate):
+        key = (candidate['input_scale'], candidate['param_scale'])
+        if key not in self._outputs:
+            step = 2.0 ** -candidate['input_scale']
+            windows = np.round(self.windows / step) * step
+            session = quantized_session(self.model, candidate['param_scale'])
+            self._outputs[key] = run_session(session, windows)
+
+        rows = 2 ** candidate['logrows']
+        result = score_outputs(self.reference, self._outputs[key], candidate['input_scale'])
+        result.update({
+            'prove_seconds': PROVE_SECONDS_AT_REFERENCE * 2.0 ** (candidate['logrows'] - REFERENCE_LOGROWS),
+            'pk_bytes': rows * PK_BYTES_PER_ROW,
+            'vk_bytes': VK_BYTES,
+        })
+        return result
+
+class EzklBackend:
+    """Runs the real EZKL toolchain per candidate (slow, exact)"""
+
+    name = 'ezkl'
+
+    def __init__(self, ezkl_path, onnx_path, windows, reference, workdir):
+        self.ezkl = ezkl_path
+        self.onnx_path = str(onnx_path)
+        self.windows = windows
+        self.reference = reference
+        self.workdir = Path(workdir)
+        self._srs = {}
+
+    def _run(self, *args):
+        subprocess.run([self.ezkl, *args], capture_output=True, text=True, check=True)
+
+    def evaluate(self, candidate):
+        tag = "s{input_scale}_p{param_scale}_k{logrows}".format(**candidate) + \
+            f"_l{int(math.log2(candidate['lookup_range'][1]))}"
+        out = self.workdir / tag
+        out.mkdir(parents=True, exist_ok=True)
+        settings, circuit = out / "settings.json", out / "model.ezkl"
+        pk, vk = out / "pk.key", out / "vk.key"
+        lo, hi = candidate['lookup_range']
+
+        self._run("gen-settings", "-M", self.onnx_path, "-O", str(settings),
+                  "--input-visibility", "public", "--param-visibility", "fixed",
+                  "--input-scale", str(candidate['input_scale']),
+                  "--param-scale", str(candidate['param_scale']),
+                  "--logrows", str(candidate['logrows']),
+                  f"--lookup-range={lo}->{hi}")
+        self._run("compile-circuit", "-M", self.onnx_path, "-S", str(settings),
+                  "--compiled-circuit", str(circuit))
+        srs = self._srs.get(candidate['logrows'])
+        if srs is None:
+            srs = self.workdir / f"kzg{candidate['logrows']}.srs"
+            self._run("get-srs", "-S", str(settings), "--srs-path", str(srs))
+            self._srs[candidate['logrows']] = srs
+        self._run("setup", "-M", str(circuit), "-S", str(settings), "--srs-path", str(srs),
+                  "--pk-path", str(pk), "--vk-path", str(vk))
+
+        outputs, prove_times = [], []
+        for i, window in enumerate(self.windows):
+            data, witness, proof = out / f"input{i}.json", out / f"witness{i}.json", out / f"proof{i}.json"
+            with open(data, 'w') as f:
+                json.dump({"input_data": [window.reshape(-1).tolist()]}, f)
+            self._run("gen-witness", "-M", str(circuit), "-I", str(data), "-O", str(witness))
+            start = time.perf_counter()
+            self._run("prove", "-M", str(circuit), "-W", str(witness), "--pk-path", str(pk),
+                      "--proof-path", str(proof), "--srs-path", str(srs))
+            prove_times.append(time.perf_counter() - start)
+            with open(witness, 'r') as f:
+                pretty = json.load(f).get("pretty_elements", {})
+            outputs.append(float(np.array(pretty["rescaled_outputs"], dtype=float).reshape(-1)[0]))
+
+        result = score_outputs(self.reference, outputs, candidate['input_scale'])
+        result.update({
+            'prove_seconds': float(np.median(prove_times)),
+            'pk_bytes': pk.stat().st_size,
+            'vk_bytes': vk.stat().st_size,
+        })
+        return result
+
+# ============================================================
+# Selection
+# ============================================================
+PARETO_OBJECTIVES = ('prove_seconds', 'pk_bytes', 'mean_abs_error')
+
+def select_candidate(front, min_agreement):
+    """Cheapest frontier point that preserves alert decisions"""
+    preserving = [r for r in front if r['decision_agreement'] >= min_agreement]
+    if not preserving:
+        return None
+    return min(preserving, key=lambda r: (r['prove_seconds'], r['pk_bytes'], r['mean_abs_error']))
+
+def build_settings(candidate, sequence_length=SEQUENCE_LENGTH):
+    """settings.json in the same layout as zk_setup_placeholder.py"""
+    return {
+        "run_args": {
+            "tolerance": {"val": 0, "scale": 1},
+            "input_scale": candidate['input_scale'],
+            "param_scale": candidate['param_scale'],
+            "scale_rebase_multiplier": 1,
+            "lookup_range": candidate['lookup_range'],
+            "logrows": candidate['logrows'],
+            "num_inner_cols": NUM_INNER_COLS,
+            "variables": [["batch_size", 1]],
+            "input_visibility": "public",
+            "output_visibility": "public",
+            "param_visibility": "fixed"
+        },
+        "model_instance_shapes": [[1, sequence_length, len(FEATURE_COLUMNS)]],
+        "model_output_shapes": [[1, 1]],
+        "module_sizes": {
+            "model": {"k": candidate['logrows']}
+        }
+    }
+
+def calibrate(args):
+    """Run the sweep and write report + calibrated settings"""
+    import onnx
+    import onnxruntime as ort
+
+    print("=" * 60)
+    print("ZK CIRCUIT CALIBRATION SWEEP")
+    print("=" * 60)
+
+    onnx_path = Path(args.model)
+    if not onnx_path.exists():
+        print(f"\n[!] ONNX model not found: {onnx_path}")
+        print("  Run: python model/export_onnx.py")
+        return False
+    model = onnx.load(str(onnx_path))
+
+    print(f"\n[1/4] Loading representative windows: {args.data}")
+    windows = load_windows(args.data, args.num_windows)
+    session = ort.InferenceSession(str(onnx_path), providers=['CPUExecutionProvider'])
+    reference = run_session(session, windows)
+    decisions = np.bincount(classify_alerts(reference), minlength=3)
+    print(f"  [+] {len(windows)} windows "
+          f"(normal={decisions[0]}, warning={decisions[1]}, critical={decisions[2]})")
+
+    print(f"\n[2/4] Analyzing circuit...")
+    cost = estimate_circuit_rows(model)
+    bound = lookup_input_bound(model, input_bound=float(np.max(np.abs(windows))))
+    print(f"  [+] Estimated rows: {cost['rows']:,} "
+          f"(MACs={cost['macs']:,}, lookups={cost['lookups']:,})")
+    print(f"  [+] Max lookup input magnitude: {bound:.2f}")
+
+    candidates = list(enumerate_candidates(
+        cost['rows'], bound, args.scales, args.lookup_bits, args.logrows
+    ))
+    if not candidates:
+        print("\n[!] No candidate fits the sweep space; widen --logrows/--lookup-bits")
+        return False
+
+    workdir = None
+    if args.backend == 'ezkl':
+        workdir = tempfile.mkdtemp(prefix="zk_calibrate_")
+        backend = EzklBackend(args.ezkl, onnx_path, windows, reference, workdir)
+    else:
+        backend = StandInBackend(model, windows, reference)
+
+    print(f"\n[3/4] Sweeping {len(candidates)} candidates ({backend.name} backend)...")
+    results = []
+    try:
+        for i, candidate in enumerate(candidates, 1):
+            try:
+                result = dict(candidate, **backend.evaluate(candidate))
+            except (subprocess.CalledProcessError, KeyError, ValueError) as e:
+                print(f"  [!] {candidate}: failed ({e})")
+                continue
+            results.append(result)
+            if i % 50 == 0 or i == len(candidates):
+                print(f"  [*] {i}/{len(candidates)} evaluated")
+    finally:
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)  # Per-candidate keys and proofs
+
+    front = pareto_front(results, PARETO_OBJECTIVES)
+    chosen = select_candidate(front, args.min_agreement)
+
+    print(f"\n[4/4] Pareto frontier ({len(front)} points):")
+    print("  in  par  lookup   k   prove(s)   pk(MB)   mean_err   agree")
+    for r in front:
+        print(f"  {r['input_scale']:>2}  {r['param_scale']:>3}  2^{int(math.log2(r['lookup_range'][1])):<5}"
+              f" {r['logrows']:>2}  {r['prove_seconds']:>8.2f}  {r['pk_bytes'] / 2**20:>7.1f}"
+              f"   {r['mean_abs_error']:.5f}   {r['decision_agreement']:.3f}")
+
+    report = {
+        "backend": backend.name,
+        "model": str(onnx_path),
+        "data": str(args.data),
+        "num_windows": len(windows),
+        "circuit_estimate": cost,
+        "lookup_input_bound": bound,
+        "min_agreement": args.min_agreement,
+        "results": results,
+        "pareto_front": front,
+        "selected": chosen,
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[+] Report saved to: {args.report}")
+
+    if chosen is None:
+        print(f"[!] No frontier point reaches decision agreement >= {args.min_agreement}")
+        return False
+
+    with open(args.output, 'w') as f:
+        json.dump(build_settings(chosen), f, indent=2)
+
+    print(f"[+] Calibrated settings saved to: {args.output}")
+    print(f"    input_scale={chosen['input_scale']}, param_scale={chosen['param_scale']}, "
+          f"lookup_range={chosen['lookup_range']}, logrows={chosen['logrows']}")
+    print(f"    Proving time: {chosen['prove_seconds']:.2f}s, "
+          f"proving key: {chosen['pk_bytes'] / 2**20:.1f} MB ({backend.name})")
+    print(f"\nNext: python zk-circuit/scripts/zk_setup.py")
+    print("=" * 60 + "\n")
+    return True
+
+def _int_range(text):
+    """Parse '12-20' or '7' into a list of ints"""
+    lo, _, hi = text.partition('-')
+    return list(range(int(lo), int(hi or lo) + 1))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep EZKL circuit settings")
+    parser.add_argument("--model", default=str(ONNX_MODEL), help="ONNX model to calibrate")
+    parser.add_argument("--data", default=str(DEFAULT_DATA_FILE),
+                        help="Training/backtest dataset (columnar or CSV) with FEATURE_COLUMNS")
+    parser.add_argument("--num-windows", type=int, default=256)
+    parser.add_argument("--backend", choices=["stand-in", "ezkl"], default="stand-in")
+    parser.add_argument("--ezkl", default="ezkl", help="EZKL binary (ezkl backend)")
+    parser.add_argument("--scales", type=_int_range, default=SCALES, help="e.g. 4-10")
+    parser.add_argument("--lookup-bits", type=_int_range, default=LOOKUP_BITS, help="e.g. 12-17")
+    parser.add_argument("--logrows", type=_int_range, default=LOGROWS, help="e.g. 12-24")
+    parser.add_argument("--min-agreement", type=float, default=1.0,
+                        help="Required fraction of matching alert decisions")
+    parser.add_argument("--output", default=str(CALIBRATED_SETTINGS_FILE))
+    parser.add_argument("--report", default=str(REPORT_FILE))
+    args = parser.parse_args()
+
+    success = calibrate(args)
+    sys.exit(0 if success else 1)
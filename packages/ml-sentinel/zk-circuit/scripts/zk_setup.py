@@ -3,24 +3,46 @@ ZK Circuit Setup Script
 Generates cryptographic artifacts for zero-knowledge proof generation
 
 This script prepares the ZK circuit for the LSTM crash prediction model.
-Run once before production deployment.
+Run once before production deployment, and again after every retrain.
+
+Setup is a staged pipeline. Each artifact records the content hashes of the
+inputs it was built from in zk_manifest.json and is only rebuilt when one of
+those inputs (or the EZKL version) changes:
+
+    settings.json  <- network.onnx (+ calibrated_settings.json if present)
+    model.ezkl     <- network.onnx, settings.json
+    kzg.srs        <- logrows (from settings.json)
+    pk.key/vk.key  <- model.ezkl, settings.json, kzg.srs
+    Verifier.sol   <- settings.json, kzg.srs, vk.key
 
 Outputs:
 - settings.json: Circuit configuration
-- model.ezkl: Compiled circuit  
+- model.ezkl: Compiled circuit
+- kzg.srs: Structured reference string
 - pk.key: Proving key
 - vk.key: Verification key
 - Verifier.sol: Solidity verifier contract (for blockchain deployment)
+
+Usage:
+    python zk_setup.py              # Rebuild stale artifacts only
+    python zk_setup.py --dry-run    # Show what would be rebuilt
+    python zk_setup.py --force      # Rebuild everything
 """
 
 import os
 import sys
 import json
+import argparse
 import subprocess
 from pathlib import Path
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent.parent
+sys.path.append(str(SCRIPT_DIR.parent))
+
+from shared.build_manifest import (file_sha256, load_manifest, save_manifest,
+                                   stale_reason, plan_stages, print_plan)
+
 ONNX_MODEL = SCRIPT_DIR / "../model/trained/network.onnx"
 ZK_DIR = SCRIPT_DIR
 SETTINGS_FILE = ZK_DIR / "settings.json"
@@ -29,30 +51,34 @@ PK_FILE = ZK_DIR / "pk.key"
 VK_FILE = ZK_DIR / "vk.key"
 SRS_FILE = ZK_DIR / "kzg.srs"
 VERIFIER_CONTRACT = SCRIPT_DIR / "../../packages/blockchain-evm/contracts/Verifier.sol"
+MANIFEST_FILE = ZK_DIR / "zk_manifest.json"
+CALIBRATED_SETTINGS_FILE = ZK_DIR / "calibrated_settings.json"  # From zk_calibrate.py
 
-def check_ezkl():
-    """Check if EZKL is installed"""
+def check_ezkl(quiet=False):
+    """Check if EZKL is installed, returns (path, version) or (None, None)"""
     # Try multiple possible locations
     ezkl_paths = [
         "ezkl",  # In PATH
         "C:\\ai-sentinel\\ezkl",  # Downloaded location
         str(Path.cwd().parent.parent / "ezkl"),  # Relative
     ]
-    
+
     for ezkl_path in ezkl_paths:
         try:
             result = subprocess.run([ezkl_path, "--version"], capture_output=True, text=True)
             if result.returncode == 0:
-                print(f"[+] EZKL found: {result.stdout.strip()}")
-                return ezkl_path
+                version = result.stdout.strip()
+                print(f"[+] EZKL found: {version}")
+                return ezkl_path, version
         except (FileNotFoundError, OSError):
             continue
-    
-    print("\n[!] EZKL not found!")
-    print("\nInstall EZKL:")
-    print("  Download: https://github.com/zkonduit/ezkl/releases")
-    print("  Or: cargo install --git https://github.com/zkonduit/ezkl")
-    return None
+
+    if not quiet:
+        print("\n[!] EZKL not found!")
+        print("\nInstall EZKL:")
+        print("  Download: https://github.com/zkonduit/ezkl/releases")
+        print("  Or: cargo install --git https://github.com/zkonduit/ezkl")
+    return None, None
 
 def run_ezkl_command(cmd, description):
     """Run an EZKL command with error handling"""
@@ -68,77 +94,198 @@ def run_ezkl_command(cmd, description):
         print(f"  Error: {e.stderr}")
         return False
 
-def setup_zk_circuit():
+# ============================================================
+# Stages & fingerprints
+# ============================================================
+def settings_logrows():
+    """Fingerprint for the SRS: it only depends on the circuit size"""
+    with open(SETTINGS_FILE, 'r') as f:
+        settings = json.load(f)
+    return str(settings["run_args"]["logrows"])
+
+def calibrated_run_args():
+    """gen-settings flags from calibrated_settings.json (empty if not calibrated)"""
+    if not CALIBRATED_SETTINGS_FILE.exists():
+        return []
+    with open(CALIBRATED_SETTINGS_FILE, 'r') as f:
+        run_args = json.load(f)["run_args"]
+    lo, hi = run_args["lookup_range"]
+    return [
+        "--input-scale", str(run_args["input_scale"]),
+        "--param-scale", str(run_args["param_scale"]),
+        "--logrows", str(run_args["logrows"]),
+        f"--lookup-range={lo}->{hi}",
+    ]
+
+def build_stages(ezkl_path):
+    """
+    Describe the setup pipeline in dependency order.
+
+    Each stage lists the artifacts it writes and the inputs it is keyed on.
+    File inputs are keyed on their content hash; `params` are keyed on the
+    value returned by a callable (evaluated only once upstream is fresh).
+    """
+    calibrated = CALIBRATED_SETTINGS_FILE.exists()
+    return [
+        {
+            "name": "settings",
+            "description": "Generating settings" + (" (calibrated)" if calibrated else ""),
+            "outputs": [SETTINGS_FILE],
+            "inputs": [ONNX_MODEL] + ([CALIBRATED_SETTINGS_FILE] if calibrated else []),
+            "params": {},
+            "cmd": [
+                ezkl_path, "gen-settings",
+                "-M", str(ONNX_MODEL),
+                "-O", str(SETTINGS_FILE),
+                "--input-visibility", "public",
+                "--param-visibility", "fixed"
+            ] + calibrated_run_args(),
+        },
+        {
+            "name": "circuit",
+            "description": "Compiling circuit",
+            "outputs": [COMPILED_CIRCUIT],
+            "inputs": [ONNX_MODEL, SETTINGS_FILE],
+            "params": {},
+            "cmd": [
+                ezkl_path, "compile-circuit",
+                "-M", str(ONNX_MODEL),
+                "-S", str(SETTINGS_FILE),
+                "--compiled-circuit", str(COMPILED_CIRCUIT)
+            ],
+        },
+        {
+            "name": "srs",
+            "description": "Downloading SRS",
+            "outputs": [SRS_FILE],
+            "inputs": [],
+            "params": {"logrows": settings_logrows},
+            "depends_on": [SETTINGS_FILE],
+            "cmd": [
+                ezkl_path, "get-srs",
+                "-S", str(SETTINGS_FILE),
+                "--srs-path", str(SRS_FILE)
+            ],
+        },
+        {
+            "name": "keys",
+            "description": "Generating proving/verification keys",
+            "outputs": [PK_FILE, VK_FILE],
+            "inputs": [COMPILED_CIRCUIT, SETTINGS_FILE, SRS_FILE],
+            "params": {},
+            "cmd": [
+                ezkl_path, "setup",
+                "-M", str(COMPILED_CIRCUIT),
+                "-S", str(SETTINGS_FILE),
+                "--srs-path", str(SRS_FILE),
+                "--pk-path", str(PK_FILE),
+                "--vk-path", str(VK_FILE)
+            ],
+        },
+        {
+            "name": "verifier",
+            "description": "Creating Solidity verifier",
+            "outputs": [VERIFIER_CONTRACT],
+            "inputs": [SETTINGS_FILE, SRS_FILE, VK_FILE],
+            "params": {},
+            "cmd": [
+                ezkl_path, "create-evm-verifier",
+                "-S", str(SETTINGS_FILE),
+                "--srs-path", str(SRS_FILE),
+                "--vk-path", str(VK_FILE),
+                "--sol-code-path", str(VERIFIER_CONTRACT)
+            ],
+        },
+    ]
+
+def stage_fingerprint(stage, ezkl_version):
+    """
+    Current fingerprint of a stage's inputs (assumes inputs exist).
+    Without EZKL (dry run) the toolchain is unknown and left unchecked.
+    """
+    fingerprint = {"toolchain": ezkl_version} if ezkl_version is not None else {}
+    fingerprint.update({
+        "command": stage["cmd"][1:],  # Exclude binary location
+        "inputs": {p.name: file_sha256(p) for p in stage["inputs"]},
+        "params": {k: fn() for k, fn in stage["params"].items()},
+    })
+    return fingerprint
+
+def stage_stale_reason(stage, manifest, ezkl_version, pending):
+    """Why a stage must be rebuilt (None if up to date); outputs are keyed by file name"""
+    return stale_reason(
+        stage, manifest.get(stage["name"]), pending,
+        fingerprint=lambda s: stage_fingerprint(s, ezkl_version),
+        key=lambda p: p.name,
+    )
+
+def plan_setup(stages, manifest, ezkl_version, force=False):
+    """Decide which stages to rebuild; returns list of (stage, reason or None)"""
+    return plan_stages(
+        stages,
+        lambda stage, pending: stage_stale_reason(stage, manifest, ezkl_version, pending),
+        forced={stage["name"] for stage in stages} if force else (),
+    )
+
+def setup_zk_circuit(dry_run=False, force=False):
     """Main setup function"""
     print("=" * 60)
-    print("ZK CIRCUIT SETUP")
+    print("ZK CIRCUIT SETUP" + (" (DRY RUN)" if dry_run else ""))
     print("="  * 60)
-    
-    # Check EZKL
-    ezkl_path = check_ezkl()
-    if not ezkl_path:
+
+    # Check EZKL (a dry run can still report staleness without it)
+    ezkl_path, ezkl_version = check_ezkl(quiet=dry_run)
+    if not ezkl_path and not dry_run:
         return False
-    
+
     # Check ONNX model
     if not ONNX_MODEL.exists():
         print(f"\n[!] ONNX model not found: {ONNX_MODEL}")
         print("  Run: python model/export_onnx.py")
         return False
-    
+
     print(f"\n[+] ONNX model found: {ONNX_MODEL}")
-    
+
+    stages = build_stages(ezkl_path or "ezkl")
+    manifest = load_manifest(MANIFEST_FILE)
+    plan = plan_setup(stages, manifest, ezkl_version, force=force)
+
+    print(f"\n[*] Build plan:")
+    print_plan(plan, lambda stage: "(" + ", ".join(p.name for p in stage["outputs"]) + ")")
+
+    if dry_run:
+        rebuilds = sum(1 for _, reason in plan if reason is not None)
+        print(f"\n[*] Dry run: {rebuilds}/{len(plan)} stage(s) would be rebuilt")
+        print("=" * 60 + "\n")
+        return True
+
     # Create output directories
     os.makedirs(ZK_DIR, exist_ok=True)
     os.makedirs(VERIFIER_CONTRACT.parent, exist_ok=True)
-    
-    # Step 1: Generate settings
-    if not run_ezkl_command([
-        ezkl_path, "gen-settings",
-        "-M", str(ONNX_MODEL),
-        "-O", str(SETTINGS_FILE),
-        "--input-visibility", "public",
-        "--param-visibility", "fixed"
-    ], "Generating settings"):
-        return False
-    
-    # Step 2: Compile circuit
-    if not run_ezkl_command([
-        ezkl_path, "compile-circuit",
-        "-M", str(ONNX_MODEL),
-        "-S", str(SETTINGS_FILE),
-        "--compiled-circuit", str(COMPILED_CIRCUIT)
-    ], "Compiling circuit"):
-        return False
-    
-    # Step 3: Get SRS
-    if not run_ezkl_command([
-        ezkl_path, "get-srs",
-        "-S", str(SETTINGS_FILE),
-        "--srs-path", str(SRS_FILE)
-    ], "Downloading SRS"):
-        return False
-    
-    # Step 4: Setup (generate keys)
-    if not run_ezkl_command([
-        ezkl_path, "setup",
-        "-M", str(COMPILED_CIRCUIT),
-        "-S", str(SETTINGS_FILE),
-        "--srs-path", str(SRS_FILE),
-        "--pk-path", str(PK_FILE),
-        "--vk-path", str(VK_FILE)
-    ], "Generating proving/verification keys"):
-        return False
-    
-    # Step 5: Create EVM verifier
-    if not run_ezkl_command([
-        ezkl_path, "create-evm-verifier",
-        "-S", str(SETTINGS_FILE),
-        "--srs-path", str(SRS_FILE),
-        "--vk-path", str(VK_FILE),
-        "--sol-code-path", str(VERIFIER_CONTRACT)
-    ], "Creating Solidity verifier"):
-        return False
-    
+
+    # Re-evaluate each stage right before running it: upstream outputs
+    # are now real, so a rebuild that reproduces identical bytes (e.g.
+    # settings unchanged after a retrain) lets downstream stages skip.
+    pending = set()
+    for stage, _ in plan:
+        reason = "forced" if force else stage_stale_reason(stage, manifest, ezkl_version, pending)
+        if reason is None:
+            print(f"\n[=] {stage['name']}: up to date, skipping")
+            continue
+
+        # Drop the record first so a failed/interrupted stage is never trusted
+        manifest.pop(stage["name"], None)
+        save_manifest(manifest, MANIFEST_FILE)
+
+        if not run_ezkl_command(stage["cmd"], f"{stage['description']} ({reason})"):
+            return False
+
+        manifest[stage["name"]] = {
+            "fingerprint": stage_fingerprint(stage, ezkl_version),
+            "outputs": {p.name: file_sha256(p) for p in stage["outputs"]},
+        }
+        save_manifest(manifest, MANIFEST_FILE)
+
     # Summary
     print("\n" + "=" * 60)
     print("[+] ZK CIRCUIT SETUP COMPLETE!")
@@ -146,14 +293,23 @@ def setup_zk_circuit():
     print(f"\nGenerated files:")
     print(f"  [*] {SETTINGS_FILE}")
     print(f"  [*] {COMPILED_CIRCUIT}")
+    print(f"  [*] {SRS_FILE}")
     print(f"  [*] {PK_FILE}")
     print(f"  [*] {VK_FILE}")
     print(f"  [*] {VERIFIER_CONTRACT}")
+    print(f"  [*] {MANIFEST_FILE}")
     print(f"\nNext: Run prove_crash.py when risk > 0.8")
     print("=" * 60 + "\n")
-    
+
     return True
 
 if __name__ == "__main__":
-    success = setup_zk_circuit()
+    parser = argparse.ArgumentParser(description="Incremental EZKL circuit setup")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Show which artifacts would be rebuilt and exit")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild every artifact regardless of input hashes")
+    args = parser.parse_args()
+
+    success = setup_zk_circuit(dry_run=args.dry_run, force=args.force)
     sys.exit(0 if success else 1)
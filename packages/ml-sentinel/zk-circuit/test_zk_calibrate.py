@@ -0,0 +1,38 @@
+"""
+Test Script for ZK Calibration Graph Analysis
+Checks lookup_input_bound on the fp16-optimized export of network.onnx
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ML_SENTINEL_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ML_SENTINEL_ROOT / "zk-circuit" / "scripts"))
+sys.path.insert(0, str(ML_SENTINEL_ROOT / "model"))
+
+NETWORK_ONNX = ML_SENTINEL_ROOT / "model" / "trained" / "network.onnx"
+
+def test_lookup_input_bound_fp16():
+    """fp16 weights reach the LSTM / MatMul nodes through Cast; the bound must match fp32"""
+    import onnx
+    from export_onnx import optimize_onnx
+    from zk_calibrate import lookup_input_bound
+
+    model = onnx.load(str(NETWORK_ONNX))
+    fp32, _ = optimize_onnx(model)
+    fp16, _ = optimize_onnx(model, fp16=True)
+
+    lstm_weights = {name for node in fp16.graph.node if node.op_type == 'LSTM' for name in node.input[1:4]}
+    cast_outputs = {node.output[0] for node in fp16.graph.node if node.op_type == 'Cast'}
+    assert lstm_weights & cast_outputs, "fp16 export no longer routes LSTM weights through Cast"
+
+    bound_fp32 = lookup_input_bound(fp32)
+    bound_fp16 = lookup_input_bound(fp16)
+    print(f"lookup bound: fp32 {bound_fp32:.4f}, fp16 {bound_fp16:.4f}")
+    assert np.isclose(bound_fp16, bound_fp32, rtol=1e-2)
+
+if __name__ == "__main__":
+    test_lookup_input_bound_fp16()
+    print("✓ lookup_input_bound handles fp16 graphs")